@@ -1,14 +1,14 @@
 import streamlit as st
-from PIL import Image
+
+from curry_company import assets
 
 st.set_page_config(
     page_title="Home",
     page_icon=" "
 )
 
-# image_path = 'C:/Users/emers/Documents/repos/ftc_programacao_python/notebooks/'
-image = Image.open( 'logo.png' )
-st.sidebar.image(image, width=120)
+# logo reduzido para 120 px uma única vez por processo (bytes em cache)
+st.sidebar.image(assets.logo_bytes(width=120), width=120)
 
 st.sidebar.markdown('# Cury Company') # os asteristicos aqui servem como títulos maiores e menores.
 st.sidebar.markdown('## Fastest Delivery in Town')
@@ -34,4 +34,4 @@ st.markdown(
    - Time de Data Science no Discord
        - @emersoncoliveira
 
-""")
\ No newline at end of file
+""")
\ No newline at end of file
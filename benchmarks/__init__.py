@@ -0,0 +1,5 @@
+# Benchmarks do dashboard. Devem ser executados a partir da raiz do projeto:
+#
+#     python -m benchmarks.bench_clean_code
+#     python -m benchmarks.suite --rows 45000 1000000 --save baseline.json
+#     python -m benchmarks.load_test --sessions 20 --report load.json
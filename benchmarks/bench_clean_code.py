@@ -0,0 +1,43 @@
+# ------------------------------------------------------------------------
+# Benchmark do clean_code: versão original x versão vetorizada
+# ------------------------------------------------------------------------
+#     python -m benchmarks.bench_clean_code
+#     python -m benchmarks.bench_clean_code --rows 45000 1000000
+import argparse
+import time
+import warnings
+
+from benchmarks import legacy, synthetic
+from curry_company.data import clean_code
+
+TAMANHOS = [45_000, 1_000_000, 10_000_000]
+
+
+def _tempo(func, df, repeticoes):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        entrada = df.copy()
+        inicio = time.perf_counter()
+        func(entrada)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compara o clean_code original com o vetorizado.')
+    parser.add_argument('--rows', type=int, nargs='+', default=TAMANHOS)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print('{:>12} {:>12} {:>12} {:>8}'.format('linhas', 'original(s)', 'novo(s)', 'ganho'))
+    for n_rows in args.rows:
+        df = synthetic.generate(n_rows)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # SettingWithCopyWarning da versão original
+            antigo = _tempo(legacy.clean_code, df, args.repeat)
+        novo = _tempo(clean_code, df, args.repeat)
+        print('{:>12,} {:>12.3f} {:>12.3f} {:>7.1f}x'.format(n_rows, antigo, novo, antigo / novo))
+
+
+if __name__ == '__main__':
+    main()
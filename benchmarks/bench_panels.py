@@ -0,0 +1,63 @@
+# ------------------------------------------------------------------------
+# Cálculo concorrente dos painéis (curry_company/panels.py)
+# ------------------------------------------------------------------------
+# Calcula todos os KPIs de uma janela (o que as três páginas pedem num
+# rerun) em sequência e no pool de threads, mostra o tempo de cada forma e
+# confere que os resultados são iguais. Cada repetição usa uma Window nova,
+# sem os resultados já memorizados.
+#
+#     python -m benchmarks.bench_panels --rows 2000000 --threads 4
+import argparse
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks import synthetic
+from curry_company import cube, kpis
+from curry_company.data import prepare_dataset
+from curry_company.panels import Panels
+
+
+def _rodar(cubos, janela_args, threads):
+    janela = kpis.Window(cubos, **janela_args)
+    paineis = Panels(workers=threads)
+    for nome, func in kpis.KPIS.items():
+        paineis.add(nome, func, janela)
+    return paineis.run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mede os painéis calculados em sequência e em threads.')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    cubos = cube.build_cubes(prepare_dataset(synthetic.generate(args.rows)))
+    janela_args = dict(start=datetime(2022, 2, 11), end=datetime(2022, 6, 4), traffic=['Low', 'Medium', 'High', 'Jam'])
+    print('{} pedidos, {} KPIs por rerun'.format(args.rows, len(kpis.KPIS)))
+
+    resultados = {}
+    for threads in (1, args.threads):
+        tempos = []
+        for _ in range(args.repeat):
+            inicio = time.perf_counter()
+            resultados[threads] = _rodar(cubos, janela_args, threads)
+            tempos.append(time.perf_counter() - inicio)
+        print('{:>3} threads: {:7.3f}s'.format(threads, min(tempos)))
+
+    falhas = 0
+    for nome, esperado in resultados[1].items():
+        try:
+            pd.testing.assert_frame_equal(esperado, resultados[args.threads][nome])
+        except AssertionError:
+            falhas += 1
+            print('DIVERGE:', nome)
+    print('resultados iguais' if not falhas else '{} KPIs divergentes'.format(falhas))
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
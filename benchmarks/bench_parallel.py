@@ -0,0 +1,68 @@
+# ------------------------------------------------------------------------
+# Escalabilidade da agregação paralela (curry_company/parallel.py)
+# ------------------------------------------------------------------------
+# Constrói os cubos de um dataset sintético com 1, 2, ... N processos,
+# mostra o tempo e o ganho de cada configuração e confere que os cubos são
+# iguais aos da construção serial.
+#
+#     python -m benchmarks.bench_parallel --rows 2000000 --workers 8
+#     python -m benchmarks.bench_parallel --by City
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from benchmarks import synthetic
+from curry_company import cube, parallel
+from curry_company.data import prepare_dataset
+
+
+def _iguais(a, b):
+    for nome in a:
+        x = a[nome].cells.reset_index(drop=True)
+        y = b[nome].cells.reset_index(drop=True)
+        if x.shape != y.shape:
+            return False
+        for coluna in x.columns:
+            if x[coluna].dtype.kind in 'fiu':
+                if not np.allclose(x[coluna].to_numpy('float64'), y[coluna].to_numpy('float64'), equal_nan=True):
+                    return False
+            elif not (x[coluna].astype(str) == y[coluna].astype(str)).all():
+                return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mede a agregação dos cubos com 1 a N processos.')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='máximo de processos')
+    parser.add_argument('--by', default='date', choices=['date', 'City'])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    df1 = prepare_dataset(synthetic.generate(args.rows)).loc[:, cube.cube_columns()]
+    print('{} pedidos, {} núcleos disponíveis, partição por {}'.format(len(df1), os.cpu_count(), args.by))
+
+    contagens = sorted({1, args.workers} | {n for n in (2, 4, 8, 16) if n < args.workers})
+    base = None
+    referencia = cube.build_cubes(df1)
+    falhas = 0
+    for n in contagens:
+        tempos = []
+        for _ in range(args.repeat):
+            inicio = time.perf_counter()
+            cubos = parallel.build_cubes(df1, n_workers=n, by=args.by, min_rows=0)
+            tempos.append(time.perf_counter() - inicio)
+        tempo = min(tempos)
+        base = base or tempo
+        iguais = _iguais(referencia, cubos)
+        falhas += not iguais
+        print('{:>3} processos: {:7.3f}s  ganho {:4.2f}x  {}'.format(
+            n, tempo, base / tempo, 'ok' if iguais else 'DIVERGE'))
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# ------------------------------------------------------------------------
+# Verificação do modo em blocos: KPIs iguais aos do modo em memória
+# ------------------------------------------------------------------------
+# Constrói os cubos dos dois jeitos sobre o mesmo CSV, calcula as consultas
+# usadas pelas páginas em algumas janelas de datas/tráfego e compara. Também
+# mostra o pico de memória (tracemalloc) de cada modo e o tamanho dos cubos
+# (que não depende do bloco, ver curry_company/chunked.py). A mesma
+# comparação roda nos testes (tests/test_chunked.py).
+#
+#     python -m benchmarks.check_chunked
+#     python -m benchmarks.check_chunked --csv ../dataset/train.csv --chunk-size 5000
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+from curry_company import chunked, cube
+from curry_company.data import prepare_dataset
+
+# (cubo, agrupamento, agregação) de cada KPI das páginas
+CONSULTAS = [
+    ('pedidos', ['Order_Date'], None),
+    ('pedidos', ['Road_traffic_density'], None),
+    ('pedidos', ['City', 'Road_traffic_density'], None),
+    ('pedidos', ['week_of_year'], None),
+    ('pedidos', [], {'Delivery_person_Age': ['min', 'max'], 'Vehicle_condition': ['min', 'max']}),
+    ('pedidos', ['Road_traffic_density'], {'Delivery_person_Ratings': ['mean', 'std']}),
+    ('pedidos', ['Weatherconditions'], {'Delivery_person_Ratings': ['mean', 'std']}),
+    ('pedidos', [], {'distance_km': ['mean']}),
+    ('pedidos', ['Festival'], {'Time_taken(min)': ['mean', 'std']}),
+    ('pedidos', ['City'], {'Time_taken(min)': ['mean', 'std'], 'distance_km': ['mean']}),
+    ('pedidos', ['City', 'Type_of_order'], {'Time_taken(min)': ['mean', 'std']}),
+    ('pedidos', ['City', 'Road_traffic_density'], {'Time_taken(min)': ['mean', 'std'],
+                                                   'Delivery_location_latitude': ['mean'],
+                                                   'Delivery_location_longitude': ['mean']}),
+    ('entregadores', ['Delivery_person_ID'], {'Delivery_person_Ratings': ['mean']}),
+    ('entregadores', ['City', 'Delivery_person_ID'], {'Time_taken(min)': ['max']}),
+]
+
+JANELAS = [
+    (None, None, None),
+    ('2022-02-11', '2022-02-12', ['Low', 'Medium', 'High', 'Jam']),
+    ('2022-03-01', '2022-04-01', ['Low', 'Jam']),
+]
+
+
+def _consultar(cubos, nome, by, agg, janela):
+    inicio, fim, trafego = janela
+    cubo = cubos[nome].slice(start=inicio, end=fim, traffic=trafego)
+    if agg is None:
+        resultado = cubo.orders(by).to_frame()
+        resultado['distintos'] = cubo.nunique(by, 'Delivery_person_ID') if nome == 'entregadores' else 0
+    elif by:
+        resultado = cubo.rollup(by, agg)
+    else:
+        resultado = cubo.total(agg).to_frame()
+    return resultado.sort_index().astype('float64')
+
+
+def compare(em_memoria, em_blocos):
+    """Compara as consultas das páginas nos dois conjuntos de cubos.
+
+    Input: dicionários nome -> Cube do modo em memória e do modo em blocos.
+    Output: lista de (cubo, agrupamento, agregação, janela) divergentes.
+    """
+    divergencias = []
+    for janela in JANELAS:
+        for nome, by, agg in CONSULTAS:
+            a = _consultar(em_memoria, nome, by, agg, janela)
+            b = _consultar(em_blocos, nome, by, agg, janela)
+            if a.shape != b.shape or not np.allclose(a.to_numpy(), b.to_numpy(), rtol=1e-9, equal_nan=True):
+                divergencias.append((nome, by, agg, janela))
+    return divergencias
+
+
+def _medir(func):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = func()
+    tempo = time.perf_counter() - inicio
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return resultado, tempo, pico
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compara os KPIs do modo em blocos com o modo em memória.')
+    parser.add_argument('--csv', help='CSV no formato do train.csv (padrão: sintético)')
+    parser.add_argument('--rows', type=int, default=200_000, help='linhas do CSV sintético')
+    parser.add_argument('--chunk-size', type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    csv = args.csv
+    if csv is None:
+        csv = os.path.join(tempfile.mkdtemp(), 'synthetic.csv')
+        synthetic.write_csv(csv, args.rows)
+
+    colunas = cube.cube_columns()
+    em_memoria, t1, m1 = _medir(lambda: cube.build_cubes(prepare_dataset(pd.read_csv(csv)).loc[:, colunas]))
+    em_blocos, t2, m2 = _medir(lambda: chunked.build_cubes(chunked.iter_csv_chunks(csv, args.chunk_size, colunas)))
+    print('em memória: {:.2f}s, pico {:.1f} MB'.format(t1, m1 / 2**20))
+    print('em blocos:  {:.2f}s, pico {:.1f} MB (blocos de {} linhas)'.format(t2, m2 / 2**20, args.chunk_size))
+    for nome in cube.CUBOS:
+        print('cubo {}: {:,} células, {:.1f} MB'.format(
+            nome, len(em_blocos[nome]), em_blocos[nome].cells.memory_usage(deep=True).sum() / 2**20))
+
+    divergencias = compare(em_memoria, em_blocos)
+    for divergencia in divergencias:
+        print('DIVERGE: {} {} {} {}'.format(*divergencia))
+    print('{} consultas comparadas, {} divergências'.format(len(CONSULTAS) * len(JANELAS), len(divergencias)))
+    return 1 if divergencias else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
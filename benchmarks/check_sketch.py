@@ -0,0 +1,68 @@
+# ------------------------------------------------------------------------
+# Erro do HyperLogLog de entregadores únicos (curry_company/sketch.py)
+# ------------------------------------------------------------------------
+# Compara a contagem exata de entregadores únicos com a estimativa do esboço
+# em janelas de datas/tráfego aleatórias e por semana, e mostra o erro
+# relativo frente ao erro padrão teórico 1.04 / sqrt(2**p).
+#
+#     python -m benchmarks.check_sketch --rows 1000000 --couriers 200000
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+from curry_company import config, sketch
+from curry_company.data import prepare_dataset
+
+TRAFEGO = ['Low', 'Medium', 'High', 'Jam']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mede o erro do HyperLogLog de entregadores únicos.')
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--couriers', type=int, default=100_000, help='entregadores distintos')
+    parser.add_argument('--windows', type=int, default=200)
+    parser.add_argument('--p', type=int, default=config.HLL_PRECISION)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    df1 = prepare_dataset(synthetic.generate(args.rows))
+    df1['Delivery_person_ID'] = pd.Series(rng.integers(0, args.couriers, len(df1))).map('DEL{:06d}'.format).to_numpy()
+
+    dimensoes, coluna = sketch.SKETCHES['entregadores_unicos']
+    esboco = sketch.DistinctSketch.build(df1, dimensoes, coluna, p=args.p)
+    padrao = 1.04 / np.sqrt(2 ** args.p)
+
+    erros = []
+    datas = df1['Order_Date'].drop_duplicates().to_numpy()
+    for _ in range(args.windows):
+        i, j = sorted(rng.choice(len(datas) + 1, 2, replace=False))
+        trafego = list(rng.choice(TRAFEGO, rng.integers(1, 5), replace=False))
+        inicio = datas[i]
+        fim = datas[j] if j < len(datas) else None
+        linhas = (df1['Order_Date'] >= inicio) & df1['Road_traffic_density'].isin(trafego)
+        if fim is not None:
+            linhas &= df1['Order_Date'] < fim
+        exato = df1.loc[linhas, coluna].nunique()
+        estimado = esboco.slice(start=inicio, end=fim, traffic=trafego).nunique([]).iloc[0]
+        if exato:
+            erros.append(abs(estimado - exato) / exato)
+
+    semanas = df1.groupby(df1['Order_Date'].dt.strftime('%U'))[coluna].nunique()
+    erros_semana = ((esboco.nunique(['week_of_year']) - semanas).abs() / semanas).to_numpy()
+
+    erros = np.array(erros)
+    print('p={} ({} registradores por célula, {} células, {:.1f} MB)'.format(
+        args.p, 2 ** args.p, len(esboco), esboco.registers.nbytes / 2**20))
+    print('erro padrão teórico: {:.2%}'.format(padrao))
+    print('janelas: erro médio {:.2%}, p95 {:.2%}, máximo {:.2%}'.format(
+        erros.mean(), np.quantile(erros, 0.95), erros.max()))
+    print('semanas: erro máximo {:.2%}'.format(erros_semana.max()))
+    # ~95% das estimativas devem ficar a menos de 2 desvios padrão
+    return 0 if np.quantile(erros, 0.95) <= 2.5 * padrao else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
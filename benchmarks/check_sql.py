@@ -0,0 +1,138 @@
+# ------------------------------------------------------------------------
+# Verificação do backend SQL: KPIs iguais aos dos cubos em pandas
+# ------------------------------------------------------------------------
+# Grava o dataset limpo como snapshot Parquet, monta os cubos do pandas
+# (cube.build_cubes) e os do DuckDB (sql.build_cubes) sobre os mesmos
+# pedidos, calcula todos os KPIs (e o ranking pelo p90) em algumas janelas
+# de datas/tráfego e compara: contagens e dimensões iguais, valores com
+# tolerância relativa de 1e-9 (a ordem das somas muda). Também mostra o
+# tempo dos KPIs de cada janela em cada backend. A mesma comparação roda
+# nos testes (tests/test_sql.py).
+#
+#     python -m benchmarks.check_sql
+#     python -m benchmarks.check_sql --rows 60000 1000000
+#     python -m benchmarks.check_sql --csv ../dataset/train.csv
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+from curry_company import cube, kpis, snapshot, sql
+from curry_company.data import prepare_dataset
+
+JANELAS = [
+    (None, None, None),
+    (synthetic.DATA_INICIAL, synthetic.DATA_INICIAL + pd.Timedelta(days=synthetic.DIAS),
+     ['Low', 'Medium', 'High', 'Jam']),
+    (synthetic.DATA_INICIAL + pd.Timedelta(days=18), synthetic.DATA_INICIAL + pd.Timedelta(days=37),
+     ['Low', 'Jam']),
+]
+
+# colunas dos pedidos usadas pelo p90 no backend pandas
+COLUNAS_P90 = ['Order_Date', 'Road_traffic_density', 'City', 'Delivery_person_ID', 'Time_taken(min)']
+
+
+def same_frame(a, b):
+    """Compara dois resultados de KPI coluna a coluna.
+
+    Input: Dataframes do pandas e do SQL.
+    Output: True quando as colunas e linhas coincidem (dimensões como
+    texto, inteiros exatos e números com rtol=1e-9).
+    """
+    a, b = a.reset_index(drop=a.index.name is None), b.reset_index(drop=b.index.name is None)
+    if list(a.columns) != list(b.columns) or len(a) != len(b):
+        return False
+    for coluna in a.columns:
+        x, y = a[coluna], b[coluna]
+        if x.dtype.kind in 'iub' and y.dtype.kind in 'iub':
+            iguais = np.array_equal(x.to_numpy(), y.to_numpy())
+        elif x.dtype.kind in 'iufb' and y.dtype.kind in 'iufb':
+            iguais = np.allclose(x.to_numpy('float64'), y.to_numpy('float64'), rtol=1e-9, equal_nan=True)
+        else:
+            iguais = (x.astype(str).to_numpy() == y.astype(str).to_numpy()).all()
+        if not iguais:
+            return False
+    return True
+
+
+def _kpis(cubos, janela, pedidos=None):
+    inicio, fim, trafego = janela
+    w = kpis.Window(cubos, start=inicio, end=fim, traffic=trafego)
+    resultados = {nome: func(w) for nome, func in kpis.KPIS.items()}
+    if pedidos is not None:
+        pedidos = pedidos.loc[(pedidos['Order_Date'] >= (inicio or pd.Timestamp.min))
+                              & (pedidos['Order_Date'] < (fim or pd.Timestamp.max))]
+        if trafego is not None:
+            pedidos = pedidos.loc[pedidos['Road_traffic_density'].isin(trafego)]
+    resultados['fastest_couriers_p90'] = kpis.fastest_couriers(w, metric='p90', orders=pedidos)
+    return resultados
+
+
+def build_backends(df1, pasta):
+    """Cubos dos dois backends sobre os mesmos pedidos.
+
+    Input: Dataframe limpo e pasta onde o snapshot Parquet é gravado.
+    Output: tupla (cubos do pandas, cubos do SQL, pedidos usados pelo p90).
+    """
+    caminho = os.path.join(pasta, 'snapshot.parquet')
+    snapshot.write_snapshot(df1, caminho)
+    # contagem exata de entregadores únicos nos dois backends (sem HyperLogLog)
+    em_pandas = {nome: c for nome, c in cube.build_cubes(df1).items() if nome in cube.CUBOS}
+    return em_pandas, sql.build_cubes([caminho]), df1.loc[:, COLUNAS_P90]
+
+
+def compare_window(em_pandas, em_sql, pedidos, janela):
+    """Calcula os KPIs de uma janela nos dois backends e compara.
+
+    Input: saída de build_backends e a janela (início, fim, tráfego).
+    Output: tupla (KPIs divergentes, segundos no pandas, segundos no SQL).
+    """
+    inicio = time.perf_counter()
+    a = _kpis(em_pandas, janela, pedidos)
+    t_pandas = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    b = _kpis(em_sql, janela)
+    t_sql = time.perf_counter() - inicio
+    return [nome for nome in a if not same_frame(a[nome], b[nome])], t_pandas, t_sql
+
+
+def _verificar(df1):
+    em_pandas, em_sql, pedidos = build_backends(df1, tempfile.mkdtemp())
+    print('{:,} pedidos limpos'.format(len(df1)))
+    comparados = divergencias = 0
+    for janela in JANELAS:
+        divergentes, t_pandas, t_sql = compare_window(em_pandas, em_sql, pedidos, janela)
+        comparados += len(kpis.KPIS) + 1
+        divergencias += len(divergentes)
+        for nome in divergentes:
+            print('DIVERGE: {} {}'.format(nome, janela))
+        print('janela {} a {}: pandas {:.3f}s, duckdb {:.3f}s'.format(
+            janela[0] and janela[0].date(), janela[1] and janela[1].date(), t_pandas, t_sql))
+    print('{} KPIs comparados, {} divergências\n'.format(comparados, divergencias))
+    return divergencias
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compara os KPIs do backend SQL (DuckDB) com os do pandas.')
+    parser.add_argument('--csv', help='CSV no formato do train.csv (padrão: sintético)')
+    parser.add_argument('--rows', type=int, nargs='+', default=[60_000, 200_000],
+                        help='linhas de cada CSV sintético (60 mil tem empates no p90)')
+    args = parser.parse_args(argv)
+    if not (sql.HAS_DUCKDB and snapshot.HAS_ARROW):
+        print('duckdb e pyarrow são necessários para o backend SQL')
+        return 1
+
+    if args.csv:
+        divergencias = _verificar(prepare_dataset(pd.read_csv(args.csv)))
+    else:
+        divergencias = sum(_verificar(prepare_dataset(synthetic.generate(n))) for n in args.rows)
+    return 1 if divergencias else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
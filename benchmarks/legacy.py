@@ -0,0 +1,38 @@
+# ------------------------------------------------------------------------
+# Implementações originais, mantidas apenas como referência nos benchmarks
+# ------------------------------------------------------------------------
+import pandas as pd
+
+
+def clean_code( df1 ):
+    """clean_code original das páginas (filtros encadeados e apply linha a linha)."""
+    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
+    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
+    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
+    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
+    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
+
+    linhas_vazias = df1['Delivery_person_Age'] != 'NaN '
+    df1 = df1.loc[linhas_vazias, :]
+
+    linhas_vazias = df1['Weatherconditions'] != 'conditions NaN'
+    df1 = df1.loc[linhas_vazias, :]
+
+    linhas_vazias = df1['City'] != 'NaN'
+    df1 = df1.loc[linhas_vazias, :]
+
+    linhas_vazias = df1['Road_traffic_density'] != 'NaN'
+    df1 = df1.loc[linhas_vazias, :]
+    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype( int )
+
+    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype( float )
+
+    df1['Order_Date'] = pd.to_datetime( df1['Order_Date'], format='%d-%m-%Y')
+
+    linhas_vazias = df1['multiple_deliveries'] != 'NaN '
+    df1 = df1.loc[linhas_vazias, :]
+    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype( int )
+
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split('(min) ')[1])
+
+    return df1
@@ -0,0 +1,365 @@
+# ------------------------------------------------------------------------
+# Teste de carga: várias sessões simultâneas no app Streamlit
+# ------------------------------------------------------------------------
+# Sobe o app localmente (ou usa um já no ar, com --url) e abre N sessões ao
+# mesmo tempo pelo mesmo websocket que o navegador usa. Página a página
+# (Home e as três visões), cada sessão abre a página e faz --interactions
+# reruns movendo o slider de datas e trocando os tipos de tráfego
+# escolhidos. Para cada página o relatório traz a latência do rerun (p50,
+# p95, p99), a vazão e o maior RSS do servidor durante a fase.
+#
+#     python -m benchmarks.load_test --sessions 20 --interactions 5
+#     python -m benchmarks.load_test --sessions 50 --report load.json --max-p95 2.0
+#     python -m benchmarks.load_test --url http://127.0.0.1:8501 --pid 1234
+#
+# Com --max-p95/--max-p99 o código de saída é 1 quando alguma página passa
+# do orçamento (para barrar um deploy). As variáveis CURRY_* do ambiente são
+# repassadas ao app (ex.: CURRY_DATASET_PATH).
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+try:
+    import websockets
+    HAS_WEBSOCKETS = True
+except ImportError:  # o Streamlit 1.15 traz o tornado no lugar do websockets
+    from tornado.websocket import websocket_connect
+    HAS_WEBSOCKETS = False
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAFEGO = ['Low', 'Medium', 'High', 'Jam']
+# rotas do websocket e da verificação de saúde (versões novas e a 1.15)
+ROTAS_STREAM = ['_stcore/stream', 'stream']
+ROTAS_SAUDE = ['_stcore/health', 'healthz']
+
+
+# ------------------------------------------------------------------------
+# Servidor
+# ------------------------------------------------------------------------
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _saudavel(url):
+    for rota in ROTAS_SAUDE:
+        try:
+            with urllib.request.urlopen('{}/{}'.format(url, rota), timeout=1) as resposta:
+                if resposta.status == 200:
+                    return True
+        except OSError:
+            pass
+    return False
+
+
+def start_app(script='Home.py', timeout=60, env=None, stderr=None):
+    """Sobe o app com streamlit run numa porta livre.
+
+    Input: script principal, tempo máximo de espera (s), variáveis de
+    ambiente extras e arquivo que recebe o stderr do app (padrão: descartado).
+    Output: (processo, url).
+    """
+    porta = _porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', script,
+         '--server.headless', 'true', '--server.port', str(porta),
+         '--browser.gatherUsageStats', 'false'],
+        cwd=RAIZ, env=dict(os.environ, **(env or {})), stdout=subprocess.DEVNULL,
+        stderr=stderr if stderr is not None else subprocess.DEVNULL)
+    url = 'http://127.0.0.1:{}'.format(porta)
+    limite = time.time() + timeout
+    while not _saudavel(url):
+        if processo.poll() is not None or time.time() > limite:
+            processo.kill()
+            raise RuntimeError('o app não subiu em {}s'.format(timeout))
+        time.sleep(0.2)
+    return processo, url
+
+
+def rss_mb(pid):
+    """RSS do processo em MB, lido do /proc (Linux).
+
+    Output: float ou None quando o /proc não está disponível.
+    """
+    try:
+        with open('/proc/{}/status'.format(pid)) as arquivo:
+            for linha in arquivo:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+# ------------------------------------------------------------------------
+# Sessão
+# ------------------------------------------------------------------------
+async def _conectar(url):
+    # devolve (enviar, receber, fechar) sobre a biblioteca disponível
+    base = url.replace('http', 'ws', 1)
+    erro = None
+    for rota in ROTAS_STREAM:
+        try:
+            if HAS_WEBSOCKETS:
+                ws = await websockets.connect('{}/{}'.format(base, rota), subprotocols=['streamlit'],
+                                              max_size=None)
+                return ws.send, ws.recv, ws.close
+            ws = await websocket_connect('{}/{}'.format(base, rota), subprotocols=['streamlit'],
+                                         max_message_size=2 ** 30)
+            return (lambda dados: ws.write_message(dados, binary=True)), ws.read_message, ws.close
+        except Exception as exc:  # rota da outra versão do Streamlit
+            erro = exc
+    raise erro
+
+
+class Session:
+    """Uma sessão do navegador simulada pelo websocket do Streamlit.
+
+    - pages: nome da página -> page_script_hash (do NewSession).
+    - widgets: id -> proto do slider/multiselect da última execução.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.pages = {}
+        self.widgets = {}
+        self.errors = 0
+        self._enviar = self._receber = self._fechar = None
+
+    async def open(self):
+        self._enviar, self._receber, self._fechar = await _conectar(self.url)
+
+    async def close(self):
+        await self._fechar()
+
+    async def rerun(self, page_hash='', page_name='', estados=()):
+        """Pede um rerun e espera o fim do script.
+
+        Input: página (hash e nome) e estados dos widgets (WidgetState).
+        Output: latência em segundos.
+        """
+        msg = BackMsg()
+        estado = msg.rerun_script
+        estado.query_string = ''
+        estado.page_script_hash = page_hash
+        estado.page_name = page_name
+        estado.widget_states.widgets.extend(estados)
+
+        inicio = time.perf_counter()
+        await self._enviar(msg.SerializeToString())
+        self.widgets = {}
+        while True:
+            dados = await self._receber()
+            if dados is None:
+                raise ConnectionError('websocket fechado pelo servidor')
+            resposta = ForwardMsg()
+            resposta.ParseFromString(dados)
+            tipo = resposta.WhichOneof('type')
+            if tipo in ('new_session', 'navigation'):
+                # as versões novas mandam as páginas na mensagem de navegação
+                paginas = getattr(resposta, tipo).app_pages
+                self.pages.update({p.page_name: p.page_script_hash for p in paginas if p.page_name})
+            elif tipo == 'delta' and resposta.delta.WhichOneof('type') == 'new_element':
+                elemento = resposta.delta.new_element
+                nome = elemento.WhichOneof('type')
+                if nome in ('slider', 'multiselect'):
+                    proto = getattr(elemento, nome)
+                    self.widgets[proto.id] = (nome, proto)
+                elif nome == 'exception':
+                    self.errors += 1
+            elif tipo == 'script_finished':
+                # um rerun antecipado não marca o fim da execução pedida
+                if resposta.script_finished in (ForwardMsg.FINISHED_SUCCESSFULLY,
+                                                ForwardMsg.FINISHED_WITH_COMPILE_ERROR):
+                    self.errors += resposta.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR
+                    return time.perf_counter() - inicio
+
+
+def interaction(widgets, rng):
+    """Estados dos widgets de uma interação: janela de datas e tráfego sorteados.
+
+    Input: widgets da última execução (Session.widgets) e gerador aleatório.
+    Output: lista de WidgetState.
+    """
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    estados = []
+    for widget_id, (nome, proto) in widgets.items():
+        estado = WidgetState(id=widget_id)
+        if nome == 'slider' and len(proto.default) == 2:  # o slider de datas
+            passos = max(int((proto.max - proto.min) // (proto.step or 1)), 1)
+            a, b = sorted(rng.choice(passos + 1, 2, replace=False))
+            estado.double_array_value.data.extend([proto.min + a * proto.step, proto.min + b * proto.step])
+        elif nome == 'multiselect' and set(proto.options) >= set(TRAFEGO):
+            escolha = [o for o in proto.options if rng.random() < 0.75] or [proto.options[0]]
+            if 'raw_values' in proto.DESCRIPTOR.fields_by_name:
+                estado.string_array_value.data.extend(escolha)
+            else:  # Streamlit 1.15: índices das opções
+                estado.int_array_value.data.extend([list(proto.options).index(o) for o in escolha])
+        else:
+            continue
+        estados.append(estado)
+    return estados
+
+
+async def run_session(url, page, interactions, seed, latencias):
+    """Abre a página e faz as interações, anotando cada latência.
+
+    Input: url do app, nome da página ('' para a Home), quantidade de
+    interações, semente e lista onde as latências são acrescentadas.
+    Output: quantidade de erros (exceções na página).
+    """
+    rng = np.random.default_rng(seed)
+    sessao = Session(url)
+    await sessao.open()
+    try:
+        latencias.append(await sessao.rerun())  # a Home abre sempre primeiro
+        if page:
+            hash_pagina = sessao.pages[page]
+            latencias.append(await sessao.rerun(hash_pagina, page))
+        else:
+            hash_pagina = ''
+        for _ in range(interactions):
+            estados = interaction(sessao.widgets, rng)
+            latencias.append(await sessao.rerun(hash_pagina, page, estados))
+    finally:
+        await sessao.close()
+    return sessao.errors
+
+
+# ------------------------------------------------------------------------
+# Fases e relatório
+# ------------------------------------------------------------------------
+async def _amostrar_rss(pid, amostras, parar):
+    while not parar.is_set():
+        valor = rss_mb(pid) if pid else None
+        if valor is not None:
+            amostras.append(valor)
+        await asyncio.sleep(0.1)
+
+
+async def run_phase(url, page, sessions, interactions, pid, seed=0):
+    """Todas as sessões na mesma página ao mesmo tempo.
+
+    Output: dicionário com as medidas da fase.
+    """
+    latencias, amostras, parar = [], [], asyncio.Event()
+    amostrador = asyncio.ensure_future(_amostrar_rss(pid, amostras, parar))
+    inicio = time.perf_counter()
+    erros = await asyncio.gather(*[run_session(url, page, interactions, seed + i, latencias)
+                                   for i in range(sessions)])
+    duracao = time.perf_counter() - inicio
+    parar.set()
+    await amostrador
+
+    valores = np.array(latencias)
+    return {
+        'reruns': len(valores),
+        'errors': int(sum(erros)),
+        'duration_s': duracao,
+        'throughput_rps': len(valores) / duracao,
+        'p50_s': float(np.percentile(valores, 50)),
+        'p95_s': float(np.percentile(valores, 95)),
+        'p99_s': float(np.percentile(valores, 99)),
+        'max_s': float(valores.max()),
+        'rss_mb_max': max(amostras) if amostras else None,
+    }
+
+
+async def _descobrir_paginas(url):
+    sessao = Session(url)
+    await sessao.open()
+    try:
+        await sessao.rerun()
+    finally:
+        await sessao.close()
+    return sessao.pages
+
+
+def over_budget(paginas, max_p95=None, max_p99=None):
+    """Páginas acima do orçamento de latência.
+
+    Output: lista de (página, medida, valor, orçamento).
+    """
+    estouros = []
+    for pagina, medidas in paginas.items():
+        for medida, limite in (('p95_s', max_p95), ('p99_s', max_p99)):
+            if limite is not None and medidas[medida] > limite:
+                estouros.append((pagina, medida, medidas[medida], limite))
+    return estouros
+
+
+async def _main(args, url, pid):
+    paginas_app = await _descobrir_paginas(url)
+    # a Home é a página do script principal; as demais vêm da pasta pages/
+    paginas = args.pages or [''] + [p for p in paginas_app if p != 'Home']
+    resultados = {}
+    print('{:<24} {:>7} {:>6} {:>8} {:>8} {:>8} {:>8} {:>9}'.format(
+        'página', 'reruns', 'erros', 'p50(s)', 'p95(s)', 'p99(s)', 'rps', 'RSS(MB)'))
+    for pagina in paginas:
+        if pagina and pagina not in paginas_app:
+            raise SystemExit('página desconhecida: {} (disponíveis: {})'.format(pagina, ', '.join(paginas_app)))
+        medidas = await run_phase(url, pagina, args.sessions, args.interactions, pid, seed=args.seed)
+        resultados[pagina or 'Home'] = medidas
+        print('{:<24} {:>7} {:>6} {:>8.3f} {:>8.3f} {:>8.3f} {:>8.2f} {:>9}'.format(
+            pagina or 'Home', medidas['reruns'], medidas['errors'], medidas['p50_s'], medidas['p95_s'],
+            medidas['p99_s'], medidas['throughput_rps'],
+            '-' if medidas['rss_mb_max'] is None else '{:.0f}'.format(medidas['rss_mb_max'])))
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Teste de carga com várias sessões simultâneas.')
+    parser.add_argument('--sessions', type=int, default=10, help='sessões simultâneas por página')
+    parser.add_argument('--interactions', type=int, default=5, help='reruns com filtros novos por sessão')
+    parser.add_argument('--pages', nargs='+', help='nomes das páginas (padrão: todas)')
+    parser.add_argument('--url', help='app já no ar (padrão: sobe um novo)')
+    parser.add_argument('--pid', type=int, help='pid do app já no ar (para o RSS)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report', help='grava o relatório em JSON')
+    parser.add_argument('--max-p95', type=float, help='orçamento de p95 por página (s)')
+    parser.add_argument('--max-p99', type=float, help='orçamento de p99 por página (s)')
+    args = parser.parse_args(argv)
+
+    processo = None
+    url, pid = args.url, args.pid
+    if url is None:
+        processo, url = start_app()
+        pid = processo.pid
+    try:
+        resultados = asyncio.run(_main(args, url.rstrip('/'), pid))
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+
+    estouros = over_budget(resultados, args.max_p95, args.max_p99)
+    if args.report:
+        relatorio = {
+            'sessions': args.sessions,
+            'interactions': args.interactions,
+            'budget': {'p95_s': args.max_p95, 'p99_s': args.max_p99},
+            'pages': resultados,
+            'over_budget': [{'page': p, 'metric': m, 'value': v, 'budget': b} for p, m, v, b in estouros],
+        }
+        with open(args.report, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=2)
+        print('relatório gravado em {}'.format(args.report))
+    for pagina, medida, valor, limite in estouros:
+        print('ACIMA DO ORCAMENTO {} {}: {:.3f}s > {:.3f}s'.format(pagina, medida, valor, limite))
+    return 1 if estouros else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
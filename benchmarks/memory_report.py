@@ -0,0 +1,124 @@
+# ------------------------------------------------------------------------
+# Relatório de memória do dataset limpo, coluna a coluna
+# ------------------------------------------------------------------------
+# Compara o dataframe do clean_code original (textos como objetos Python,
+# float64 e int64) com o do prepare_dataset atual (categorias, IDs como
+# inteiros, float32 e inteiros reduzidos): tipo e memória (deep=True) de
+# cada coluna e o total.
+#
+# Também mede o pico de memória alocada (tracemalloc) de um rerun:
+# - antes: o que cada rerun das páginas originais fazia (limpar uma cópia do
+#   dataset e filtrar a janela, com cópia);
+# - depois: um rerun com os cubos e o índice de datas já em cache (todos os
+#   KPIs da janela e o recorte dos pedidos usado pelo p90).
+#
+#     python -m benchmarks.memory_report --rows 1000000
+import argparse
+import gc
+import sys
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+from benchmarks import legacy, synthetic
+from curry_company import cube, kpis
+from curry_company.data import prepare_dataset
+from curry_company.index import DateIndex
+
+JANELA = dict(start=synthetic.DATA_INICIAL,
+              end=synthetic.DATA_INICIAL + pd.Timedelta(days=synthetic.DIAS),
+              traffic=['Low', 'Medium', 'High'])
+
+# colunas do recorte de pedidos da página de entregadores (p90)
+COLUNAS_P90 = ['Order_Date', 'Road_traffic_density', 'City', 'Delivery_person_ID', 'Time_taken(min)']
+
+
+def _mb(n_bytes):
+    return n_bytes / 2 ** 20
+
+
+def column_report(antes, depois):
+    """Tipo e memória de cada coluna nas duas representações.
+
+    Input: Dataframe original e Dataframe compacto.
+    Output: Dataframe com uma linha por coluna (e a linha 'total').
+    """
+    memoria_antes = antes.memory_usage(deep=True, index=False)
+    memoria_depois = depois.memory_usage(deep=True, index=False)
+    colunas = list(antes.columns) + [c for c in depois.columns if c not in antes.columns]
+    df_aux = pd.DataFrame({
+        'dtype_antes': [str(antes[c].dtype) if c in antes else '-' for c in colunas],
+        'mb_antes': [_mb(memoria_antes.get(c, 0)) for c in colunas],
+        'dtype_depois': [str(depois[c].dtype) if c in depois else '-' for c in colunas],
+        'mb_depois': [_mb(memoria_depois.get(c, 0)) for c in colunas],
+    }, index=colunas)
+    df_aux.loc['total'] = ['', df_aux['mb_antes'].sum(), '', df_aux['mb_depois'].sum()]
+    return df_aux
+
+
+def _pico(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _rerun_original(bruto):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # SettingWithCopyWarning da versão original
+        df1 = legacy.clean_code(bruto.copy())
+    linhas = ((df1['Order_Date'] >= JANELA['start']) & (df1['Order_Date'] < JANELA['end'])
+              & df1['Road_traffic_density'].isin(JANELA['traffic']))
+    return df1.loc[linhas, :]
+
+
+def _rerun_atual(cubos, indice):
+    janela = kpis.Window(cubos, **JANELA)
+    resultados = {nome: func(janela) for nome, func in kpis.KPIS.items()}
+    resultados['p90'] = kpis.fastest_couriers(janela, metric='p90', orders=indice.select(**JANELA))
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Memória do dataset limpo por coluna e pico por rerun.')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    bruto = synthetic.generate(args.rows)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        antes = legacy.clean_code(bruto.copy())
+    depois = prepare_dataset(bruto.copy())
+
+    relatorio = column_report(antes, depois)
+    print('{:,} linhas brutas, {:,} limpas\n'.format(len(bruto), len(depois)))
+    print('{:<28} {:>16} {:>10} {:>16} {:>10} {:>7}'.format(
+        'coluna', 'antes', 'MB', 'depois', 'MB', 'fator'))
+    for coluna, linha in relatorio.iterrows():
+        fator = ''
+        if linha['mb_antes'] and linha['mb_depois']:  # colunas derivadas não existiam antes
+            fator = '{:.1f}x'.format(linha['mb_antes'] / linha['mb_depois'])
+        print('{:<28} {:>16} {:>10.1f} {:>16} {:>10.1f} {:>7}'.format(
+            coluna, linha['dtype_antes'], linha['mb_antes'], linha['dtype_depois'], linha['mb_depois'], fator))
+    del antes
+    gc.collect()
+
+    # caches do processo já montados (como num servidor aquecido)
+    cubos = cube.build_cubes(depois)
+    indice = DateIndex(depois.loc[:, COLUNAS_P90])
+    del depois
+    gc.collect()
+
+    pico_antes = _pico(lambda: _rerun_original(bruto))
+    pico_depois = _pico(lambda: _rerun_atual(cubos, indice))
+    print('\npico por rerun: antes {:.1f} MB, depois {:.1f} MB ({:.1f}x menor)'.format(
+        _mb(pico_antes), _mb(pico_depois), pico_antes / pico_depois))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# ------------------------------------------------------------------------
+# Perfil de partida a frio: imports e primeira execução de cada página
+# ------------------------------------------------------------------------
+# Para cada página sobe um servidor novo (como depois de um restart do
+# container), com PYTHONPROFILEIMPORTTIME=1, abre uma sessão pelo websocket
+# (ver benchmarks/load_test.py) e mede:
+#   - servidor: do streamlit run até a rota de saúde responder;
+#   - home: primeira execução da Home (a sessão sempre abre nela);
+#   - primeira: primeira execução da página (imports, leitura do dataset,
+#     cubos e gráficos, tudo a frio);
+#   - imports: parte da primeira execução gasta importando módulos (soma
+#     dos imports de primeiro nível do -X importtime nesse intervalo);
+#   - quente: segunda execução da página, com módulos e caches carregados.
+# Os módulos mais caros importados na primeira execução também são listados.
+# Com --repeat cada página é medida em vários servidores novos e o perfil
+# traz a mediana de cada tempo.
+#
+#     python -m benchmarks.startup_profile --repeat 3
+#     python -m benchmarks.startup_profile --pages visao_empresa --top 8 --report startup.json
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.load_test import Session, start_app
+
+# 'import time:  self [us] | cumulative | módulo' (a indentação do nome
+# indica a profundidade do import)
+_LINHA_IMPORT = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+
+def parse_importtime(texto):
+    """Imports de primeiro nível de um trecho da saída do -X importtime.
+
+    Input: texto do stderr.
+    Output: lista de (módulo, segundos acumulados).
+    """
+    imports = []
+    for linha in texto.splitlines():
+        encontrado = _LINHA_IMPORT.match(linha)
+        if encontrado and not encontrado.group(3):
+            imports.append((encontrado.group(4), int(encontrado.group(2)) / 1e6))
+    return imports
+
+
+def profile_page(page, top=5, repeat=1):
+    """Sobe servidores novos e mede a partida a frio de uma página.
+
+    Input: nome da página ('' para a Home), quantidade de módulos listados e
+    quantidade de servidores (a mediana de cada tempo é devolvida).
+    Output: dicionário com os tempos (s), os erros e os imports mais caros.
+    """
+    medidas = []
+    for _ in range(repeat):
+        with tempfile.TemporaryFile(mode='w+') as stderr:
+            inicio = time.perf_counter()
+            processo, url = start_app(env={'PYTHONPROFILEIMPORTTIME': '1'}, stderr=stderr)
+            servidor = time.perf_counter() - inicio
+            try:
+                home, primeira, quente, erros, trecho = asyncio.run(_medir(url, page, stderr))
+            finally:
+                processo.terminate()
+                processo.wait()
+        imports = parse_importtime(trecho)
+        medidas.append((servidor, home, primeira, sum(s for _, s in imports), quente, erros, imports))
+
+    def mediana(i):
+        return statistics.median(m[i] for m in medidas)
+
+    # módulos da execução com a primeira execução mediana
+    imports = sorted(medidas, key=lambda m: m[2])[len(medidas) // 2][6]
+    imports = sorted(imports, key=lambda item: -item[1])
+    return {
+        'server_s': mediana(0),
+        'home_s': mediana(1),
+        'first_s': mediana(2),
+        'import_s': mediana(3),
+        'warm_s': mediana(4),
+        'errors': sum(m[5] for m in medidas),
+        'top_imports': [{'module': m, 'seconds': s} for m, s in imports[:top]],
+    }
+
+
+async def _medir(url, page, stderr):
+    # a sessão abre na Home; a primeira execução medida é a da página (ou a
+    # da própria Home) e o trecho do stderr escrito durante ela é devolvido
+    sessao = Session(url)
+    await sessao.open()
+    try:
+        inicio_trecho = stderr.seek(0, 2)
+        home = await sessao.rerun()
+        primeira = home
+        if page:
+            hash_pagina = sessao.pages.get(page)
+            if hash_pagina is None:
+                raise SystemExit('página desconhecida: {} (disponíveis: {})'.format(page, ', '.join(sessao.pages)))
+            inicio_trecho = stderr.seek(0, 2)
+            primeira = await sessao.rerun(hash_pagina, page)
+        else:
+            hash_pagina = ''
+        fim_trecho = stderr.seek(0, 2)
+        quente = await sessao.rerun(hash_pagina, page)
+    finally:
+        await sessao.close()
+    stderr.seek(inicio_trecho)
+    return home, primeira, quente, sessao.errors, stderr.read(fim_trecho - inicio_trecho)
+
+
+async def _paginas():
+    processo, url = start_app()
+    try:
+        sessao = Session(url)
+        await sessao.open()
+        try:
+            await sessao.rerun()
+        finally:
+            await sessao.close()
+    finally:
+        processo.terminate()
+        processo.wait()
+    return [p for p in sessao.pages if p != 'Home']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Imports e primeira execução de cada página, a frio.')
+    parser.add_argument('--pages', nargs='+', help='nomes das páginas (padrão: Home e todas as visões)')
+    parser.add_argument('--top', type=int, default=5, help='módulos mais caros listados por página')
+    parser.add_argument('--repeat', type=int, default=1, help='servidores novos por página (mediana)')
+    parser.add_argument('--report', help='grava o perfil em JSON')
+    args = parser.parse_args(argv)
+
+    paginas = args.pages or [''] + asyncio.run(_paginas())
+    resultados = {}
+    print('{:<24} {:>11} {:>8} {:>11} {:>10} {:>9} {:>6}'.format(
+        'página', 'servidor(s)', 'home(s)', 'primeira(s)', 'imports(s)', 'quente(s)', 'erros'))
+    for pagina in paginas:
+        medidas = profile_page(pagina, args.top, args.repeat)
+        resultados[pagina or 'Home'] = medidas
+        print('{:<24} {:>11.2f} {:>8.2f} {:>11.2f} {:>10.2f} {:>9.2f} {:>6}'.format(
+            pagina or 'Home', medidas['server_s'], medidas['home_s'], medidas['first_s'],
+            medidas['import_s'], medidas['warm_s'], medidas['errors']))
+    print()
+    for pagina, medidas in resultados.items():
+        modulos = ', '.join('{} {:.2f}s'.format(i['module'], i['seconds']) for i in medidas['top_imports'])
+        print('{:<24} {}'.format(pagina, modulos or '-'))
+
+    if args.report:
+        with open(args.report, 'w') as arquivo:
+            json.dump(resultados, arquivo, indent=2)
+        print('\nperfil gravado em {}'.format(args.report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
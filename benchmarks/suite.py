@@ -0,0 +1,196 @@
+# ------------------------------------------------------------------------
+# Suíte de micro-benchmarks: cada função das páginas, isolada, por escala
+# ------------------------------------------------------------------------
+# Para cada tamanho de dataset sintético (ver benchmarks/synthetic.py) mede,
+# função a função, o melhor tempo entre as repetições e o pico de memória
+# alocada (tracemalloc, numa execução à parte para não distorcer o tempo).
+# A preparação da entrada de cada caso (cópia do bruto, janela já recortada)
+# não entra na medida.
+#
+# O resultado pode ser gravado como referência e comparado depois:
+#
+#     python -m benchmarks.suite --rows 45000 1000000 --save baseline.json
+#     python -m benchmarks.suite --rows 45000 1000000 --compare baseline.json
+#     python -m benchmarks.suite --only clean_code kpi.orders_per_courier_by_week
+#
+# Com --compare, casos mais lentos (ou que alocam mais) que a referência
+# além da tolerância são marcados como REGRESSAO e o código de saída é 1.
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks import synthetic
+from curry_company import cube, geo, kpis, maps
+from curry_company.data import clean_code, prepare_dataset
+from curry_company.index import DateIndex
+
+TAMANHOS = [45_000, 1_000_000, 10_000_000]
+
+# diferenças de tempo abaixo disso são ruído de medida, não regressão
+PISO_SEGUNDOS = 0.002
+PISO_MB = 0.5
+
+
+class Contexto:
+    """Entradas de um tamanho, montadas uma única vez e só quando algum
+    caso precisa delas."""
+
+    def __init__(self, n_rows):
+        self.n_rows = n_rows
+        self._itens = {}
+
+    def _item(self, nome, builder):
+        if nome not in self._itens:
+            self._itens[nome] = builder()
+        return self._itens[nome]
+
+    @property
+    def bruto(self):
+        return self._item('bruto', lambda: synthetic.generate(self.n_rows))
+
+    @property
+    def limpo(self):
+        return self._item('limpo', lambda: prepare_dataset(self.bruto))
+
+    @property
+    def cubos(self):
+        return self._item('cubos', lambda: cube.build_cubes(self.limpo))
+
+    @property
+    def indice(self):
+        return self._item('indice', lambda: DateIndex(self.limpo))
+
+    def janela(self):
+        # janela com todo o período e todos os tipos de tráfego (o caso mais
+        # pesado), com os cubos já recortados
+        janela = kpis.Window(self.cubos, **JANELA)
+        janela.pedidos, janela.entregadores, janela.unicos
+        return janela
+
+
+JANELA = dict(start=synthetic.DATA_INICIAL,
+              end=synthetic.DATA_INICIAL + pd.Timedelta(days=synthetic.DIAS),
+              traffic=['Low', 'Medium', 'High', 'Jam'])
+
+
+# Casos: nome -> (preparação da entrada, função medida)
+CASOS = {
+    'clean_code': (lambda ctx: ctx.bruto.copy(), clean_code),
+    'prepare_dataset': (lambda ctx: ctx.bruto.copy(), prepare_dataset),
+    'distance': (lambda ctx: ctx.limpo, geo.distance_km),
+    'build_cubes': (lambda ctx: ctx.limpo, cube.build_cubes),
+    'date_index': (lambda ctx: ctx.limpo, DateIndex),
+    'window_slice': (lambda ctx: ctx.cubos, lambda cubos: kpis.Window(cubos, **JANELA).pedidos),
+    'date_index.select': (lambda ctx: ctx.indice, lambda indice: indice.select(**JANELA)),
+    'top_delivers.p90': (lambda ctx: (ctx.janela(), ctx.indice.select(**JANELA)),
+                         lambda entrada: kpis.fastest_couriers(entrada[0], metric='p90', orders=entrada[1])),
+    'country_maps': (lambda ctx: (ctx.indice.select(**JANELA), kpis.map_centers(ctx.janela())),
+                     lambda entrada: maps.build_map(entregas=entrada[0], restaurantes=entrada[0],
+                                                    centros=entrada[1]).render()),
+}
+for _nome, _func in kpis.KPIS.items():
+    CASOS['kpi.' + _nome] = (lambda ctx: ctx.janela(), _func)
+
+
+def medir(preparar, func, ctx, repeticoes):
+    """Melhor tempo (s) e pico de memória (MB) de func(preparar(ctx)).
+
+    Input: preparação, função medida, contexto e quantidade de repetições.
+    Output: (tempo, pico).
+    """
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        entrada = preparar(ctx)
+        gc.collect()
+        inicio = time.perf_counter()
+        func(entrada)
+        melhor = min(melhor, time.perf_counter() - inicio)
+
+    entrada = preparar(ctx)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(entrada)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return melhor, pico / 2 ** 20
+
+
+def comparar(atual, referencia, tolerancia):
+    """Lista as regressões de atual em relação à referência.
+
+    Input: resultados (tamanho -> caso -> medidas), referência no mesmo
+    formato e tolerância relativa (0.2 = 20%).
+    Output: lista de (tamanho, caso, medida, referência, atual).
+    """
+    regressoes = []
+    for tamanho, casos in atual.items():
+        for caso, medidas in casos.items():
+            base = referencia.get(tamanho, {}).get(caso)
+            if base is None:
+                continue
+            for medida, piso in (('time_s', PISO_SEGUNDOS), ('peak_mb', PISO_MB)):
+                if medidas[medida] > base[medida] * (1 + tolerancia) and medidas[medida] - base[medida] > piso:
+                    regressoes.append((tamanho, caso, medida, base[medida], medidas[medida]))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mede cada função das páginas em várias escalas.')
+    parser.add_argument('--rows', type=int, nargs='+', default=TAMANHOS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+', help='casos a medir (padrão: todos)')
+    parser.add_argument('--save', help='grava os resultados em JSON (referência)')
+    parser.add_argument('--compare', help='JSON de referência gravado com --save')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='tolerância relativa (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    casos = args.only or list(CASOS)
+    desconhecidos = [c for c in casos if c not in CASOS]
+    if desconhecidos:
+        parser.error('casos desconhecidos: {} (disponíveis: {})'.format(desconhecidos, ', '.join(CASOS)))
+    referencia = {}
+    if args.compare:
+        with open(args.compare) as arquivo:
+            referencia = json.load(arquivo)['results']
+
+    resultados = {}
+    for n_rows in args.rows:
+        ctx = Contexto(n_rows)
+        tamanho = str(n_rows)
+        resultados[tamanho] = {}
+        print('\n{:,} linhas'.format(n_rows))
+        print('{:<36} {:>10} {:>10} {:>10}'.format('caso', 'tempo(s)', 'pico(MB)', 'vs ref'))
+        for caso in casos:
+            preparar, func = CASOS[caso]
+            tempo, pico = medir(preparar, func, ctx, args.repeat)
+            resultados[tamanho][caso] = {'time_s': tempo, 'peak_mb': pico}
+            base = referencia.get(tamanho, {}).get(caso)
+            relacao = '{:>9.2f}x'.format(tempo / base['time_s']) if base and base['time_s'] else ''
+            print('{:<36} {:>10.4f} {:>10.1f} {:>10}'.format(caso, tempo, pico, relacao))
+        del ctx
+        gc.collect()
+
+    if args.save:
+        with open(args.save, 'w') as arquivo:
+            json.dump({'repeat': args.repeat, 'results': resultados}, arquivo, indent=2)
+        print('\nreferência gravada em {}'.format(args.save))
+
+    if args.compare:
+        regressoes = comparar(resultados, referencia, args.tolerance)
+        print()
+        for tamanho, caso, medida, antes, depois in regressoes:
+            print('REGRESSAO {:>12} {:<36} {}: {:.4f} -> {:.4f}'.format(tamanho, caso, medida, antes, depois))
+        print('{} regressões (tolerância {:.0%})'.format(len(regressoes), args.tolerance))
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# ------------------------------------------------------------------------
+# Gerador determinístico de dados sintéticos no formato do train.csv
+# ------------------------------------------------------------------------
+# Reproduz as "sujeiras" do arquivo original: textos com espaço no final,
+# sentinelas 'NaN ' / 'conditions NaN', tempos no formato '(min) 24' e
+# coordenadas zeradas ou negativas. O dataframe gerado tem os mesmos tipos
+# que o pd.read_csv produz para o arquivo real.
+#
+#     python -m benchmarks.synthetic --rows 1000000 --out ../dataset/synthetic.csv
+import argparse
+
+import numpy as np
+import pandas as pd
+
+CIDADES = ['Metropolitian ', 'Urban ', 'Semi-Urban ', 'NaN ']
+TRAFEGO = ['Low ', 'Medium ', 'High ', 'Jam ', 'NaN ']
+CLIMA = ['conditions Sunny', 'conditions Stormy', 'conditions Sandstorms', 'conditions Cloudy',
+         'conditions Fog', 'conditions Windy', 'conditions NaN']
+PEDIDOS = ['Snack ', 'Meal ', 'Drinks ', 'Buffet ']
+VEICULOS = ['motorcycle ', 'scooter ', 'electric_scooter ', 'bicycle ']
+FESTIVAL = ['No ', 'Yes ', 'NaN ']
+ENTREGAS = ['0', '1', '2', '3', 'NaN ']
+
+DATA_INICIAL = pd.Timestamp('2022-02-11')
+DIAS = 55
+N_ENTREGADORES = 1320
+
+
+def _com_ausentes(rng, valores, taxa):
+    valores = valores.astype(object)
+    valores[rng.random(len(valores)) < taxa] = 'NaN '
+    return valores
+
+
+def generate(n_rows, seed=42, start_id=0):
+    """Gera um dataframe bruto com n_rows pedidos.
+
+    Input:
+        - n_rows: quantidade de linhas.
+        - seed: semente do gerador (mesma semente, mesmos dados).
+        - start_id: primeiro ID de pedido (útil para gerar lotes sem repetição).
+    Output: Dataframe no formato lido do train.csv.
+    """
+    rng = np.random.default_rng(seed)
+
+    # 22 cidades x 20 restaurantes x 3 entregadores: N_ENTREGADORES IDs distintos
+    entregadores = np.array(['CITY{:02d}RES{:02d}DEL{:02d} '.format(i % 22, i // 22 % 20, i // 440)
+                             for i in range(N_ENTREGADORES)], dtype=object)
+    restaurante_lat = rng.uniform(12.0, 30.0, n_rows)
+    restaurante_lon = rng.uniform(72.0, 88.0, n_rows)
+    # ~1% das coordenadas do restaurante vêm zeradas ou negativas, como no original
+    invalidas = rng.random(n_rows) < 0.01
+    restaurante_lat[invalidas] = -restaurante_lat[invalidas] * rng.integers(0, 2, invalidas.sum())
+    restaurante_lon[invalidas] = -restaurante_lon[invalidas] * rng.integers(0, 2, invalidas.sum())
+
+    datas = DATA_INICIAL + pd.to_timedelta(rng.integers(0, DIAS, n_rows), unit='D')
+    horas = pd.to_timedelta(rng.integers(8 * 60, 23 * 60, n_rows), unit='min')
+
+    df = pd.DataFrame({
+        'ID': ['0x{:x} '.format(i) for i in range(start_id, start_id + n_rows)],
+        'Delivery_person_ID': entregadores[rng.integers(0, N_ENTREGADORES, n_rows)],
+        'Delivery_person_Age': _com_ausentes(rng, rng.integers(15, 40, n_rows).astype(str), 0.04),
+        'Delivery_person_Ratings': _com_ausentes(rng, np.round(rng.uniform(2.5, 5.0, n_rows), 1).astype(str), 0.04),
+        'Restaurant_latitude': restaurante_lat,
+        'Restaurant_longitude': restaurante_lon,
+        'Delivery_location_latitude': np.abs(restaurante_lat) + rng.uniform(0.01, 0.15, n_rows),
+        'Delivery_location_longitude': np.abs(restaurante_lon) + rng.uniform(0.01, 0.15, n_rows),
+        'Order_Date': datas.strftime('%d-%m-%Y'),
+        'Time_Orderd': _com_ausentes(rng, (pd.Timestamp(0) + horas).strftime('%H:%M:%S').to_numpy(), 0.04),
+        'Time_Order_picked': (pd.Timestamp(0) + horas + pd.Timedelta(minutes=10)).strftime('%H:%M:%S'),
+        'Weatherconditions': rng.choice(CLIMA, n_rows, p=[.16, .16, .16, .17, .17, .16, .02]),
+        'Road_traffic_density': rng.choice(TRAFEGO, n_rows, p=[.34, .24, .10, .31, .01]),
+        'Vehicle_condition': rng.integers(0, 4, n_rows),
+        'Type_of_order': rng.choice(PEDIDOS, n_rows),
+        'Type_of_vehicle': rng.choice(VEICULOS, n_rows, p=[.58, .33, .08, .01]),
+        'multiple_deliveries': rng.choice(ENTREGAS, n_rows, p=[.31, .62, .04, .01, .02]),
+        'Festival': rng.choice(FESTIVAL, n_rows, p=[.975, .02, .005]),
+        'City': rng.choice(CIDADES, n_rows, p=[.745, .222, .007, .026]),
+        'Time_taken(min)': np.char.add('(min) ', rng.integers(10, 55, n_rows).astype(str)).astype(object),
+    })
+    for col in ['Weatherconditions', 'Road_traffic_density', 'Type_of_order', 'Type_of_vehicle',
+                'multiple_deliveries', 'Festival', 'City']:
+        df[col] = df[col].astype(object)
+    return df
+
+
+def write_csv(path, n_rows, seed=42, chunk_size=1_000_000):
+    """Grava n_rows pedidos em CSV, gerando em blocos para limitar a memória.
+
+    Input: caminho de saída, quantidade de linhas, semente e tamanho do bloco.
+    Output: caminho do CSV.
+    """
+    escritas = 0
+    bloco = 0
+    while escritas < n_rows:
+        n = min(chunk_size, n_rows - escritas)
+        df = generate(n, seed=seed + bloco, start_id=escritas)
+        df.to_csv(path, index=False, mode='w' if bloco == 0 else 'a', header=bloco == 0)
+        escritas += n
+        bloco += 1
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera um CSV sintético no formato do train.csv.')
+    parser.add_argument('--rows', type=int, default=45_593)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default='../dataset/synthetic.csv')
+    args = parser.parse_args()
+    write_csv(args.out, args.rows, seed=args.seed)
+    print('{} linhas gravadas em {}'.format(args.rows, args.out))
@@ -0,0 +1,3 @@
+# Pacote compartilhado pelas páginas do dashboard da Cury Company.
+# Concentra a leitura, a limpeza e o cache do dataset para que as três
+# visões (empresa, entregadores e restaurantes) usem a mesma base em memória.
@@ -0,0 +1,64 @@
+# ------------------------------------------------------------------------
+# Arquivos estáticos das páginas, lidos uma única vez por processo
+# ------------------------------------------------------------------------
+# Cada rerun abria o logo com o PIL (Image.open) e o st.image recodificava
+# a imagem antes de enviá-la. Os bytes ficam em cache no processo, com a
+# chave (caminho, tamanho, mtime, largura): o st.image recebe PNG pronto e
+# o repassa sem decodificar. Quando a página pede uma largura menor que a
+# da imagem, ela é reduzida uma única vez aqui (e não a cada rerun pelo
+# Streamlit).
+import io
+import os
+import threading
+
+from curry_company import config
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _reduzir(dados, width):
+    from PIL import Image  # só quando alguma página pede uma largura fixa
+
+    imagem = Image.open(io.BytesIO(dados))
+    if imagem.width <= width:
+        return dados
+    altura = round(imagem.height * width / imagem.width)
+    saida = io.BytesIO()
+    imagem.resize((width, altura), Image.LANCZOS).save(saida, format='PNG')
+    return saida.getvalue()
+
+
+def image_bytes(path, width=None):
+    """Bytes de uma imagem, lidos (e reduzidos) uma única vez por versão do
+    arquivo.
+
+    Input:
+        - path: caminho da imagem.
+        - width: largura máxima em pixels (None mantém o arquivo original).
+    Output: bytes (PNG quando a imagem é reduzida).
+    """
+    stat = os.stat(path)
+    chave = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, width)
+    dados = _cache.get(chave)
+    if dados is None:
+        with _lock:
+            dados = _cache.get(chave)
+            if dados is None:
+                with open(path, 'rb') as arquivo:
+                    dados = arquivo.read()
+                if width is not None:
+                    dados = _reduzir(dados, width)
+                for antiga in [k for k in _cache if k[0] == chave[0] and k[1:3] != chave[1:3]]:
+                    del _cache[antiga]
+                _cache[chave] = dados
+    return dados
+
+
+def logo_bytes(width=None):
+    """Logo da barra lateral (config.LOGO_PATH) em bytes.
+
+    Input: largura máxima em pixels (None mantém o tamanho original).
+    Output: bytes.
+    """
+    return image_bytes(config.LOGO_PATH, width)
@@ -0,0 +1,71 @@
+# ------------------------------------------------------------------------
+# Modo em blocos (out-of-core) para históricos maiores que a memória
+# ------------------------------------------------------------------------
+# Em vez de carregar todos os pedidos, o CSV é lido em blocos de tamanho
+# fixo (config.CHUNK_SIZE linhas). Cada bloco passa pela mesma limpeza do
+# modo em memória e é agregado em cubos (ver curry_company/cube.py); os cubos
+# dos blocos são somados célula a célula.
+#
+# O pico de memória é o bloco limpo mais algumas vezes (~5x, pelas cópias da
+# soma) as células acumuladas e pendentes dos cubos, contando os
+# registradores dos esboços HyperLogLog (2**p bytes por célula, ver
+# curry_company/sketch.py); tests/test_chunked.py verifica esse limite e que
+# o pico não cresce com os pedidos enquanto os cubos não crescem.
+#
+# Os pedidos não ficam em memória, mas os cubos sim, e o tamanho deles
+# depende dos dados, não do CHUNK_SIZE: o cubo de pedidos tem uma célula por combinação de dimensões
+# presente em cada dia e satura cedo; o de entregadores tem uma por (dia,
+# cidade, tráfego, entregador) com pedido e cresce com os pedidos até o
+# limite dias x entregadores x cidades x tipos de tráfego. Ex. (sintético,
+# blocos de 20.000 linhas): 100 mil pedidos -> 80 mil células de
+# entregadores, pico de 67 MB; 400 mil -> 241 mil células, pico de 164 MB
+# (em memória: 249 MB). Em datasets pequenos o modo em blocos pode ter pico
+# maior que o em memória; ele compensa quando a tabela de pedidos é bem
+# maior que o cubo de entregadores.
+import pandas as pd
+
+from curry_company import cube
+
+
+def iter_csv_chunks(path, chunk_size, columns=None):
+    """Lê o CSV bruto em blocos e devolve cada bloco já limpo.
+
+    Input:
+        - path: caminho do CSV.
+        - chunk_size: quantidade de linhas por bloco.
+        - columns: colunas a manter depois da limpeza (None mantém todas);
+          do CSV só são lidas as necessárias para produzi-las.
+    Output: gerador de Dataframes.
+    """
+    from curry_company.data import prepare_dataset, raw_columns
+
+    for bloco in pd.read_csv(path, chunksize=chunk_size, usecols=raw_columns(columns)):
+        df1 = prepare_dataset(bloco)
+        yield df1 if columns is None else df1.loc[:, columns]
+
+
+def build_cubes(blocos, max_pending=200_000):
+    """Constrói os cubos somando os cubos de cada bloco.
+
+    Os cubos parciais são acumulados e somados de uma vez quando o total de
+    células pendentes passa de max_pending, em vez de a cada bloco.
+
+    Input: iterável de Dataframes limpos e limite de células pendentes.
+    Output: dicionário nome -> Cube (None se não houver nenhum bloco).
+    """
+    cubos = None
+    pendentes = []
+    for df1 in blocos:
+        pendentes.append(cube.build_cubes(df1))
+        if sum(len(c) for p in pendentes for c in p.values()) > max_pending:
+            cubos = _somar(cubos, pendentes)
+            pendentes = []
+    return _somar(cubos, pendentes)
+
+
+def _somar(cubos, pendentes):
+    if not pendentes:
+        return cubos
+    if cubos is None:
+        cubos, pendentes = pendentes[0], pendentes[1:]
+    return cube.merge_cubes(cubos, *pendentes) if pendentes else cubos
@@ -0,0 +1,95 @@
+# ------------------------------------------------------------------------
+# Configurações do projeto
+# ------------------------------------------------------------------------
+# Os valores podem ser sobrescritos por variáveis de ambiente, o que permite
+# apontar o dashboard para outro arquivo sem alterar o código das páginas.
+import os
+
+# Caminho do arquivo bruto com os pedidos
+DATASET_PATH = os.environ.get('CURRY_DATASET_PATH', '../dataset/train.csv')
+
+# Caminho do snapshot colunar (Parquet) gerado a partir do CSV limpo
+SNAPSHOT_PATH = os.environ.get(
+    'CURRY_SNAPSHOT_PATH',
+    os.path.splitext(DATASET_PATH)[0] + '.parquet'
+)
+
+# Precisão da coluna 'distance_km' calculada na ingestão ('float64' ou 'float32')
+DISTANCE_DTYPE = os.environ.get('CURRY_DISTANCE_DTYPE', 'float64')
+
+# Modo em blocos: quando maior que zero, o CSV é lido em blocos com essa
+# quantidade de linhas e as páginas usam apenas os agregados (cubos), sem
+# manter os pedidos em memória. Zero (padrão) carrega tudo em memória.
+# O pico de memória não é limitado só pelo bloco: os cubos (sobretudo o de
+# entregadores) crescem com os dados (ver curry_company/chunked.py).
+CHUNK_SIZE = int(os.environ.get('CURRY_CHUNK_SIZE', '0'))
+
+# Processos usados para agregar os pedidos em paralelo (ver
+# curry_company/parallel.py). Zero (padrão) usa todos os núcleos da máquina;
+# 1 desliga o paralelismo.
+WORKERS = int(os.environ.get('CURRY_WORKERS', '0'))
+
+# Abaixo dessa quantidade de pedidos a agregação é sempre serial: o custo de
+# criar os processos e transferir os resultados supera o ganho.
+PARALLEL_MIN_ROWS = int(os.environ.get('CURRY_PARALLEL_MIN_ROWS', '200000'))
+
+# Contagem de entregadores únicos: 'exact' (conjunto exato), 'approx'
+# (HyperLogLog, ver curry_company/sketch.py) ou 'auto' (exata enquanto a
+# janela tiver até DISTINCT_EXACT_MAX células no cubo de entregadores).
+DISTINCT_MODE = os.environ.get('CURRY_DISTINCT', 'auto')
+DISTINCT_EXACT_MAX = int(os.environ.get('CURRY_DISTINCT_EXACT_MAX', '200000'))
+
+# Precisão p do HyperLogLog: 2**p registradores por célula, erro padrão
+# relativo de ~1.04 / sqrt(2**p) (p=12: 4096 registradores, ~1.6%).
+HLL_PRECISION = int(os.environ.get('CURRY_HLL_PRECISION', '12'))
+
+# Mapa em grade (ver curry_company/maps.py): tamanho inicial da célula em
+# graus e máximo de células desenhadas. Quando a janela tem mais células
+# ocupadas que o máximo, a grade é engrossada (célula dobrada) até caber,
+# o que mantém o tamanho da página constante com o crescimento dos pedidos.
+MAP_CELL_DEG = float(os.environ.get('CURRY_MAP_CELL_DEG', '0.02'))
+MAP_MAX_CELLS = int(os.environ.get('CURRY_MAP_MAX_CELLS', '1500'))
+
+# Quantidade de mapas renderizados (um por estado dos filtros) mantidos em cache
+MAP_CACHE_SIZE = int(os.environ.get('CURRY_MAP_CACHE_SIZE', '32'))
+
+# Tamanho do geohash das colunas 'restaurant_cell' e 'delivery_cell'
+# calculadas na ingestão (30 bits = 6 caracteres, células de ~1.2 x 0.6 km)
+GEOHASH_BITS = int(os.environ.get('CURRY_GEOHASH_BITS', '30'))
+
+# Servidor HTTP/JSON dos KPIs (ver curry_company/server.py): endereço, porta
+# e quantidade de respostas mantidas em cache
+API_HOST = os.environ.get('CURRY_API_HOST', '127.0.0.1')
+API_PORT = int(os.environ.get('CURRY_API_PORT', '8600'))
+API_CACHE_SIZE = int(os.environ.get('CURRY_API_CACHE_SIZE', '256'))
+
+# Quantidade de gráficos Plotly serializados mantidos em cache (ver
+# curry_company/figures.py)
+FIGURE_CACHE_SIZE = int(os.environ.get('CURRY_FIGURE_CACHE_SIZE', '512'))
+
+# Threads usadas para calcular os painéis independentes de uma página ao
+# mesmo tempo (ver curry_company/panels.py); 1 calcula em sequência
+PANEL_WORKERS = int(os.environ.get('CURRY_PANEL_WORKERS', '4'))
+
+# Tabelas paginadas (ver curry_company/tables.py): linhas por página padrão,
+# máximo de linhas por página e quantidade de tabelas mantidas em cache
+TABLE_PAGE_SIZE = int(os.environ.get('CURRY_TABLE_PAGE_SIZE', '25'))
+TABLE_MAX_PAGE_SIZE = int(os.environ.get('CURRY_TABLE_MAX_PAGE_SIZE', '200'))
+TABLE_CACHE_SIZE = int(os.environ.get('CURRY_TABLE_CACHE_SIZE', '64'))
+
+# Instrumentação dos trechos quentes (ver curry_company/instrument.py):
+# ligada com CURRY_INSTRUMENT=1; CURRY_INSTRUMENT_MEMORY=1 mede também o pico
+# de memória de cada trecho; CURRY_METRICS_PATH grava o acumulado no formato
+# texto do Prometheus a cada rerun (vazio: não grava)
+INSTRUMENT = os.environ.get('CURRY_INSTRUMENT', '0') == '1'
+INSTRUMENT_MEMORY = os.environ.get('CURRY_INSTRUMENT_MEMORY', '0') == '1'
+METRICS_PATH = os.environ.get('CURRY_METRICS_PATH', '')
+
+# Logo da barra lateral (ver curry_company/assets.py), relativo à pasta de
+# onde o app é executado
+LOGO_PATH = os.environ.get('CURRY_LOGO_PATH', 'logo.png')
+
+# Motor das agregações dos KPIs: 'pandas' (padrão, cubos em memória, ver
+# curry_company/cube.py) ou 'duckdb' (consultas SQL sobre o snapshot
+# Parquet, ver curry_company/sql.py; precisa do duckdb e do pyarrow)
+BACKEND = os.environ.get('CURRY_BACKEND', 'pandas')
@@ -0,0 +1,203 @@
+# ------------------------------------------------------------------------
+# Cubo OLAP diário pré-agregado
+# ------------------------------------------------------------------------
+# Todos os KPIs das páginas são contagens, médias, desvios padrão, mínimos e
+# máximos agrupados por algum subconjunto das dimensões abaixo. O cubo guarda,
+# para cada combinação de dimensões em cada dia, os acumuladores de cada
+# medida (contagem, média, m2, mínimo e máximo; ver curry_company/stats.py).
+# Com isso qualquer agrupamento mais grosso (por cidade, por semana, por
+# tráfego...) é obtido juntando as células, sem voltar aos pedidos.
+import numpy as np
+import pandas as pd
+
+from curry_company import config, instrument, sketch, stats
+
+DIMENSOES = ['Order_Date', 'City', 'Road_traffic_density', 'Weatherconditions',
+             'Type_of_order', 'Festival']
+MEDIDAS = ['Time_taken(min)', 'Delivery_person_Ratings', 'distance_km',
+           'Delivery_person_Age', 'Vehicle_condition',
+           'Delivery_location_latitude', 'Delivery_location_longitude']
+
+# Cubos usados pelas páginas: o de pedidos e um por entregador, que permite
+# KPIs por entregador (avaliação média, top entregadores, entregadores únicos).
+CUBOS = {
+    'pedidos': (DIMENSOES, MEDIDAS),
+    'entregadores': (['Order_Date', 'City', 'Road_traffic_density', 'Delivery_person_ID'],
+                     ['Time_taken(min)', 'Delivery_person_Ratings']),
+}
+
+# Dimensões derivadas de outras colunas das células
+DERIVADAS = {
+    'week_of_year': lambda cells: cells['Order_Date'].dt.strftime('%U'),
+}
+
+
+class Cube:
+    """Células pré-agregadas de um conjunto de dimensões e medidas.
+
+    - cells: Dataframe com uma linha por célula (dimensões + 'orders' +
+      colunas 'medida|parcial'), ordenado pelas dimensões (a data primeiro).
+    - dimensions: lista de dimensões.
+    - measures: lista de medidas.
+    """
+
+    def __init__(self, cells, dimensions, measures):
+        self.cells = cells
+        self.dimensions = dimensions
+        self.measures = measures
+
+    @classmethod
+    def build(cls, df1, dimensions, measures):
+        """Agrega os pedidos do dataframe nas células do cubo.
+
+        Input: Dataframe limpo, lista de dimensões e lista de medidas.
+        Output: Cube.
+        """
+        cells = stats.describe(df1, dimensions, measures)
+        cells.insert(0, 'orders', df1.groupby(dimensions, observed=True, sort=True).size().sort_index())
+        return cls(cells.reset_index(), list(dimensions), list(measures))
+
+    def merge(self, *others):
+        """Junta as células deste cubo com as de outros cubos de mesmas
+        dimensões e medidas (ex.: o cubo do histórico e o de um lote novo).
+
+        Input: um ou mais Cube.
+        Output: Cube.
+        """
+        cells = pd.concat([self.cells] + [c.cells for c in others], ignore_index=True)
+        cells = stats.combine(cells, self.dimensions, self.measures, sums=['orders'])
+        return Cube(cells.reset_index(), self.dimensions, self.measures)
+
+    def __len__(self):
+        return len(self.cells)
+
+    @instrument.timed('filter.cube_slice')
+    def slice(self, start=None, end=None, traffic=None, **filtros):
+        """Seleciona as células de uma janela de datas e de alguns valores de
+        dimensão.
+
+        Input:
+            - start: data inicial (inclusiva).
+            - end: data final (exclusiva), como no filtro 'Order_Date < data'.
+            - traffic: lista de tipos de tráfego (Road_traffic_density).
+            - filtros: outras dimensões, ex.: City=['Urban'].
+        Output: Cube com as células selecionadas.
+        """
+        # as células estão ordenadas por data: a janela é uma busca binária
+        cells = self.cells
+        datas = cells['Order_Date'].to_numpy()
+        i = 0 if start is None else np.searchsorted(datas, pd.Timestamp(start).to_datetime64(), 'left')
+        j = len(cells) if end is None else np.searchsorted(datas, pd.Timestamp(end).to_datetime64(), 'left')
+        cells = cells.iloc[i:max(i, j)]
+
+        linhas = np.ones(len(cells), dtype=bool)
+        if traffic is not None:
+            filtros['Road_traffic_density'] = traffic
+        for dimensao, valores in filtros.items():
+            linhas &= cells[dimensao].isin(valores).to_numpy()
+        return Cube(cells.loc[linhas, :], self.dimensions, self.measures)
+
+    def _chaves(self, by, cells=None):
+        cells = self.cells if cells is None else cells
+        if not by:  # sem agrupamento: todas as células num único grupo
+            return [pd.Series(np.zeros(len(cells), dtype=np.int8), index=cells.index)]
+        return [DERIVADAS[d](cells).rename(d) if d in DERIVADAS else cells[d] for d in by]
+
+    def orders(self, by):
+        """Quantidade de pedidos agrupada por 'by'.
+
+        Input: lista de dimensões.
+        Output: Série com a contagem de pedidos.
+        """
+        # sort_index: ordem das categorias (ver curry_company/stats.py)
+        return self.cells['orders'].groupby(self._chaves(by), observed=True).sum().sort_index()
+
+    def nunique(self, by, dimension):
+        """Quantidade de valores distintos de uma dimensão agrupada por 'by'
+        (ex.: entregadores únicos por semana no cubo de entregadores).
+
+        Input: lista de dimensões e a dimensão a ser contada.
+        Output: Série com as contagens distintas.
+        """
+        return self.cells[dimension].groupby(self._chaves(by), observed=True).nunique().sort_index()
+
+    def rollup(self, by, agg):
+        """Consolida as células no agrupamento pedido.
+
+        A interface segue o groupby().agg() do pandas, então o resultado tem
+        as mesmas colunas em dois níveis (medida, estatística).
+
+        Input:
+            - by: lista de dimensões (ex.: ['City', 'Road_traffic_density']).
+            - agg: dicionário medida -> estatísticas, entre 'count', 'sum',
+              'mean', 'std', 'var', 'min' e 'max'.
+        Output: Dataframe indexado pelas dimensões de 'by'.
+        """
+        acumuladores = stats.combine(self.cells, self._chaves(by), list(agg))
+        return stats.finalize(acumuladores, agg)
+
+    def total(self, agg):
+        """Mesmo que rollup, mas sobre todas as células (sem agrupamento).
+
+        Input: dicionário medida -> estatísticas.
+        Output: Série indexada por (medida, estatística).
+        """
+        resultado = self.rollup([], agg)
+        if resultado.empty:
+            return pd.Series(np.nan, index=resultado.columns)
+        return resultado.iloc[0]
+
+    def stats(self, groupings, agg):
+        """Calcula vários agrupamentos de uma vez.
+
+        As células são consolidadas uma única vez no nível mais fino que
+        atende todos os agrupamentos; cada agrupamento é então obtido dessa
+        tabela intermediária, que é bem menor que o cubo.
+
+        Input:
+            - groupings: dicionário nome -> lista de dimensões, ex.:
+              {'festival': ['Festival'], 'cidade': ['City'], 'geral': []}.
+            - agg: dicionário medida -> estatísticas (como em rollup).
+        Output: StatsResult.
+        """
+        dimensoes = []
+        for by in groupings.values():
+            dimensoes += [d for d in by if d not in dimensoes]
+
+        medidas = list(agg)
+        if dimensoes:
+            intermediaria = stats.combine(self.cells, self._chaves(dimensoes), medidas).reset_index()
+        else:
+            intermediaria = self.cells
+
+        tabelas = {}
+        for nome, by in groupings.items():
+            chaves = [intermediaria[d] for d in by] if by else self._chaves([], intermediaria)
+            tabelas[nome] = stats.finalize(stats.combine(intermediaria, chaves, medidas), agg)
+        return stats.StatsResult(tabelas)
+
+
+def build_cubes(df1):
+    """Constrói todos os cubos usados pelas páginas.
+
+    Input: Dataframe limpo com as colunas de CUBOS.
+    Output: dicionário nome -> Cube (mais os esboços de entregadores únicos,
+    ver curry_company/sketch.py, quando config.DISTINCT_MODE não é 'exact').
+    """
+    cubos = {nome: Cube.build(df1, dimensoes, medidas) for nome, (dimensoes, medidas) in CUBOS.items()}
+    if config.DISTINCT_MODE != 'exact':
+        cubos.update(sketch.build_sketches(df1))
+    return cubos
+
+
+def merge_cubes(cubos, *novos):
+    """Junta, cubo a cubo, dicionários gerados por build_cubes."""
+    return {nome: cubos[nome].merge(*(n[nome] for n in novos)) for nome in cubos}
+
+
+def cube_columns():
+    """Colunas do dataset necessárias para construir todos os cubos."""
+    colunas = []
+    for dimensoes, medidas in CUBOS.values():
+        colunas += [c for c in dimensoes + medidas if c not in colunas]
+    return colunas
@@ -0,0 +1,487 @@
+# ------------------------------------------------------------------------
+# Leitura e limpeza do dataset compartilhadas entre as páginas
+# ------------------------------------------------------------------------
+# O Streamlit reexecuta o script da página a cada interação (slider, abas,
+# filtros). Os módulos importados, porém, ficam carregados no processo do
+# servidor, então o cache abaixo é único para todas as sessões e páginas:
+# o CSV é lido e limpo uma única vez e só é recarregado quando o arquivo muda.
+#
+# Quando o pyarrow está disponível a leitura passa pelo snapshot Parquet
+# (ver curry_company/snapshot.py), que é reconstruído se o CSV for mais novo.
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from curry_company import chunked, config, cube, geo, instrument, parallel, snapshot
+from curry_company.index import DateIndex, read_only
+from curry_company.spatial import SpatialIndex
+
+# Cache do processo: (assinatura do arquivo, item) -> dataframe limpo ou cubos
+_cache = {}
+_lock = threading.RLock()
+
+
+# Valores usados no CSV bruto para marcar dados ausentes
+SENTINELAS = {
+    'Delivery_person_Age': 'NaN ',
+    'Weatherconditions': 'conditions NaN',
+    'City': 'NaN',
+    'Road_traffic_density': 'NaN',
+    'multiple_deliveries': 'NaN ',
+}
+
+def _por_valor_distinto(serie, func):
+    """Aplica func apenas aos valores distintos da série e replica o resultado.
+
+    As colunas de texto do dataset têm poucos valores distintos (cidades,
+    tipos de tráfego, '(min) 24'...), então tratar os distintos e espalhar o
+    resultado pelos códigos do factorize é muito mais barato que processar
+    linha a linha.
+    """
+    codigos, distintos = pd.factorize(serie)
+    valores = np.asarray(func(pd.Index(distintos)))
+    # o código -1 (valor ausente) aponta para o NaN acrescentado no final
+    valores = np.append(valores.astype(object if valores.dtype.kind in 'OUS' else float), np.nan)
+    return valores[codigos]
+
+
+def _hex_para_inteiro(textos):
+    """Converte IDs hexadecimais ('0x4607') para inteiros, de forma vetorizada.
+
+    Os textos viram uma matriz de bytes (uma linha por ID, completada com
+    zeros à direita) e os dígitos são acumulados coluna a coluna.
+
+    Input: série de textos já sem espaços.
+    Output: array int64.
+    """
+    if len(textos) == 0:
+        return np.array([], dtype='int64')
+    try:
+        brutos = np.asarray(textos.to_numpy(), dtype='S')
+    except UnicodeEncodeError:
+        brutos = None
+    largura = brutos.dtype.itemsize if brutos is not None else 0
+    if brutos is None or largura < 3 or largura > 2 + DIGITOS_ID:
+        raise ValueError('IDs de pedido fora do formato 0x<hexadecimal> (até {} dígitos)'.format(DIGITOS_ID))
+
+    matriz = brutos.view('uint8').reshape(len(brutos), largura)
+    prefixo = (matriz[:, 0] == ord('0')) & ((matriz[:, 1] | 0x20) == ord('x'))
+    digitos = _VALOR_HEX[matriz[:, 2:]]
+    # -1: byte que não é dígito; -2: fim do texto (zeros à direita)
+    fim = digitos == -2
+    validos = (prefixo & ~(digitos == -1).any(axis=1) & ~fim[:, 0]
+               & (fim[:, :-1] <= fim[:, 1:]).all(axis=1))
+    if not validos.all():
+        raise ValueError('IDs de pedido fora do formato 0x<hexadecimal>: {}'.format(
+            list(textos[~validos][:5])))
+
+    valores = np.zeros(len(matriz), dtype='int64')
+    for j in range(digitos.shape[1]):
+        presente = ~fim[:, j]
+        valores[presente] = valores[presente] * 16 + digitos[presente, j]
+    return valores
+
+
+# Valor de cada byte como dígito hexadecimal (-1 se não for dígito, -2 para
+# o byte nulo que completa os textos mais curtos)
+_VALOR_HEX = np.full(256, -1, dtype='int8')
+_VALOR_HEX[0] = -2
+_VALOR_HEX[np.frombuffer(b'0123456789abcdef', dtype='uint8')] = np.arange(16)
+_VALOR_HEX[np.frombuffer(b'ABCDEF', dtype='uint8')] = np.arange(10, 16)
+# até 15 dígitos cabem em int64 sem estouro
+DIGITOS_ID = 15
+
+
+@instrument.timed('data.clean_code')
+def clean_code( df1 ):
+    """Esta função tem a responsabilidade de limpar o dataframe
+       
+    Tipos de limpeza:
+    1. Remoção dos dados NaN
+    2. Mudança do tipo da coluna de dados.
+    3. Remoção dos espaços das variaveis de texto
+    4. Formatação da coluna de datas
+    5. Limpeza da coluna de tempo (remoção do texto variável numérica)
+
+    Todas as sentinelas de dado ausente são combinadas em uma única máscara e
+    o dataframe é filtrado uma só vez. As colunas numéricas saem com o menor
+    tipo inteiro possível, 'Time_taken(min)' sai como inteiro (int16) e o
+    'ID' do pedido ('0x4607 ') sai como o inteiro que ele representa (int64).
+
+    O dataframe pode trazer só parte das colunas do CSV (ver raw_columns),
+    desde que traga as colunas com sentinela (SENTINELAS).
+
+    Input: Dataframe.
+    Output: Dataframe.
+
+    """
+    # EXCLUIR AS LINHAS COM ALGUMA SENTINELA DE DADO AUSENTE (uma única máscara)
+    # City e Road_traffic_density chegam com espaço no final ('NaN '), por isso
+    # são limpas antes da comparação.
+    texto = {}
+    for col in ['City', 'Road_traffic_density']:
+        texto[col] = _por_valor_distinto(df1[col], lambda v: v.str.strip())
+
+    linhas_validas = np.ones(len(df1), dtype=bool)
+    for col, sentinela in SENTINELAS.items():
+        valores = texto[col] if col in texto else df1[col].to_numpy()
+        if valores.dtype == object:  # coluna já numérica não tem sentinela
+            linhas_validas &= valores != sentinela
+
+    # um único filtro para todas as colunas
+    colunas = {}
+    for col in df1.columns:
+        valores = texto[col] if col in texto else df1[col].to_numpy()
+        colunas[col] = valores[linhas_validas]
+
+    # LIMPAR OS DADOS
+    # (cada conversão só é feita se a coluna foi lida, ver raw_columns)
+    # ID hexadecimal ('0x4607 ') -> inteiro, único por linha
+    if 'ID' in colunas:
+        colunas['ID'] = _hex_para_inteiro(pd.Series(colunas['ID']).str.strip())
+    # Remover espaço da string (poucos valores distintos)
+    for col in ['Delivery_person_ID', 'Type_of_order', 'Type_of_vehicle', 'Festival']:
+        if col in colunas:
+            colunas[col] = _por_valor_distinto(colunas[col], lambda v: v.str.strip())
+
+    # CONVERSAO DE TEXTO/CATEGORIA/STRING PARA NUMEROS INTEIROS
+    for col in ['Delivery_person_Age', 'multiple_deliveries', 'Vehicle_condition']:
+        if col in colunas:
+            inteiros = _por_valor_distinto(colunas[col], lambda v: v.astype(int))
+            colunas[col] = pd.to_numeric(inteiros.astype(int), downcast='integer')
+
+    # CONVERSAO DE TEXTO/CATEGORIA/STRING PARA NUMEROS DECIMAIS
+    if 'Delivery_person_Ratings' in colunas:
+        colunas['Delivery_person_Ratings'] = _por_valor_distinto(
+            colunas['Delivery_person_Ratings'], lambda v: pd.to_numeric(v, errors='coerce'))
+
+    # REMOVER O TEXTO DE NUMEROS ('(min) 24' -> 24)
+    if 'Time_taken(min)' in colunas:
+        colunas['Time_taken(min)'] = _por_valor_distinto(
+            colunas['Time_taken(min)'], lambda v: v.str.extract(r'(\d+)', expand=False).astype(int)
+        ).astype('int16')
+
+    df1 = pd.DataFrame(colunas, index=df1.index[linhas_validas])
+
+    # CONVERSÃO DE TEXTO PARA DATA
+    if 'Order_Date' in df1.columns:
+        df1['Order_Date'] = pd.to_datetime( df1['Order_Date'], format='%d-%m-%Y')
+
+    return df1
+
+
+@instrument.timed('data.prepare_dataset')
+def prepare_dataset(df):
+    """Limpa o dataframe bruto e acrescenta as colunas derivadas.
+
+    Coordenadas inválidas (zeradas ou negativas, ver geo.valid_coordinates)
+    viram NaN, para não distorcer medianas e distâncias.
+
+    Colunas derivadas:
+    - distance_km: distância entre restaurante e local de entrega (haversine
+      vetorizado), calculada uma única vez aqui em vez de em cada página.
+      NaN quando uma das pontas é inválida.
+    - restaurant_cell, delivery_cell: geohash inteiro (config.GEOHASH_BITS)
+      de cada ponta, usado pelo índice espacial (ver curry_company/spatial.py).
+      geo.SEM_CELULA quando a coordenada é inválida.
+
+    As linhas saem ordenadas por 'Order_Date', o que permite filtrar janelas
+    de datas por busca binária (ver curry_company/index.py), e com os tipos
+    compactos de compact_dtypes.
+
+    Com um dataframe bruto parcial (ver raw_columns), as colunas derivadas só
+    são calculadas quando as quatro coordenadas foram lidas.
+
+    Input: Dataframe bruto (lido do CSV).
+    Output: Dataframe.
+    """
+    df1 = clean_code(df)
+    if all(col in df1.columns for col in geo.COLUNAS_COORDENADAS):
+        for lat, lon, celula in geo.PONTAS:
+            invalidas = ~geo.valid_coordinates(df1[lat], df1[lon])
+            df1.loc[invalidas, [lat, lon]] = np.nan
+            df1[celula] = geo.geohash(df1[lat], df1[lon], config.GEOHASH_BITS)
+        df1['distance_km'] = geo.distance_km(df1, dtype=config.DISTANCE_DTYPE)
+    df1 = compact_dtypes(df1)
+    return df1.sort_values('Order_Date', kind='stable').reset_index(drop=True)
+
+
+# Colunas guardadas em float32 (~7 dígitos significativos: ~0.1 m nas
+# coordenadas, e as avaliações têm uma casa decimal). O geohash e a distância
+# são calculados antes, com as coordenadas em float64, e os acumuladores dos
+# cubos somam em float64 (ver stats.describe).
+FLOAT32_COLUMNS = geo.COLUNAS_COORDENADAS + ['Delivery_person_Ratings']
+
+# Colunas derivadas por prepare_dataset a partir das coordenadas
+DERIVED_COLUMNS = [celula for _, _, celula in geo.PONTAS] + ['distance_km']
+
+
+def compact_dtypes(df1):
+    """Reduz a memória do dataframe limpo.
+
+    - Textos de baixa cardinalidade (e o ID do entregador) viram category:
+      cada linha guarda só o código inteiro do valor no dicionário da coluna
+      (ver snapshot.CATEGORICAL_COLUMNS).
+    - Coordenadas e avaliações viram float32 (FLOAT32_COLUMNS).
+
+    Os inteiros já saem do clean_code com o menor tipo possível.
+
+    Input: Dataframe limpo.
+    Output: Dataframe.
+    """
+    for col in FLOAT32_COLUMNS:
+        if col in df1.columns:
+            df1[col] = df1[col].astype('float32')
+    return snapshot.to_categorical(df1)
+
+
+def raw_columns(columns):
+    """Colunas do CSV bruto necessárias para produzir as colunas limpas
+    pedidas: elas mesmas, as colunas com sentinela (o filtro de linhas
+    depende delas), 'Order_Date' (ordem das linhas) e as coordenadas, se
+    alguma coluna derivada delas for pedida.
+
+    Input: colunas do dataset limpo (None: todas).
+    Output: lista de colunas do CSV (None: todas).
+    """
+    if columns is None:
+        return None
+    brutas = [c for c in columns if c not in DERIVED_COLUMNS]
+    extras = list(SENTINELAS) + ['Order_Date']
+    if any(c in DERIVED_COLUMNS for c in columns):
+        extras += geo.COLUNAS_COORDENADAS
+    return brutas + [c for c in dict.fromkeys(extras) if c not in brutas]
+
+
+def file_signature(path):
+    """Retorna a assinatura do arquivo.
+
+    Input: caminho do arquivo.
+    Output: tupla (caminho absoluto, tamanho em bytes, mtime em ns).
+    """
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def snapshot_path_for(path):
+    """Retorna o caminho do snapshot Parquet correspondente ao CSV."""
+    if path == config.DATASET_PATH:
+        return config.SNAPSHOT_PATH
+    return os.path.splitext(path)[0] + '.parquet'
+
+
+def dataset_signature(path):
+    """Retorna a assinatura do dataset usada como chave do cache: a do CSV
+    base mais a lista de partições anexadas a ele.
+
+    Enquanto o snapshot não corresponde ao CSV (CSV substituído), não há
+    partições: o snapshot vai ser reconstruído e as partições antigas
+    deixam de valer (ver curry_company/snapshot.py).
+
+    Input: caminho do CSV.
+    Output: tupla (caminho absoluto, tamanho, mtime, partições).
+    """
+    partitions = ()
+    if snapshot.HAS_ARROW and snapshot.is_fresh(path, snapshot_path_for(path)):
+        partitions = tuple(snapshot.list_partitions(snapshot_path_for(path)))
+    return file_signature(path) + (partitions,)
+
+
+def dataset_version(path=None):
+    """Versão curta do dataset (hash da assinatura), usada em chaves de cache
+    e ETags fora do processo.
+
+    Input: caminho do CSV (padrão: config.DATASET_PATH).
+    Output: texto hexadecimal de 16 caracteres.
+    """
+    signature = dataset_signature(path or config.DATASET_PATH)
+    return hashlib.sha1(repr(signature).encode()).hexdigest()[:16]
+
+
+@instrument.timed('data.load')
+def _load(path, columns, partitions=None):
+    if snapshot.HAS_ARROW:
+        snapshot_path = snapshot_path_for(path)
+        if not snapshot.is_fresh(path, snapshot_path):
+            snapshot.build_snapshot(path, snapshot_path)
+        return snapshot.read_snapshot(snapshot_path, columns, partitions)
+
+    # sem pyarrow: lê do CSV bruto só as colunas necessárias e limpa em memória
+    with instrument.span('data.read_csv'):
+        df = pd.read_csv(path, usecols=raw_columns(columns))
+    df1 = prepare_dataset(df)
+    if columns is not None:
+        df1 = df1.loc[:, columns]
+    return df1
+
+
+def _load_partitions(path, partitions, columns):
+    return snapshot.concat_frames(snapshot.read_partitions(snapshot_path_for(path), partitions, columns))
+
+
+def _anterior(signature, item):
+    # versão em cache do mesmo CSV base cujas partições são um prefixo das atuais
+    for (old_signature, old_item), valor in _cache.items():
+        if (old_item == item and old_signature[:3] == signature[:3]
+                and signature[3][:len(old_signature[3])] == old_signature[3]):
+            return old_signature, valor
+    return None
+
+
+def _cached(path, item, builder, incremental=None):
+    """Busca no cache do processo um item derivado do dataset, construindo-o
+    com builder(partições) na primeira vez.
+
+    A chave inclui a assinatura do dataset. Se a mudança foi apenas a
+    chegada de partições novas e o item tem uma função incremental, o item é
+    atualizado com incremental(valor_antigo, partições_novas) em vez de ser
+    reconstruído a partir de todo o histórico. Só depois disso a versão
+    antiga do próprio item é descartada: os demais itens guardam a sua até
+    serem pedidos, para também serem estendidos só com as partições novas.
+    Quando o CSV base muda, as versões antigas de todos os itens são
+    descartadas.
+    """
+    signature = dataset_signature(path)
+    key = (signature, item)
+
+    valor = _cache.get(key)
+    if valor is not None:
+        return valor
+
+    with _lock:
+        # outra sessão pode ter carregado enquanto esperávamos o lock
+        valor = _cache.get(key)
+        if valor is None:
+            anterior = _anterior(signature, item) if incremental else None
+            if anterior is not None:
+                old_signature, old_valor = anterior
+                valor = incremental(old_valor, signature[3][len(old_signature[3]):])
+            else:
+                valor = builder(signature[3])
+            # descarta as versões antigas deste item e as de um CSV base
+            # diferente (que não podem mais ser estendidas); os outros itens
+            # mantêm a versão antiga até serem pedidos e estendidos também
+            for old_key in [k for k in _cache if k[0][0] == signature[0] and k[0] != signature
+                            and (k[1] == item or k[0][:3] != signature[:3])]:
+                del _cache[old_key]
+            _cache[key] = valor
+    return valor
+
+
+def load_dataset(path=None, columns=None):
+    """Carrega o dataset limpo, lendo e limpando o CSV só uma vez por processo.
+
+    O resultado fica em cache com a chave (caminho, tamanho, mtime,
+    partições, colunas). Quando o arquivo é substituído a assinatura muda e o
+    dataset é recarregado; quando só chegam partições novas, apenas elas são
+    lidas e concatenadas. As versões antigas são descartadas para não manter
+    cópias em memória.
+
+    O dataframe em cache é compartilhado por todas as sessões, então seus
+    arrays são somente leitura (ver index.read_only) e cada chamada recebe
+    uma cópia rasa: escrever nos valores levanta ValueError, e colunas
+    criadas ou substituídas pela página ficam só na cópia.
+
+    Input:
+        - path: caminho do CSV (padrão: config.DATASET_PATH).
+        - columns: colunas necessárias para a página (None traz todas).
+    Output: Dataframe limpo (visão somente leitura do cache).
+    """
+    path = path or config.DATASET_PATH
+    item = ('dataset', tuple(columns) if columns is not None else None)
+
+    def incremental(df1, novas):
+        return read_only(snapshot.concat_frames([df1, _load_partitions(path, novas, columns)]))
+
+    df1 = _cached(path, item, lambda partitions: read_only(_load(path, columns, partitions)), incremental)
+    return df1.copy(deep=False)
+
+
+def _build_cubes_chunked(path, partitions):
+    # modo em blocos: o CSV base e as partições são agregados bloco a bloco
+    colunas = cube.cube_columns()
+    blocos = chunked.iter_csv_chunks(path, config.CHUNK_SIZE, colunas)
+    cubos = chunked.build_cubes(blocos)
+    if partitions:
+        blocos = snapshot.iter_partition_batches(snapshot_path_for(path), partitions, config.CHUNK_SIZE, colunas)
+        cubos = cube.merge_cubes(cubos, chunked.build_cubes(blocos))
+    return cubos
+
+
+def _build_sql_cubes(path, partitions):
+    # backend SQL: o snapshot (e as partições) é consultado pelo DuckDB
+    from curry_company import sql  # o duckdb só é importado com esse backend
+
+    if not (sql.HAS_DUCKDB and snapshot.HAS_ARROW):
+        raise RuntimeError("CURRY_BACKEND='duckdb' precisa do duckdb e do pyarrow instalados")
+    snapshot_path = snapshot_path_for(path)
+    if not snapshot.is_fresh(path, snapshot_path):
+        snapshot.build_snapshot(path, snapshot_path)
+    pasta = snapshot.partitions_dir(snapshot_path)
+    return sql.build_cubes([snapshot_path] + [os.path.join(pasta, nome) for nome in partitions])
+
+
+def get_cubes(path=None):
+    """Retorna os cubos pré-agregados (ver curry_company/cube.py), construídos
+    uma única vez por versão do dataset e atualizados de forma incremental
+    quando chegam partições novas.
+
+    Com config.CHUNK_SIZE > 0 os cubos são construídos lendo o CSV em blocos
+    (ver curry_company/chunked.py), sem carregar todos os pedidos.
+    Em memória, a agregação é dividida entre config.WORKERS processos (ver
+    curry_company/parallel.py).
+    Com config.BACKEND == 'duckdb' devolve SqlCubes (ver curry_company/sql.py),
+    que consultam o snapshot Parquet a cada KPI sem carregar os pedidos.
+
+    Input: caminho do CSV (padrão: config.DATASET_PATH).
+    Output: dicionário nome -> Cube (ou SqlCube).
+    """
+    path = path or config.DATASET_PATH
+    if config.BACKEND == 'duckdb':
+        return _cached(path, ('sql',), lambda partitions: _build_sql_cubes(path, partitions))
+
+    @instrument.timed('data.build_cubes')
+    def builder(partitions):
+        if config.CHUNK_SIZE:
+            return _build_cubes_chunked(path, partitions)
+        # lê só as colunas dos cubos, sem guardar os pedidos no cache
+        return parallel.build_cubes(_load(path, cube.cube_columns(), partitions))
+
+    def incremental(cubos, novas):
+        return cube.merge_cubes(cubos, parallel.build_cubes(_load_partitions(path, novas, cube.cube_columns())))
+
+    return _cached(path, ('cubes',), builder, incremental)
+
+
+def get_date_index(path=None, columns=None):
+    """Retorna o índice de datas (ver curry_company/index.py) sobre o dataset
+    em cache, construído uma única vez por versão do dataset.
+
+    Input:
+        - path: caminho do CSV (padrão: config.DATASET_PATH).
+        - columns: colunas necessárias para a página (precisa incluir
+          'Order_Date' e 'Road_traffic_density').
+    Output: DateIndex.
+    """
+    path = path or config.DATASET_PATH
+    item = ('index', tuple(columns) if columns is not None else None)
+    return _cached(path, item, lambda partitions: DateIndex(load_dataset(path, columns)))
+
+
+def get_spatial_index(path=None, endpoint='delivery', columns=None):
+    """Retorna o índice espacial (ver curry_company/spatial.py) de uma ponta
+    dos pedidos, construído uma única vez por versão do dataset.
+
+    Input:
+        - path: caminho do CSV (padrão: config.DATASET_PATH).
+        - endpoint: 'restaurant' ou 'delivery'.
+        - columns: colunas do índice de datas usado (precisa incluir
+          'Order_Date', 'Road_traffic_density' e as colunas da ponta).
+    Output: SpatialIndex.
+    """
+    path = path or config.DATASET_PATH
+    item = ('spatial', endpoint, tuple(columns) if columns is not None else None)
+    return _cached(path, item, lambda partitions: SpatialIndex(get_date_index(path, columns), endpoint))
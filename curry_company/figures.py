@@ -0,0 +1,59 @@
+# ------------------------------------------------------------------------
+# Cache LRU dos gráficos Plotly já montados
+# ------------------------------------------------------------------------
+# Várias sessões olhando o mesmo filtro (o padrão da barra lateral, por
+# exemplo) montariam os mesmos gráficos a cada rerun. O JSON de cada gráfico
+# fica em cache com a chave (versão do dataset, janela de datas normalizada,
+# tipos de tráfego ordenados, id do gráfico); num acerto o gráfico é
+# reconstruído do JSON sem calcular nenhum KPI.
+#
+# O plotly só é importado dentro de cached_figure: quem usa apenas a chave
+# (curry_company/tables.py) não o carrega fora do streamlit (API, ingestão,
+# benchmarks).
+import pandas as pd
+
+from curry_company import config, instrument
+from curry_company.data import dataset_version
+from curry_company.lru import LRUCache
+
+_cache = LRUCache(config.FIGURE_CACHE_SIZE)
+
+
+def _data(valor):
+    return None if valor is None else pd.Timestamp(valor).isoformat()
+
+
+def figure_key(figure_id, start=None, end=None, traffic=None, path=None):
+    """Chave do cache de um gráfico.
+
+    Input: id do gráfico, filtros da janela e caminho do dataset.
+    Output: tupla (versão do dataset, início, fim, tráfego, id do gráfico).
+    """
+    trafego = tuple(sorted(traffic)) if traffic is not None else None
+    return (dataset_version(path), _data(start), _data(end), trafego, figure_id)
+
+
+def cached_figure(figure_id, janela, builder, path=None):
+    """Gráfico de uma janela, montado uma única vez por estado dos filtros.
+
+    Input:
+        - figure_id: nome único do gráfico (ex.: 'order_metric').
+        - janela: kpis.Window com os filtros da página.
+        - builder: função que recebe a janela e devolve o go.Figure.
+        - path: caminho do dataset (padrão: config.DATASET_PATH).
+    Output: go.Figure.
+    """
+    import plotly.io as pio
+
+    def montar():
+        with instrument.span('figure.{}.build'.format(figure_id)):
+            return builder(janela).to_json()
+
+    with instrument.span('figure.' + figure_id):
+        chave = figure_key(figure_id, janela.start, janela.end, janela.traffic, path)
+        return pio.from_json(_cache.get_or_compute(chave, montar))
+
+
+def cache_info():
+    """Contadores do cache de gráficos (hits, misses, size, maxsize)."""
+    return _cache.info()
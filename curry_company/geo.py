@@ -0,0 +1,151 @@
+# ------------------------------------------------------------------------
+# Funções geográficas vetorizadas
+# ------------------------------------------------------------------------
+import numpy as np
+
+from curry_company import instrument
+
+# Mesmo raio médio da Terra usado pelo pacote haversine (em km)
+RAIO_TERRA_KM = 6371.0088
+
+COLUNAS_COORDENADAS = ['Restaurant_latitude', 'Restaurant_longitude',
+                       'Delivery_location_latitude', 'Delivery_location_longitude']
+
+# (latitude, longitude, coluna do geohash) de cada ponta do pedido
+PONTAS = [('Restaurant_latitude', 'Restaurant_longitude', 'restaurant_cell'),
+          ('Delivery_location_latitude', 'Delivery_location_longitude', 'delivery_cell')]
+
+
+def haversine(lat1, lon1, lat2, lon2, dtype=np.float64):
+    """Calcula a distância de círculo máximo entre dois pontos, em km.
+
+    Opera sobre arrays inteiros de uma vez (sem loop em Python), devolvendo o
+    mesmo resultado de haversine.haversine aplicado linha a linha.
+
+    Input:
+        - lat1, lon1: coordenadas de origem em graus (arrays ou séries).
+        - lat2, lon2: coordenadas de destino em graus.
+        - dtype: np.float64 (padrão) ou np.float32 para economizar memória.
+    Output: array com as distâncias em km.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=dtype)) for v in (lat1, lon1, lat2, lon2))
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    d = np.sin(dlat * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon * 0.5) ** 2
+
+    return (2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(d))).astype(dtype, copy=False)
+
+
+@instrument.timed('data.distance')
+def distance_km(df1, dtype=np.float64):
+    """Distância entre o restaurante e o local de entrega de cada pedido.
+
+    Input: Dataframe com as colunas de coordenadas e o dtype do resultado.
+    Output: array com as distâncias em km.
+    """
+    return haversine(*(df1[col] for col in COLUNAS_COORDENADAS), dtype=dtype)
+
+
+# ------------------------------------------------------------------------
+# Coordenadas inválidas
+# ------------------------------------------------------------------------
+# O dataset tem coordenadas zeradas (0, 0) e com o sinal trocado (a operação
+# é toda no hemisfério norte/leste), que distorcem medianas e distâncias.
+def valid_coordinates(lat, lon):
+    """Máscara das coordenadas válidas: finitas, diferentes de (0, 0) e
+    positivas (latitude em (0, 90], longitude em (0, 180]).
+
+    Input: arrays ou séries de latitudes e longitudes em graus.
+    Output: array booleano.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    return (lat > 0) & (lat <= 90) & (lon > 0) & (lon <= 180)
+
+
+# ------------------------------------------------------------------------
+# Geohash inteiro (Z-order)
+# ------------------------------------------------------------------------
+# O geohash intercala os bits da longitude e da latitude (a longitude
+# primeiro). Guardamos o código como inteiro: prefixos do código são as
+# células maiores que contêm a célula, e células vizinhas no código ficam
+# próximas no espaço, então uma ordenação pelo código agrupa os pedidos por
+# região. Cada 5 bits viram um caractere base32 no texto do geohash.
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Código das coordenadas inválidas
+SEM_CELULA = -1
+
+
+def _espalhar(x):
+    # intercala zeros entre os bits de inteiros de até 32 bits
+    x = x.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for deslocamento, mascara in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF),
+                                  (4, 0x0F0F0F0F0F0F0F0F), (2, 0x3333333333333333),
+                                  (1, 0x5555555555555555)):
+        x = (x | (x << np.uint64(deslocamento))) & np.uint64(mascara)
+    return x
+
+
+def _compactar(x):
+    # inverso de _espalhar: junta os bits das posições pares
+    x = x.astype(np.uint64) & np.uint64(0x5555555555555555)
+    for deslocamento, mascara in ((1, 0x3333333333333333), (2, 0x0F0F0F0F0F0F0F0F),
+                                  (4, 0x00FF00FF00FF00FF), (8, 0x0000FFFF0000FFFF),
+                                  (16, 0x00000000FFFFFFFF)):
+        x = (x | (x >> np.uint64(deslocamento))) & np.uint64(mascara)
+    return x
+
+
+def geohash(lat, lon, bits=30):
+    """Geohash inteiro de cada ponto.
+
+    Input:
+        - lat, lon: coordenadas em graus.
+        - bits: tamanho do código (30 bits = 6 caracteres, ~1.2 x 0.6 km).
+    Output: array int64 (SEM_CELULA para coordenadas inválidas).
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    validas = valid_coordinates(lat, lon)
+    bits_lon, bits_lat = (bits + 1) // 2, bits // 2
+
+    x = np.floor((np.where(validas, lon, 0) + 180) / 360 * 2 ** bits_lon)
+    y = np.floor((np.where(validas, lat, 0) + 90) / 180 * 2 ** bits_lat)
+    x = np.minimum(x, 2 ** bits_lon - 1).astype(np.uint64)
+    y = np.minimum(y, 2 ** bits_lat - 1).astype(np.uint64)
+
+    # com bits ímpar a longitude tem um bit a mais, que fica no fim do código
+    codigo = ((_espalhar(x) << np.uint64(1)) | _espalhar(y << np.uint64(bits % 2))) >> np.uint64(bits % 2)
+    return np.where(validas, codigo.astype(np.int64), SEM_CELULA)
+
+
+def geohash_bounds(codes, bits=30):
+    """Canto sudoeste e tamanho das células de códigos geohash.
+
+    Input: array de códigos e o tamanho do código em bits.
+    Output: tupla (lat_min, lon_min, altura, largura) em graus.
+    """
+    codigo = np.asarray(codes).astype(np.uint64) << np.uint64(bits % 2)
+    bits_lon, bits_lat = (bits + 1) // 2, bits // 2
+    x = _compactar(codigo >> np.uint64(1)).astype(np.float64)
+    y = _compactar(codigo).astype(np.float64) // 2 ** (bits % 2)
+    largura = 360 / 2 ** bits_lon
+    altura = 180 / 2 ** bits_lat
+    return y * altura - 90, x * largura - 180, altura, largura
+
+
+def geohash_text(codes, bits=30):
+    """Texto base32 dos códigos (bits múltiplo de 5), ex.: 'tdr1y2'.
+
+    Input: array de códigos e o tamanho do código em bits.
+    Output: lista de textos.
+    """
+    textos = []
+    for codigo in np.asarray(codes, dtype=np.int64):
+        if codigo == SEM_CELULA:
+            textos.append('')
+            continue
+        textos.append(''.join(BASE32[(int(codigo) >> (bits - 5 * (i + 1))) & 31] for i in range(bits // 5)))
+    return textos
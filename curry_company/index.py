@@ -0,0 +1,104 @@
+# ------------------------------------------------------------------------
+# Índice de datas ordenado com bitmaps de tráfego
+# ------------------------------------------------------------------------
+# Os pedidos ficam ordenados por 'Order_Date' e, para cada dia, guardamos a
+# posição da primeira linha. Uma janela de datas vira então uma busca binária
+# (searchsorted) e uma fatia contígua das linhas, sem varrer a coluna inteira
+# nem copiar o dataframe. O filtro de trânsito usa um bitmap (bits
+# compactados) por tipo de tráfego, combinados com OR apenas dentro da janela.
+import numpy as np
+import pandas as pd
+
+from curry_company import instrument
+
+
+def read_only(df1):
+    """Marca como somente leitura os arrays das colunas do dataframe.
+
+    Os dataframes em cache são compartilhados por todas as sessões: uma
+    escrita nos valores (df.loc[...] = ..., fillna(inplace=True)...) passa a
+    levantar ValueError em vez de alterar o cache das outras sessões.
+
+    Input: Dataframe.
+    Output: o mesmo Dataframe.
+    """
+    for bloco in df1._mgr.blocks:
+        valores = bloco.values
+        # categorias e datas guardam os códigos/valores num ndarray interno
+        for array in (valores, getattr(valores, '_ndarray', None),
+                      getattr(valores, '_data', None), getattr(valores, '_mask', None)):
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+    return df1
+
+
+class DateIndex:
+    """Dataframe ordenado por data com offsets por dia e bitmaps de tráfego.
+
+    - df: Dataframe ordenado por 'Order_Date' (somente leitura, ver
+      read_only).
+    - days: datas distintas, em ordem.
+    - offsets: posição da primeira linha de cada dia (mais o total no final).
+    - bitmaps: tipo de tráfego -> bits compactados (np.packbits) das linhas.
+    """
+
+    def __init__(self, df1, date_column='Order_Date', bitmap_column='Road_traffic_density'):
+        if not df1[date_column].is_monotonic_increasing:
+            df1 = df1.sort_values(date_column, kind='stable').reset_index(drop=True)
+        self.df = read_only(df1)
+
+        self.days, offsets = np.unique(df1[date_column].to_numpy(), return_index=True)
+        self.offsets = np.append(offsets, len(df1))
+
+        codigos, valores = pd.factorize(df1[bitmap_column])
+        self.bitmaps = {valor: np.packbits(codigos == i) for i, valor in enumerate(valores)}
+
+    def __len__(self):
+        return len(self.df)
+
+    def bounds(self, start=None, end=None):
+        """Posições [i, j) das linhas com start <= data < end.
+
+        Input: data inicial (inclusiva) e final (exclusiva); None = sem limite.
+        Output: tupla (i, j).
+        """
+        i = 0 if start is None else self.offsets[np.searchsorted(self.days, _datetime64(start), 'left')]
+        j = len(self.df) if end is None else self.offsets[np.searchsorted(self.days, _datetime64(end), 'left')]
+        return int(i), int(max(i, j))
+
+    def mask(self, traffic, i, j):
+        """Máscara booleana das linhas [i, j) cujo tráfego está na lista.
+
+        Só os bytes dos bitmaps que cobrem a janela são combinados.
+        """
+        inicio, fim = i // 8, (j + 7) // 8
+        bits = np.zeros(fim - inicio, dtype=np.uint8)
+        for valor in traffic:
+            if valor in self.bitmaps:
+                bits |= self.bitmaps[valor][inicio:fim]
+        deslocamento = i - inicio * 8
+        return np.unpackbits(bits)[deslocamento:deslocamento + (j - i)].astype(bool)
+
+    @instrument.timed('filter.date_index')
+    def select(self, start=None, end=None, traffic=None):
+        """Seleciona os pedidos da janela de datas e dos tipos de tráfego.
+
+        A janela de datas é uma fatia sem cópia (somente leitura: escrever
+        nos valores levanta ValueError); só quando o filtro de tráfego exclui
+        algum tipo as linhas selecionadas são copiadas.
+
+        Input:
+            - start: data inicial (inclusiva).
+            - end: data final (exclusiva), como no filtro 'Order_Date < data'.
+            - traffic: lista de tipos de tráfego (None = todos).
+        Output: Dataframe.
+        """
+        i, j = self.bounds(start, end)
+        janela = self.df.iloc[i:j]
+        if traffic is None or set(self.bitmaps) <= set(traffic):
+            return janela
+        return janela.loc[self.mask(traffic, i, j), :]
+
+
+def _datetime64(data):
+    return pd.Timestamp(data).to_datetime64()
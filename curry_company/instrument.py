@@ -0,0 +1,239 @@
+# ------------------------------------------------------------------------
+# Instrumentação opcional: tempo (e memória) por trecho de cada rerun
+# ------------------------------------------------------------------------
+# Ligada com CURRY_INSTRUMENT=1. Os trechos quentes (leitura, limpeza,
+# filtros, cada KPI, cada gráfico e o mapa) abrem um span; os spans de um
+# rerun são agrupados por página e acumulados no processo. As páginas
+# mostram o último rerun num painel de debug na barra lateral, e o acumulado
+# sai no formato texto do Prometheus: num arquivo (CURRY_METRICS_PATH,
+# regravado a cada rerun, para o textfile collector) e na rota /metrics do
+# servidor de KPIs.
+#
+# Desligada (padrão), timed() devolve a própria função e span() devolve um
+# contexto vazio compartilhado: o custo é uma checagem de booleano.
+#
+# Com CURRY_INSTRUMENT_MEMORY=1 cada span também anota o pico de memória
+# alocada (tracemalloc, que deixa as alocações bem mais lentas). O pico é
+# do processo: com painéis em paralelo ele inclui os spans simultâneos.
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+from curry_company import config
+
+ENABLED = config.INSTRUMENT
+MEMORY = config.INSTRUMENT and config.INSTRUMENT_MEMORY
+
+if MEMORY and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+_NULO = contextlib.nullcontext()
+_rerun = contextvars.ContextVar('curry_rerun', default=None)
+_lock = threading.Lock()
+# spans abertos em cada thread (para propagar o pico de memória ao externo)
+_pilhas = threading.local()
+
+# acumulado do processo: (página, span) -> [chamadas, segundos, máximo (s),
+# pico de memória (bytes)] e página -> [reruns, segundos]. Spans fora de um
+# rerun (ex.: carga disparada por outra thread) ficam na página '-'.
+_spans = {}
+_reruns = {}
+
+
+class Rerun:
+    """Spans de um rerun de uma página."""
+
+    def __init__(self, page):
+        self.page = page
+        self.start = time.perf_counter()
+        self.spans = []
+        self.duration = None
+        self._lock = threading.Lock()
+
+    def add(self, name, duration, memory):
+        with self._lock:
+            self.spans.append((name, duration, memory))
+
+
+def _acumular(page, name, duration, memory):
+    # chamado com _lock adquirido
+    acumulado = _spans.setdefault((page, name), [0, 0.0, 0.0, 0])
+    acumulado[0] += 1
+    acumulado[1] += duration
+    acumulado[2] = max(acumulado[2], duration)
+    acumulado[3] = max(acumulado[3], memory or 0)
+
+
+@contextlib.contextmanager
+def _medir(name):
+    if not hasattr(_pilhas, 'itens'):
+        _pilhas.itens = []
+    pilha = _pilhas.itens
+    if MEMORY:
+        atual = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        quadro = [atual, atual]  # memória no início e maior pico visto
+        pilha.append(quadro)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        memoria = None
+        if MEMORY:
+            pilha.pop()
+            pico = max(quadro[1], tracemalloc.get_traced_memory()[1])
+            memoria = pico - quadro[0]
+            if pilha:  # o pico do span interno também é do externo
+                pilha[-1][1] = max(pilha[-1][1], pico)
+        rerun = _rerun.get()
+        if rerun is not None:
+            rerun.add(name, duracao, memoria)
+        else:
+            with _lock:
+                _acumular('-', name, duracao, memoria)
+
+
+def span(name):
+    """Contexto que mede um trecho (no-op com a instrumentação desligada).
+
+        with instrument.span('data.read_csv'):
+            df = pd.read_csv(path)
+    """
+    if not ENABLED:
+        return _NULO
+    return _medir(name)
+
+
+def timed(name):
+    """Decorador que mede cada chamada da função como um span.
+
+    Com a instrumentação desligada a função é devolvida sem alteração.
+    """
+    def decorar(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def medida(*args, **kwargs):
+            with _medir(name):
+                return func(*args, **kwargs)
+        return medida
+    return decorar
+
+
+def begin_rerun(page):
+    """Abre a medição de um rerun da página (no início do script).
+
+    Output: Rerun (None com a instrumentação desligada).
+    """
+    if not ENABLED:
+        return None
+    rerun = Rerun(page)
+    _rerun.set(rerun)
+    return rerun
+
+
+def end_rerun():
+    """Fecha a medição do rerun atual, acumula os spans e regrava o arquivo
+    de métricas (config.METRICS_PATH).
+
+    Output: Rerun (None com a instrumentação desligada).
+    """
+    rerun = _rerun.get() if ENABLED else None
+    if rerun is None:
+        return None
+    _rerun.set(None)
+    rerun.duration = time.perf_counter() - rerun.start
+    with _lock:
+        total = _reruns.setdefault(rerun.page, [0, 0.0])
+        total[0] += 1
+        total[1] += rerun.duration
+        for nome, duracao, memoria in rerun.spans:
+            _acumular(rerun.page, nome, duracao, memoria)
+    if config.METRICS_PATH:
+        write_metrics(config.METRICS_PATH)
+    return rerun
+
+
+def rerun_table(rerun):
+    """Spans de um rerun agrupados por nome (mais demorados primeiro).
+
+    Output: Dataframe com span, calls, seconds e peak_mb.
+    """
+    df_aux = pd.DataFrame(rerun.spans, columns=['span', 'seconds', 'peak_mb'])
+    df_aux['peak_mb'] = df_aux['peak_mb'].astype(float) / 2 ** 20
+    df_aux = df_aux.groupby('span').agg(calls=('seconds', 'size'), seconds=('seconds', 'sum'),
+                                        peak_mb=('peak_mb', 'max'))
+    return df_aux.sort_values('seconds', ascending=False).reset_index()
+
+
+def page_table(page):
+    """Acumulado do processo para uma página (mais demorados primeiro).
+
+    Output: Dataframe com span, calls, seconds, mean_s, max_s e peak_mb.
+    """
+    with _lock:
+        linhas = [(nome, n, total, total / n, maximo, pico / 2 ** 20)
+                  for (pagina, nome), (n, total, maximo, pico) in _spans.items() if pagina == page]
+    df_aux = pd.DataFrame(linhas, columns=['span', 'calls', 'seconds', 'mean_s', 'max_s', 'peak_mb'])
+    return df_aux.sort_values('seconds', ascending=False).reset_index(drop=True)
+
+
+def _rotulos(**rotulos):
+    texto = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                     for k, v in rotulos.items())
+    return '{' + texto + '}'
+
+
+def prometheus_text():
+    """Acumulado do processo no formato texto do Prometheus.
+
+    Output: str.
+    """
+    with _lock:
+        spans = sorted(_spans.items())
+        reruns = sorted(_reruns.items())
+    metricas = [
+        ('curry_reruns_total', 'counter', 'Reruns medidos por página.',
+         [(_rotulos(page=p), n) for p, (n, _) in reruns]),
+        ('curry_rerun_seconds_total', 'counter', 'Tempo total dos reruns por página.',
+         [(_rotulos(page=p), s) for p, (_, s) in reruns]),
+        ('curry_span_calls_total', 'counter', 'Chamadas de cada span.',
+         [(_rotulos(page=p, span=s), v[0]) for (p, s), v in spans]),
+        ('curry_span_seconds_total', 'counter', 'Tempo total de cada span.',
+         [(_rotulos(page=p, span=s), v[1]) for (p, s), v in spans]),
+        ('curry_span_seconds_max', 'gauge', 'Maior duração de uma chamada do span.',
+         [(_rotulos(page=p, span=s), v[2]) for (p, s), v in spans]),
+    ]
+    if MEMORY:
+        metricas.append(('curry_span_memory_peak_bytes', 'gauge', 'Maior pico de memória alocada no span.',
+                         [(_rotulos(page=p, span=s), v[3]) for (p, s), v in spans]))
+    linhas = []
+    for nome, tipo, ajuda, amostras in metricas:
+        linhas.append('# HELP {} {}'.format(nome, ajuda))
+        linhas.append('# TYPE {} {}'.format(nome, tipo))
+        linhas += ['{}{} {}'.format(nome, rotulos, repr(float(valor))) for rotulos, valor in amostras]
+    return '\n'.join(linhas) + '\n'
+
+
+def write_metrics(path):
+    """Grava prometheus_text() no arquivo (troca atômica, para o coletor
+    nunca ler um arquivo pela metade)."""
+    tmp_path = '{}.{}.tmp'.format(path, threading.get_ident())
+    with open(tmp_path, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+def reset():
+    """Zera o acumulado do processo."""
+    with _lock:
+        _spans.clear()
+        _reruns.clear()
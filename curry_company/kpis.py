@@ -0,0 +1,278 @@
+# ------------------------------------------------------------------------
+# KPIs das três visões como funções puras (sem Streamlit)
+# ------------------------------------------------------------------------
+# Cada KPI recebe uma Window (os cubos já filtrados por datas e tráfego) e
+# devolve um Dataframe. As páginas só desenham os gráficos a partir desses
+# Dataframes, e o servidor HTTP (ver curry_company/server.py) entrega os
+# mesmos Dataframes como JSON, sem precisar de uma sessão do navegador.
+import threading
+
+import numpy as np
+import pandas as pd
+
+from curry_company import instrument, topk
+from curry_company.sketch import unique_source
+
+
+class Window:
+    """Cubos de uma janela de datas e tipos de tráfego.
+
+    Resultados usados por vários KPIs (ex.: as estatísticas de tempo da
+    visão restaurantes) são calculados uma única vez por janela, mesmo
+    quando os painéis da página são calculados em threads diferentes.
+
+    - cubos: dicionário de cubos (get_cubes).
+    - start, end, traffic: filtros (end exclusivo, como nas páginas).
+    - pedidos: cubo de pedidos filtrado.
+    - entregadores: cubo por entregador filtrado.
+    - unicos: fonte da contagem de entregadores únicos (ver unique_source).
+    """
+
+    def __init__(self, cubos, start=None, end=None, traffic=None):
+        self.cubos = cubos
+        self.start = start
+        self.end = end
+        self.traffic = traffic
+        self._memo = {}
+        self._travas = {}
+        self._lock = threading.Lock()
+
+    def memo(self, key, func):
+        """Calcula func() uma única vez por janela."""
+        if key in self._memo:
+            return self._memo[key]
+        # uma trava por chave: quem chega depois espera o cálculo em curso,
+        # sem bloquear o cálculo de outras chaves
+        with self._lock:
+            trava = self._travas.setdefault(key, threading.Lock())
+        with trava:
+            if key not in self._memo:
+                self._memo[key] = func()
+        return self._memo[key]
+
+    # os cubos só são filtrados quando algum KPI precisa deles (um gráfico
+    # servido do cache não toca nos dados)
+    @property
+    def pedidos(self):
+        return self.memo('pedidos', lambda: self.cubos['pedidos'].slice(
+            start=self.start, end=self.end, traffic=self.traffic))
+
+    @property
+    def entregadores(self):
+        return self.memo('entregadores', lambda: self.cubos['entregadores'].slice(
+            start=self.start, end=self.end, traffic=self.traffic))
+
+    @property
+    def unicos(self):
+        return self.memo('unicos', lambda: unique_source(
+            self.cubos, start=self.start, end=self.end, traffic=self.traffic))
+
+
+def _tempo(tabela):
+    # tabela (medida, estatística) de tempo -> colunas avg_time e std_time
+    df_aux = tabela.loc[:, 'Time_taken(min)']
+    df_aux.columns = ['avg_time', 'std_time']
+    return df_aux.reset_index()
+
+
+# ------------------------------------------------------------------------
+# Visão empresa
+# ------------------------------------------------------------------------
+@instrument.timed('kpi.orders_by_day')
+def orders_by_day(janela):
+    """1. Quantidade de pedidos por dia (colunas Order_Date, ID)."""
+    return janela.pedidos.orders(['Order_Date']).rename('ID').reset_index()
+
+
+@instrument.timed('kpi.orders_by_week')
+def orders_by_week(janela):
+    """2. Quantidade de pedidos por semana (colunas week_of_year, ID)."""
+    return janela.pedidos.orders(['week_of_year']).rename('ID').reset_index()
+
+
+@instrument.timed('kpi.orders_by_traffic')
+def orders_by_traffic(janela):
+    """3. Distribuição dos pedidos por tipo de tráfego (ID e entregas_percentual)."""
+    df_aux = janela.pedidos.orders(['Road_traffic_density']).rename('ID').reset_index()
+    df_aux = df_aux.loc[df_aux['Road_traffic_density'] != 'NaN', :]
+    df_aux['entregas_percentual'] = df_aux['ID'] / df_aux['ID'].sum()
+    return df_aux
+
+
+@instrument.timed('kpi.orders_by_city_traffic')
+def orders_by_city_traffic(janela):
+    """4. Volume de pedidos por cidade e tipo de tráfego."""
+    return janela.pedidos.orders(['City', 'Road_traffic_density']).rename('ID').reset_index()
+
+
+@instrument.timed('kpi.orders_per_courier_by_week')
+def orders_per_courier_by_week(janela):
+    """5. Pedidos por entregador único em cada semana (Order_by_deliver)."""
+    df_aux1 = orders_by_week(janela)
+    df_aux2 = janela.unicos.nunique(['week_of_year'], 'Delivery_person_ID').reset_index()
+    df_aux = pd.merge(df_aux1, df_aux2, how='inner')
+    df_aux['Order_by_deliver'] = df_aux['ID'] / df_aux['Delivery_person_ID']
+    return df_aux
+
+
+@instrument.timed('kpi.map_centers')
+def map_centers(janela):
+    """6. Localização central (média) das entregas por cidade e tráfego."""
+    df_aux = janela.pedidos.rollup(['City', 'Road_traffic_density'],
+                                   {'Delivery_location_latitude': ['mean'], 'Delivery_location_longitude': ['mean']})
+    df_aux.columns = ['Delivery_location_latitude', 'Delivery_location_longitude']
+    df_aux = df_aux.reset_index()
+    df_aux = df_aux.loc[df_aux['City'] != 'NaN', :]
+    return df_aux.loc[df_aux['Road_traffic_density'] != 'NaN', :]
+
+
+# ------------------------------------------------------------------------
+# Visão entregadores
+# ------------------------------------------------------------------------
+@instrument.timed('kpi.courier_extremes')
+def courier_extremes(janela):
+    """Maior/menor idade e melhor/pior condição de veículo (uma linha)."""
+    extremos = janela.pedidos.total({'Delivery_person_Age': ['max', 'min'], 'Vehicle_condition': ['max', 'min']})
+    return pd.DataFrame([{
+        'maior_idade': extremos[('Delivery_person_Age', 'max')],
+        'menor_idade': extremos[('Delivery_person_Age', 'min')],
+        'melhor_condicao': extremos[('Vehicle_condition', 'max')],
+        'pior_condicao': extremos[('Vehicle_condition', 'min')],
+    }])
+
+
+@instrument.timed('kpi.courier_summary')
+def courier_summary(janela):
+    """Resumo por entregador: pedidos, avaliação média e tempos médio e máximo.
+
+    Uma única consolidação do cubo por janela, base das tabelas paginadas
+    (ver curry_company/tables.py) e da avaliação média por entregador.
+    """
+    def resumir():
+        df_aux = janela.entregadores.rollup(['Delivery_person_ID'], {
+            'Delivery_person_Ratings': ['mean'], 'Time_taken(min)': ['mean', 'max']})
+        df_aux.columns = ['Delivery_person_Ratings', 'avg_time', 'max_time']
+        df_aux.insert(0, 'orders', janela.entregadores.orders(['Delivery_person_ID']))
+        return df_aux.reset_index()
+    return janela.memo('resumo_entregadores', resumir)
+
+
+@instrument.timed('kpi.ratings_by_courier')
+def ratings_by_courier(janela):
+    """Avaliação média por entregador."""
+    return courier_summary(janela).loc[:, ['Delivery_person_ID', 'Delivery_person_Ratings']]
+
+
+def _avaliacoes(janela):
+    # avaliações por trânsito e por clima numa única consolidação do cubo
+    return janela.memo('avaliacoes', lambda: janela.pedidos.stats(
+        {'trafego': ['Road_traffic_density'], 'clima': ['Weatherconditions']},
+        {'Delivery_person_Ratings': ['mean', 'std']}))
+
+
+@instrument.timed('kpi.ratings_by_traffic')
+def ratings_by_traffic(janela):
+    """Avaliação média e desvio padrão por tipo de tráfego."""
+    df_aux = _avaliacoes(janela).table('trafego').copy()
+    df_aux.columns = ['delivery_mean', 'delivery_std']
+    return df_aux.reset_index()
+
+
+@instrument.timed('kpi.ratings_by_weather')
+def ratings_by_weather(janela):
+    """Avaliação média e desvio padrão por condição climática."""
+    df_aux = _avaliacoes(janela).table('clima').copy()
+    df_aux.columns = ['delivery_mean', 'delivery_std']
+    return df_aux.reset_index()
+
+
+def _ranking(janela, k, metric, orders):
+    # mais rápidos e mais lentos saem do mesmo ranking (os pedidos da
+    # métrica 'p90' são os da própria janela)
+    return janela.memo(('ranking', k, metric),
+                       lambda: topk.courier_ranking(janela.entregadores, k=k, metric=metric, orders=orders))
+
+
+@instrument.timed('kpi.fastest_couriers')
+def fastest_couriers(janela, k=10, metric='max', orders=None):
+    """Os k entregadores mais rápidos de cada cidade (ver topk.courier_ranking)."""
+    return _ranking(janela, k, metric, orders)[0]
+
+
+@instrument.timed('kpi.slowest_couriers')
+def slowest_couriers(janela, k=10, metric='max', orders=None):
+    """Os k entregadores mais lentos de cada cidade (ver topk.courier_ranking)."""
+    return _ranking(janela, k, metric, orders)[1]
+
+
+# ------------------------------------------------------------------------
+# Visão restaurantes
+# ------------------------------------------------------------------------
+def _restaurantes(janela):
+    # todas as médias e desvios da visão restaurantes num único resultado
+    return janela.memo('restaurantes', lambda: janela.pedidos.stats(
+        {'festival': ['Festival'],
+         'cidade': ['City'],
+         'cidade_pedido': ['City', 'Type_of_order'],
+         'cidade_trafego': ['City', 'Road_traffic_density'],
+         'geral': []},
+        {'Time_taken(min)': ['mean', 'std'], 'distance_km': ['mean']}))
+
+
+@instrument.timed('kpi.unique_couriers')
+def unique_couriers(janela):
+    """1. Quantidade de entregadores únicos (uma linha)."""
+    contagem = janela.unicos.nunique([], 'Delivery_person_ID')
+    # janela sem pedidos: nenhum grupo, nenhum entregador
+    return pd.DataFrame({'Delivery_person_ID': [contagem.iloc[0] if len(contagem) else 0]})
+
+
+@instrument.timed('kpi.mean_distance')
+def mean_distance(janela):
+    """2. Distância média entre restaurante e local de entrega (uma linha)."""
+    medias = _restaurantes(janela).table('geral').loc[:, ('distance_km', 'mean')]
+    media = medias.iloc[0] if len(medias) else np.nan
+    return pd.DataFrame({'distance_km': [np.round(media, 2)]})
+
+
+@instrument.timed('kpi.time_by_city')
+def time_by_city(janela):
+    """3. Tempo médio e desvio padrão de entrega por cidade."""
+    return _tempo(_restaurantes(janela).table('cidade'))
+
+
+@instrument.timed('kpi.time_by_city_order')
+def time_by_city_order(janela):
+    """4. Tempo médio e desvio padrão por cidade e tipo de pedido."""
+    return _tempo(_restaurantes(janela).table('cidade_pedido'))
+
+
+@instrument.timed('kpi.time_by_city_traffic')
+def time_by_city_traffic(janela):
+    """5. Tempo médio e desvio padrão por cidade e tipo de tráfego."""
+    return _tempo(_restaurantes(janela).table('cidade_trafego'))
+
+
+@instrument.timed('kpi.time_by_festival')
+def time_by_festival(janela):
+    """6. Tempo médio e desvio padrão com e sem festival."""
+    return _tempo(_restaurantes(janela).table('festival'))
+
+
+@instrument.timed('kpi.distance_by_city')
+def distance_by_city(janela):
+    """Distância média das entregas por cidade."""
+    df_aux = _restaurantes(janela).table('cidade').loc[:, 'distance_km']
+    df_aux.columns = ['distance_km']
+    return df_aux.reset_index()
+
+
+# KPIs disponíveis pelo nome (usado pelo servidor HTTP)
+KPIS = {func.__name__: func for func in [
+    orders_by_day, orders_by_week, orders_by_traffic, orders_by_city_traffic,
+    orders_per_courier_by_week, map_centers,
+    courier_extremes, courier_summary, ratings_by_courier, ratings_by_traffic, ratings_by_weather,
+    fastest_couriers, slowest_couriers,
+    unique_couriers, mean_distance, time_by_city, time_by_city_order,
+    time_by_city_traffic, time_by_festival, distance_by_city,
+]}
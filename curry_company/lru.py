@@ -0,0 +1,56 @@
+# ------------------------------------------------------------------------
+# Cache LRU limitado e seguro entre threads (sessões do Streamlit)
+# ------------------------------------------------------------------------
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Dicionário limitado a maxsize itens, descartando o menos usado.
+
+    - hits, misses: contadores de acertos e faltas de get_or_compute.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, key):
+        return key in self._itens
+
+    def get_or_compute(self, key, func):
+        """Valor da chave; na primeira vez é calculado com func().
+
+        O cálculo é feito fora do lock, então duas sessões podem calcular a
+        mesma chave ao mesmo tempo; o resultado é o mesmo.
+        """
+        with self._lock:
+            if key in self._itens:
+                self._itens.move_to_end(key)
+                self.hits += 1
+                return self._itens[key]
+            self.misses += 1
+
+        valor = func()
+
+        with self._lock:
+            self._itens[key] = valor
+            self._itens.move_to_end(key)
+            while len(self._itens) > self.maxsize:
+                self._itens.popitem(last=False)
+        return valor
+
+    def clear(self):
+        with self._lock:
+            self._itens.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        """Contadores do cache: hits, misses, size e maxsize."""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._itens), 'maxsize': self.maxsize}
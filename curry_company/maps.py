@@ -0,0 +1,168 @@
+# ------------------------------------------------------------------------
+# Mapa escalável: grade agregada no servidor + cache do HTML renderizado
+# ------------------------------------------------------------------------
+# Um marcador do folium por pedido deixa o mapa inutilizável a partir de
+# alguns milhares de pontos. Aqui as coordenadas são agrupadas numa grade
+# regular (vetorizado com numpy) e o mapa recebe apenas as células ocupadas:
+#   - entregas: camada GeoJSON com um quadrado por célula, colorido pela
+#     quantidade de pedidos;
+#   - restaurantes: camada de calor (HeatMap) com o centro de cada célula
+#     pesado pela quantidade de pedidos;
+#   - centros de cada cidade/tráfego: marcadores agrupados (MarkerCluster).
+# O número de células é limitado por config.MAP_MAX_CELLS, então o HTML
+# enviado ao navegador não cresce com o número de pedidos. O HTML de cada
+# estado dos filtros fica num cache LRU.
+#
+# O folium (o import mais caro das páginas) só é importado quando um mapa é
+# montado de fato, não ao importar este módulo.
+import numpy as np
+import pandas as pd
+
+from curry_company import config, instrument
+from curry_company.lru import LRUCache
+
+# Cores da camada de entregas, da célula com menos pedidos para a com mais
+CORES = ['#ffffb2', '#fecc5c', '#fd8d3c', '#f03b20', '#bd0026']
+
+_cache = LRUCache(config.MAP_CACHE_SIZE)
+
+
+def grid_cells(lat, lon, cell_deg):
+    """Código da célula da grade de cada ponto.
+
+    Input: arrays de latitudes e longitudes em graus e o tamanho da célula.
+    Output: array int64 com linha * colunas + coluna de cada ponto.
+    """
+    colunas = int(np.ceil(360 / cell_deg))
+    linha = np.floor((np.asarray(lat, dtype='float64') + 90) / cell_deg).astype('int64')
+    coluna = np.floor((np.asarray(lon, dtype='float64') + 180) / cell_deg).astype('int64')
+    return linha * colunas + coluna
+
+
+def aggregate_grid(lat, lon, cell_deg=None, max_cells=None):
+    """Conta os pontos de cada célula ocupada da grade.
+
+    Se houver mais de max_cells células ocupadas, a célula é dobrada até
+    caber.
+
+    Input:
+        - lat, lon: coordenadas dos pontos.
+        - cell_deg: tamanho inicial da célula (padrão: config.MAP_CELL_DEG).
+        - max_cells: máximo de células (padrão: config.MAP_MAX_CELLS).
+    Output: tupla (Dataframe com 'latitude', 'longitude' do canto sudoeste
+    e 'orders' de cada célula, tamanho da célula usado). Pontos sem
+    coordenada (NaN) são ignorados.
+    """
+    cell_deg = config.MAP_CELL_DEG if cell_deg is None else cell_deg
+    max_cells = config.MAP_MAX_CELLS if max_cells is None else max_cells
+    # coordenadas inválidas chegam como NaN da ingestão
+    validas = np.isfinite(lat) & np.isfinite(lon)
+    lat, lon = np.asarray(lat)[validas], np.asarray(lon)[validas]
+    while True:
+        codigos, contagens = np.unique(grid_cells(lat, lon, cell_deg), return_counts=True)
+        if len(codigos) <= max_cells:
+            break
+        cell_deg *= 2
+
+    colunas = int(np.ceil(360 / cell_deg))
+    grade = pd.DataFrame({
+        'latitude': (codigos // colunas) * cell_deg - 90,
+        'longitude': (codigos % colunas) * cell_deg - 180,
+        'orders': contagens,
+    })
+    return grade, cell_deg
+
+
+def grid_geojson(grade, cell_deg):
+    """GeoJSON com um quadrado por célula e a cor pela quantidade de pedidos.
+
+    Input: Dataframe de aggregate_grid e o tamanho da célula.
+    Output: dicionário FeatureCollection.
+    """
+    # faixas de cor pelos quantis, para que poucas células cheias não
+    # apaguem o resto do mapa
+    limites = np.quantile(grade['orders'], np.linspace(0, 1, len(CORES) + 1)[1:-1]) if len(grade) else []
+    classes = np.searchsorted(limites, grade['orders'].to_numpy(), 'left')
+
+    features = []
+    for lat, lon, pedidos, classe in zip(grade['latitude'], grade['longitude'], grade['orders'], classes):
+        lat, lon = round(float(lat), 5), round(float(lon), 5)
+        quadrado = [[lon, lat], [lon + cell_deg, lat], [lon + cell_deg, lat + cell_deg],
+                    [lon, lat + cell_deg], [lon, lat]]
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Polygon', 'coordinates': [[[round(x, 5), round(y, 5)] for x, y in quadrado]]},
+            'properties': {'orders': int(pedidos), 'cor': CORES[classe]},
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def build_map(entregas=None, restaurantes=None, centros=None, width=1024, height=600):
+    """Monta o mapa com as camadas agregadas.
+
+    Input:
+        - entregas: Dataframe com 'Delivery_location_latitude' e
+          'Delivery_location_longitude' (um por pedido) ou None.
+        - restaurantes: Dataframe com 'Restaurant_latitude' e
+          'Restaurant_longitude' (um por pedido) ou None.
+        - centros: Dataframe com 'City', 'Road_traffic_density' e as
+          coordenadas de entrega do centro de cada grupo, ou None.
+        - width, height: tamanho do mapa em pixels.
+    Output: folium.Figure pronto para renderizar.
+    """
+    import folium
+    from folium import plugins
+
+    figura = folium.Figure(width=width, height=height)
+    mapa = folium.Map().add_to(figura)
+    limites = []
+
+    if entregas is not None and len(entregas):
+        grade, cell_deg = aggregate_grid(entregas['Delivery_location_latitude'].to_numpy(),
+                                         entregas['Delivery_location_longitude'].to_numpy())
+        folium.GeoJson(
+            grid_geojson(grade, cell_deg),
+            name='Entregas (grade de {:g}°)'.format(cell_deg),
+            style_function=lambda f: {'fillColor': f['properties']['cor'], 'color': f['properties']['cor'],
+                                      'weight': 0, 'fillOpacity': 0.6},
+            tooltip=folium.GeoJsonTooltip(fields=['orders'], aliases=['Pedidos']),
+        ).add_to(mapa)
+        limites += [[grade['latitude'].min(), grade['longitude'].min()],
+                    [grade['latitude'].max() + cell_deg, grade['longitude'].max() + cell_deg]]
+
+    if restaurantes is not None and len(restaurantes):
+        grade, cell_deg = aggregate_grid(restaurantes['Restaurant_latitude'].to_numpy(),
+                                         restaurantes['Restaurant_longitude'].to_numpy())
+        pontos = np.column_stack([grade['latitude'] + cell_deg / 2, grade['longitude'] + cell_deg / 2,
+                                  grade['orders'] / grade['orders'].max()])
+        plugins.HeatMap(np.round(pontos, 5).tolist(), name='Restaurantes (calor)').add_to(mapa)
+
+    if centros is not None and len(centros):
+        cluster = plugins.MarkerCluster(name='Centro por cidade e tráfego').add_to(mapa)
+        for linha in centros.itertuples(index=False):
+            folium.Marker([linha.Delivery_location_latitude, linha.Delivery_location_longitude],
+                          popup='{} / {}'.format(linha.City, linha.Road_traffic_density)).add_to(cluster)
+        limites += centros[['Delivery_location_latitude', 'Delivery_location_longitude']].to_numpy().tolist()
+
+    if limites:
+        limites = np.array(limites, dtype='float64')
+        mapa.fit_bounds([limites.min(axis=0).tolist(), limites.max(axis=0).tolist()])
+    folium.LayerControl().add_to(mapa)
+    return figura
+
+
+def cached_html(key, builder):
+    """HTML de um mapa, renderizado uma única vez por chave.
+
+    Input:
+        - key: chave do estado dos filtros (ex.: assinatura do dataset,
+          datas e tipos de tráfego).
+        - builder: função sem argumentos que devolve o folium.Figure.
+    Output: texto HTML.
+    """
+    def renderizar():
+        with instrument.span('map.render'):
+            return builder().render()
+
+    with instrument.span('map.html'):
+        return _cache.get_or_compute(key, renderizar)
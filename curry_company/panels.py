@@ -0,0 +1,96 @@
+# ------------------------------------------------------------------------
+# Cálculo concorrente dos painéis de uma página
+# ------------------------------------------------------------------------
+# Num rerun, os painéis de uma página (as métricas do topo, os gráficos de
+# cada seção) são leituras independentes da mesma janela. Cada painel é
+# declarado com a função que o calcula e os painéis de que depende; os
+# independentes rodam ao mesmo tempo num pool de threads compartilhado pelas
+# sessões (boa parte dos kernels do pandas/NumPy libera o GIL) e a página
+# desenha os resultados na ordem do layout, na thread do Streamlit.
+#
+# As funções dos painéis não devem chamar o Streamlit: só calculam.
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from curry_company import config
+
+_pool = None
+_lock = threading.Lock()
+
+
+def _executor():
+    # o pool é criado na primeira página que usa mais de uma thread
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=config.PANEL_WORKERS,
+                                       thread_name_prefix='curry-panel')
+    return _pool
+
+
+class Panels:
+    """Painéis de uma página calculados concorrentemente.
+
+    Exemplo:
+        paineis = Panels()
+        paineis.add('tempos', kpis.time_by_festival, janela)
+        paineis.add('avg_festival', media, 'Yes', inputs=['tempos'])
+        resultados = paineis.run()
+
+    Cada painel recebe primeiro os resultados dos painéis listados em
+    inputs (na ordem dada) e depois os argumentos de add.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = config.PANEL_WORKERS if workers is None else workers
+        self._paineis = {}
+
+    def add(self, name, func, *args, inputs=()):
+        """Declara um painel.
+
+        Input:
+            - name: nome único do painel (chave do resultado).
+            - func: função que calcula o painel.
+            - args: argumentos de func.
+            - inputs: nomes de painéis já declarados cujos resultados são
+              passados antes de args.
+        Output: o próprio Panels (para encadear).
+        """
+        if name in self._paineis:
+            raise ValueError('painel repetido: {}'.format(name))
+        faltando = [n for n in inputs if n not in self._paineis]
+        if faltando:
+            raise ValueError('painel {} depende de painéis não declarados: {}'.format(name, faltando))
+        self._paineis[name] = (func, args, tuple(inputs))
+        return self
+
+    def run(self):
+        """Calcula todos os painéis.
+
+        Com workers <= 1 os painéis são calculados em sequência, na thread
+        que chamou. A primeira exceção de um painel é propagada.
+
+        Output: dicionário nome -> resultado, na ordem de declaração.
+        """
+        if self.workers <= 1:
+            resultados = {}
+            for nome, (func, args, inputs) in self._paineis.items():
+                resultados[nome] = func(*[resultados[n] for n in inputs], *args)
+            return resultados
+
+        # os painéis entram no pool na ordem de declaração e só dependem de
+        # painéis anteriores, que já saíram da fila quando um painel espera
+        # por eles: a espera nunca bloqueia o pool
+        pool = _executor()
+        futuros = {}
+        for nome, (func, args, inputs) in self._paineis.items():
+            dependencias = [futuros[n] for n in inputs]
+            # o contexto (ex.: o rerun medido pela instrumentação) segue o painel
+            contexto = contextvars.copy_context()
+            futuros[nome] = pool.submit(contexto.run, _calcular, func, args, dependencias)
+        return {nome: futuro.result() for nome, futuro in futuros.items()}
+
+
+def _calcular(func, args, dependencias):
+    return func(*[f.result() for f in dependencias], *args)
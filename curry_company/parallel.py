@@ -0,0 +1,100 @@
+# ------------------------------------------------------------------------
+# Agregação paralela dos pedidos em vários processos
+# ------------------------------------------------------------------------
+# Os pedidos limpos são divididos em partições (faixas de datas contíguas ou
+# cidades), cada processo constrói os cubos da sua partição (ver
+# curry_company/cube.py) e os cubos parciais são juntados com merge_cubes.
+# Como todos os KPIs das páginas (pedidos por dia/semana, entregadores por
+# semana, avaliações, top entregadores...) são consultas aos cubos, eles
+# passam a ser agregados em paralelo sem nenhuma mudança nas páginas.
+#
+# Em sistemas com fork, os processos herdam o dataframe do processo pai e
+# recebem apenas os limites da partição; nos demais a partição é enviada.
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from curry_company import config, cube
+
+# dataframe herdado pelos processos filhos (apenas com fork)
+_compartilhado = None
+
+
+def workers(requested=None):
+    """Quantidade de processos a usar.
+
+    Input: quantidade pedida (None usa config.WORKERS; 0 usa todos os núcleos).
+    Output: inteiro >= 1.
+    """
+    n = config.WORKERS if requested is None else requested
+    return max(1, n or os.cpu_count() or 1)
+
+
+def partition(df1, n, by='date'):
+    """Divide os pedidos em até n partições.
+
+    Input:
+        - df1: Dataframe limpo, ordenado por 'Order_Date'.
+        - n: quantidade de partições.
+        - by: 'date' (faixas contíguas de dias com tamanhos parecidos) ou
+          'City' (uma partição por cidade).
+    Output: lista de posições (slice ou array) de cada partição.
+    """
+    if by == 'City':
+        codigos = df1['City'].factorize()[0] if len(df1) else np.array([], dtype=int)
+        return [np.flatnonzero(codigos == c) for c in range(codigos.max() + 1 if len(codigos) else 0)]
+    if by != 'date':
+        raise ValueError('Partição não suportada: {}'.format(by))
+
+    # cortes nas fronteiras de dia mais próximas de len/n, para que um mesmo
+    # dia não fique em duas partições
+    datas = df1['Order_Date'].to_numpy()
+    alvos = datas[np.linspace(0, len(datas), n + 1).astype(int)[1:-1]] if len(datas) else []
+    cortes = [0] + [int(np.searchsorted(datas, d, 'left')) for d in alvos] + [len(datas)]
+    cortes = sorted(set(cortes))
+    return [slice(i, j) for i, j in zip(cortes[:-1], cortes[1:])]
+
+
+def _build_herdado(posicoes):
+    return cube.build_cubes(_compartilhado.iloc[posicoes])
+
+
+def build_cubes(df1, n_workers=None, by='date', min_rows=None):
+    """Constrói os cubos em paralelo, uma partição por processo.
+
+    Cai na construção serial (cube.build_cubes) quando há um único processo
+    ou menos de min_rows pedidos.
+
+    Input:
+        - df1: Dataframe limpo com as colunas de cube.cube_columns().
+        - n_workers: processos (padrão: config.WORKERS).
+        - by: critério de partição ('date' ou 'City').
+        - min_rows: mínimo de pedidos para paralelizar (padrão:
+          config.PARALLEL_MIN_ROWS).
+    Output: dicionário nome -> Cube, igual ao de cube.build_cubes.
+    """
+    global _compartilhado
+
+    n = workers(n_workers)
+    min_rows = config.PARALLEL_MIN_ROWS if min_rows is None else min_rows
+    if n == 1 or len(df1) < min_rows:
+        return cube.build_cubes(df1)
+
+    particoes = partition(df1, n, by)
+    if len(particoes) < 2:
+        return cube.build_cubes(df1)
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        _compartilhado = df1
+        try:
+            with ProcessPoolExecutor(min(n, len(particoes)), mp_context=multiprocessing.get_context('fork')) as pool:
+                parciais = list(pool.map(_build_herdado, particoes))
+        finally:
+            _compartilhado = None
+    else:
+        with ProcessPoolExecutor(min(n, len(particoes))) as pool:
+            parciais = list(pool.map(cube.build_cubes, [df1.iloc[p] for p in particoes]))
+
+    return cube.merge_cubes(parciais[0], *parciais[1:])
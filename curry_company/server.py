@@ -0,0 +1,196 @@
+# ------------------------------------------------------------------------
+# Servidor HTTP/JSON local com os KPIs do dashboard
+# ------------------------------------------------------------------------
+# Entrega cada KPI de curry_company/kpis.py como JSON, para outras
+# ferramentas internas consultarem sem abrir o dashboard:
+#
+#     python -m curry_company.server --port 8600
+#     GET /kpis                                   lista dos KPIs
+#     GET /kpi/orders_by_day?start=2022-02-11&end=2022-03-01&traffic=Low,Jam
+#     GET /kpi/fastest_couriers?k=5&metric=mean
+#     GET /kpi/fastest_couriers?metric=p90        só com CURRY_BACKEND=duckdb
+#     GET /metrics                                spans da instrumentação
+#                                                 (texto do Prometheus)
+#
+# start é inclusiva e end exclusiva, como no filtro das páginas; traffic é
+# uma lista separada por vírgulas (sem traffic, todos os tipos).
+#
+# O ETag de cada resposta é calculado a partir da versão do dataset e dos
+# parâmetros normalizados, antes de qualquer cálculo: uma requisição com
+# If-None-Match igual recebe 304 sem tocar nos dados, e as respostas ficam
+# num cache LRU até a versão do dataset mudar.
+import argparse
+import hashlib
+import inspect
+import json
+import traceback
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from curry_company import config, instrument, kpis
+from curry_company.data import dataset_version, get_cubes
+from curry_company.lru import LRUCache
+
+# parâmetros extras aceitos pelos KPIs que os declaram, e seus tipos
+PARAMETROS = {'k': int, 'metric': str}
+
+_cache = LRUCache(config.API_CACHE_SIZE)
+
+
+class RequestError(ValueError):
+    """Parâmetro inválido na requisição (vira HTTP 400)."""
+
+
+def parse_query(name, query):
+    """Normaliza os parâmetros de um KPI.
+
+    Input: nome do KPI e dicionário de parse_qs.
+    Output: tupla (start, end, traffic, extras) com datas em 'AAAA-MM-DD',
+    traffic ordenado (ou None) e extras como dicionário.
+    """
+    def unico(chave):
+        valores = query.get(chave)
+        return valores[-1] if valores else None
+
+    datas = []
+    for chave in ('start', 'end'):
+        valor = unico(chave)
+        try:
+            datas.append(pd.Timestamp(valor).strftime('%Y-%m-%d') if valor else None)
+        except ValueError:
+            raise RequestError('Data inválida em {}: {}'.format(chave, valor))
+
+    traffic = unico('traffic')
+    traffic = tuple(sorted(t.strip() for t in traffic.split(',') if t.strip())) if traffic is not None else None
+
+    aceitos = inspect.signature(kpis.KPIS[name]).parameters
+    extras = {}
+    for chave, tipo in PARAMETROS.items():
+        valor = unico(chave)
+        if valor is None:
+            continue
+        if chave not in aceitos:
+            raise RequestError('{} não aceita o parâmetro {}'.format(name, chave))
+        try:
+            extras[chave] = tipo(valor)
+        except ValueError:
+            raise RequestError('Valor inválido em {}: {}'.format(chave, valor))
+    if extras.get('metric') == 'p90' and config.BACKEND != 'duckdb':
+        raise RequestError("A métrica 'p90' precisa dos pedidos e não está disponível na API")
+    return datas[0], datas[1], traffic, extras
+
+
+def compute(name, start=None, end=None, traffic=None, **extras):
+    """Calcula um KPI e devolve o corpo JSON (bytes)."""
+    instrument.begin_rerun('api')
+    try:
+        janela = kpis.Window(get_cubes(), start=start, end=end, traffic=list(traffic) if traffic is not None else None)
+        df_aux = kpis.KPIS[name](janela, **extras)
+    finally:
+        instrument.end_rerun()
+    corpo = {
+        'kpi': name,
+        'start': start,
+        'end': end,
+        'traffic': list(traffic) if traffic is not None else None,
+        'params': extras,
+        'data': json.loads(df_aux.to_json(orient='records', date_format='iso')),
+    }
+    return json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+
+
+def etag_for(name, start=None, end=None, traffic=None, extras=None):
+    """ETag de um KPI: versão do dataset + parâmetros normalizados."""
+    chave = (dataset_version(), name, start, end, traffic, tuple(sorted((extras or {}).items())))
+    return '"{}"'.format(hashlib.sha1(repr(chave).encode()).hexdigest())
+
+
+def respond(name, start=None, end=None, traffic=None, extras=None):
+    """ETag e corpo da resposta de um KPI, usando o cache.
+
+    Output: tupla (etag, corpo em bytes).
+    """
+    extras = extras or {}
+    etag = etag_for(name, start, end, traffic, extras)
+    return etag, _cache.get_or_compute(etag, lambda: compute(name, start, end, traffic, **extras))
+
+
+class KPIHandler(BaseHTTPRequestHandler):
+    """Rotas GET /kpis, GET /kpi/<nome> e GET /metrics."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        partes = [p for p in url.path.split('/') if p]
+        try:
+            if partes == ['metrics']:
+                corpo = instrument.prometheus_text().encode('utf-8')
+                self._send(HTTPStatus.OK, corpo, content_type='text/plain; version=0.0.4; charset=utf-8')
+                return
+            if partes == ['kpis']:
+                lista = [{'kpi': nome, 'doc': (func.__doc__ or '').strip().splitlines()[0]}
+                         for nome, func in kpis.KPIS.items()]
+                self._send(HTTPStatus.OK, json.dumps(lista, ensure_ascii=False).encode('utf-8'))
+                return
+            if len(partes) != 2 or partes[0] != 'kpi' or partes[1] not in kpis.KPIS:
+                self._erro(HTTPStatus.NOT_FOUND, 'KPI não encontrado: {}'.format(url.path))
+                return
+
+            start, end, traffic, extras = parse_query(partes[1], parse_qs(url.query))
+            # If-None-Match igual ao ETag atual: 304 sem calcular nada
+            etag = etag_for(partes[1], start, end, traffic, extras)
+            recebidos = [e.strip() for e in self.headers.get('If-None-Match', '').split(',')]
+            if etag in recebidos:
+                self._send(HTTPStatus.NOT_MODIFIED, b'', etag)
+                return
+            etag, corpo = respond(partes[1], start, end, traffic, extras)
+            self._send(HTTPStatus.OK, corpo, etag)
+        except ValueError as erro:  # RequestError ou métrica desconhecida no KPI
+            self._erro(HTTPStatus.BAD_REQUEST, str(erro))
+        except Exception as erro:  # falha ao ler os dados ou calcular o KPI
+            self.log_error('%s', traceback.format_exc())
+            self._erro(HTTPStatus.INTERNAL_SERVER_ERROR, 'Erro interno: {}'.format(erro))
+
+    def _send(self, status, corpo, etag=None, content_type='application/json; charset=utf-8'):
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.wfile.write(corpo)
+
+    def _erro(self, status, mensagem):
+        self._send(status, json.dumps({'error': mensagem}, ensure_ascii=False).encode('utf-8'))
+
+
+def make_server(host=None, port=None):
+    """Cria o servidor (sem iniciá-lo); porta 0 escolhe uma porta livre."""
+    host = config.API_HOST if host is None else host
+    port = config.API_PORT if port is None else port
+    return ThreadingHTTPServer((host, port), KPIHandler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Servidor HTTP/JSON dos KPIs do dashboard.')
+    parser.add_argument('--host', default=config.API_HOST)
+    parser.add_argument('--port', type=int, default=config.API_PORT)
+    args = parser.parse_args(argv)
+
+    servidor = make_server(args.host, args.port)
+    print('KPIs em http://{}:{}/kpis (dataset {})'.format(args.host, servidor.server_port, config.DATASET_PATH))
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == '__main__':
+    main()
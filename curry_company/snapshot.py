@@ -0,0 +1,355 @@
+# ------------------------------------------------------------------------
+# Snapshot colunar (Parquet) do dataset limpo
+# ------------------------------------------------------------------------
+# A limpeza do CSV (sentinelas 'NaN ', strip dos textos, conversão de datas)
+# é feita uma única vez e o resultado é gravado em Parquet, já tipado e com
+# as colunas de baixa cardinalidade como categóricas. As páginas leem apenas
+# as colunas que usam (projeção de colunas).
+#
+# Lotes novos de pedidos (ver curry_company/ingest.py) são gravados como
+# partições separadas em '<snapshot>.parts/part-00001-<base>.parquet', ... e
+# lidos junto com o snapshot base.
+#
+# <base> identifica o CSV (tamanho e mtime) a partir do qual o snapshot base
+# foi gerado; ele fica no cabeçalho do snapshot e no nome e cabeçalho de cada
+# partição. Quando o CSV é substituído, o snapshot é reconstruído com outra
+# base e as partições antigas passam a ser ignoradas: o CSV novo normalmente
+# já traz esses pedidos, e somá-las contaria os pedidos duas vezes. Os
+# arquivos ficam no disco; se os pedidos de algum lote não estiverem no CSV
+# novo, o lote deve ser anexado de novo (os IDs repetidos são descartados).
+#
+# Ao lado de cada arquivo fica um índice dos IDs de pedido
+# ('<arquivo>.ids.npy': os IDs, inteiros, únicos e ordenados), usado pela
+# deduplicação dos lotes: cada ID do lote é procurado por busca binária no
+# índice mapeado em memória, sem ler a coluna de IDs do histórico.
+import glob
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from curry_company import instrument
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_ARROW = True
+except ImportError:  # pyarrow é opcional: sem ele as páginas leem o CSV
+    HAS_ARROW = False
+
+# Versão do schema gravada no cabeçalho do arquivo. Deve ser incrementada
+# sempre que a limpeza ou os tipos das colunas mudarem, para forçar a
+# reconstrução de snapshots antigos.
+SCHEMA_VERSION = 6
+SCHEMA_KEY = b'curry_company.schema_version'
+SOURCE_KEY = b'curry_company.source'
+BASE_KEY = b'curry_company.base'
+
+IDS_SUFFIX = '.ids.npy'
+
+# cabeçalho de cada snapshot: (caminho, tamanho, mtime) -> (versão, base)
+_cabecalhos = {}
+_lock = threading.Lock()
+
+# Colunas de texto guardadas como category (códigos inteiros + dicionário).
+# O ID do entregador entra aqui: são poucos entregadores para muitos pedidos.
+CATEGORICAL_COLUMNS = ['City', 'Road_traffic_density', 'Weatherconditions',
+                       'Type_of_order', 'Type_of_vehicle', 'Festival',
+                       'Delivery_person_ID', 'Time_Orderd', 'Time_Order_picked']
+
+
+def to_categorical(df1):
+    """Converte as colunas de baixa cardinalidade para o tipo category.
+
+    Input: Dataframe limpo.
+    Output: Dataframe.
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col in df1.columns:
+            df1[col] = df1[col].astype('category')
+    return df1
+
+
+def source_tag(csv_path):
+    """Identificador curto da versão do CSV (tamanho e mtime).
+
+    Input: caminho do CSV.
+    Output: texto hexadecimal de 12 caracteres.
+    """
+    stat = os.stat(csv_path)
+    return hashlib.sha1('{}:{}'.format(stat.st_size, stat.st_mtime_ns).encode()).hexdigest()[:12]
+
+
+def _cabecalho(snapshot_path):
+    # (versão do schema, base) lidos uma vez por versão do arquivo
+    stat = os.stat(snapshot_path)
+    chave = (os.path.abspath(snapshot_path), stat.st_size, stat.st_mtime_ns)
+    cabecalho = _cabecalhos.get(chave)
+    if cabecalho is None:
+        metadata = pq.read_schema(snapshot_path).metadata or {}
+        versao = metadata.get(SCHEMA_KEY)
+        cabecalho = (int(versao) if versao is not None else None, metadata.get(BASE_KEY, b'').decode())
+        with _lock:
+            _cabecalhos[chave] = cabecalho
+    return cabecalho
+
+
+def base_tag(snapshot_path):
+    """Base gravada no cabeçalho do snapshot ('' se não houver snapshot ou
+    se ele for anterior às bases).
+
+    Input: caminho do snapshot.
+    Output: texto.
+    """
+    try:
+        return _cabecalho(snapshot_path)[1]
+    except FileNotFoundError:
+        return ''
+
+
+def write_snapshot(df1, snapshot_path, source='', base=''):
+    """Grava o dataframe limpo em Parquet com o cabeçalho de versão.
+
+    A escrita é feita em um arquivo temporário e depois renomeada, para que
+    uma página lendo o snapshot nunca veja um arquivo pela metade.
+
+    Input:
+        - df1: Dataframe limpo.
+        - snapshot_path: caminho do arquivo Parquet.
+        - source: descrição da origem dos dados (gravada no cabeçalho).
+        - base: versão do CSV base (ver source_tag).
+    Output: caminho do snapshot.
+    """
+    table = pa.Table.from_pandas(to_categorical(df1), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SCHEMA_KEY] = str(SCHEMA_VERSION).encode()
+    metadata[SOURCE_KEY] = str(source).encode()
+    metadata[BASE_KEY] = str(base).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    tmp_path = snapshot_path + '.tmp'
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, snapshot_path)
+    if 'ID' in df1.columns:
+        write_id_index(df1['ID'], snapshot_path)
+    return snapshot_path
+
+
+def write_id_index(ids, path):
+    """Grava o índice de IDs de um arquivo do snapshot (IDs únicos e
+    ordenados), também via arquivo temporário.
+
+    Input: IDs do arquivo e caminho do arquivo Parquet.
+    Output: caminho do índice.
+    """
+    indice = path + IDS_SUFFIX
+    with open(indice + '.tmp', 'wb') as f:
+        np.save(f, np.unique(np.asarray(ids, dtype='int64')))
+    os.replace(indice + '.tmp', indice)
+    return indice
+
+
+def _id_index(path):
+    # índice mapeado em memória; arquivos sem índice (ou com um índice mais
+    # antigo que o arquivo, de um snapshot reconstruído) são indexados aqui
+    indice = path + IDS_SUFFIX
+    try:
+        if os.stat(indice).st_mtime_ns >= os.stat(path).st_mtime_ns:
+            return np.load(indice, mmap_mode='r')
+    except FileNotFoundError:
+        pass
+    write_id_index(pq.read_table(path, columns=['ID']).column('ID').to_numpy(), path)
+    return np.load(indice, mmap_mode='r')
+
+
+def contains_ids(snapshot_path, ids):
+    """Indica quais IDs já estão no snapshot ou em alguma partição.
+
+    Cada ID é procurado nos índices de IDs dos arquivos (ver o cabeçalho do
+    módulo): o custo depende do tamanho do lote e da quantidade de
+    partições, não da quantidade de pedidos do histórico.
+
+    Input: caminho do snapshot e IDs a procurar.
+    Output: array booleano (True para os IDs já existentes).
+    """
+    procurados = np.asarray(ids, dtype='int64')
+    existentes = np.zeros(len(procurados), dtype=bool)
+    pasta = partitions_dir(snapshot_path)
+    for path in [snapshot_path] + [os.path.join(pasta, nome) for nome in list_partitions(snapshot_path)]:
+        indice = _id_index(path)
+        if len(indice) == 0:
+            continue
+        posicoes = np.minimum(np.searchsorted(indice, procurados), len(indice) - 1)
+        existentes |= indice[posicoes] == procurados
+    return existentes
+
+
+def build_snapshot(csv_path, snapshot_path):
+    """Lê o CSV bruto, aplica a limpeza e as colunas derivadas e grava o snapshot.
+
+    Input: caminho do CSV e caminho do snapshot.
+    Output: caminho do snapshot.
+    """
+    from curry_company.data import prepare_dataset
+
+    with instrument.span('data.read_csv'):
+        df = pd.read_csv(csv_path)
+    df1 = prepare_dataset(df)
+    return write_snapshot(df1, snapshot_path, source=os.path.abspath(csv_path), base=source_tag(csv_path))
+
+
+def schema_version(snapshot_path):
+    """Retorna a versão do schema gravada no snapshot (ou None)."""
+    return _cabecalho(snapshot_path)[0]
+
+
+def is_fresh(csv_path, snapshot_path):
+    """Verifica se o snapshot existe, é da versão atual e foi gerado a partir
+    desta versão do CSV (a base gravada; snapshots anteriores às bases só
+    não podem ser mais antigos que o CSV).
+
+    Input: caminho do CSV e caminho do snapshot.
+    Output: bool.
+    """
+    if not os.path.exists(snapshot_path):
+        return False
+    try:
+        if schema_version(snapshot_path) != SCHEMA_VERSION:
+            return False
+        base = base_tag(snapshot_path)
+    except (OSError, pa.ArrowInvalid):
+        return False
+    if base:
+        return base == source_tag(csv_path)
+    return os.path.getmtime(snapshot_path) >= os.path.getmtime(csv_path)
+
+
+def partitions_dir(snapshot_path):
+    """Diretório onde ficam as partições anexadas ao snapshot."""
+    return os.path.splitext(snapshot_path)[0] + '.parts'
+
+
+def _numero(nome):
+    # 'part-00012-<base>.parquet' -> 12
+    return int(os.path.basename(nome)[5:10])
+
+
+def _base_da_particao(nome):
+    # 'part-00012-<base>.parquet' -> '<base>' ('' nas partições sem base)
+    return os.path.basename(nome)[:-len('.parquet')][11:]
+
+
+def list_partitions(snapshot_path):
+    """Lista, em ordem de gravação, os nomes das partições do snapshot.
+
+    Partições ainda sendo gravadas (arquivo vazio reservado por
+    write_partition) e partições gravadas sobre outra versão do CSV base
+    (ver o cabeçalho do módulo) ficam de fora.
+
+    Input: caminho do snapshot.
+    Output: lista de nomes de arquivo.
+    """
+    base = base_tag(snapshot_path)
+    arquivos = glob.glob(os.path.join(partitions_dir(snapshot_path), 'part-*.parquet'))
+    return sorted(os.path.basename(a) for a in arquivos
+                  if _base_da_particao(a) == base and os.path.getsize(a) > 0)
+
+
+def _reservar(pasta, base):
+    # reserva o próximo número livre criando o arquivo vazio da partição com
+    # O_EXCL: dois appends simultâneos nunca ficam com o mesmo número (a
+    # numeração é única entre todas as bases)
+    existentes = glob.glob(os.path.join(pasta, 'part-*.parquet'))
+    numero = max((_numero(a) for a in existentes), default=0) + 1
+    sufixo = '-' + base if base else ''
+    while True:
+        caminho = os.path.join(pasta, 'part-{:05d}{}.parquet'.format(numero, sufixo))
+        try:
+            os.close(os.open(caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return numero, caminho
+        except FileExistsError:
+            numero += 1
+
+
+def write_partition(df1, snapshot_path):
+    """Grava um lote de pedidos já limpo como uma nova partição.
+
+    O número da partição é reservado antes da escrita (ver _reservar) e o
+    conteúdo substitui o arquivo reservado de uma vez (os.replace), então
+    appends simultâneos não se sobrescrevem e leitores nunca veem uma
+    partição pela metade.
+
+    A partição leva a base do snapshot (ver o cabeçalho do módulo).
+
+    Input: Dataframe limpo e caminho do snapshot base.
+    Output: caminho da partição gravada.
+    """
+    pasta = partitions_dir(snapshot_path)
+    os.makedirs(pasta, exist_ok=True)
+    base = base_tag(snapshot_path)
+    numero, caminho = _reservar(pasta, base)
+    try:
+        return write_snapshot(df1, caminho, source='lote {}'.format(numero), base=base)
+    except BaseException:
+        os.remove(caminho)  # libera a reserva vazia
+        raise
+
+
+def concat_frames(frames):
+    """Concatena dataframes lidos de arquivos diferentes, unindo as
+    categorias das colunas categóricas (cada arquivo tem seu dicionário).
+
+    Input: lista de Dataframes.
+    Output: Dataframe.
+    """
+    if len(frames) == 1:
+        return frames[0]
+    df1 = pd.concat(frames, ignore_index=True)
+    for col in CATEGORICAL_COLUMNS:
+        if col in df1.columns and not isinstance(df1[col].dtype, pd.CategoricalDtype):
+            # categorias em ordem alfabética, como as de astype('category')
+            df1[col] = union_categoricals([f[col] for f in frames], ignore_order=True, sort_categories=True)
+    return df1
+
+
+def read_partitions(snapshot_path, partitions, columns=None):
+    """Lê apenas as partições indicadas.
+
+    Input: caminho do snapshot, nomes das partições e colunas.
+    Output: lista de Dataframes (um por partição).
+    """
+    pasta = partitions_dir(snapshot_path)
+    return [pq.read_table(os.path.join(pasta, nome), columns=columns).to_pandas()
+            for nome in partitions]
+
+
+def iter_partition_batches(snapshot_path, partitions, batch_size, columns=None):
+    """Lê as partições indicadas em blocos de até batch_size linhas.
+
+    Input: caminho do snapshot, nomes das partições, tamanho do bloco e colunas.
+    Output: gerador de Dataframes.
+    """
+    pasta = partitions_dir(snapshot_path)
+    for nome in partitions:
+        arquivo = pq.ParquetFile(os.path.join(pasta, nome))
+        for lote in arquivo.iter_batches(batch_size=batch_size, columns=columns):
+            yield lote.to_pandas()
+
+
+def read_snapshot(snapshot_path, columns=None, partitions=None):
+    """Lê o snapshot trazendo apenas as colunas pedidas.
+
+    Input:
+        - snapshot_path: caminho do arquivo Parquet.
+        - columns: lista de colunas (None lê todas).
+        - partitions: partições anexadas a incluir (None inclui todas).
+    Output: Dataframe.
+    """
+    if partitions is None:
+        partitions = list_partitions(snapshot_path)
+    frames = [pq.read_table(snapshot_path, columns=columns).to_pandas()]
+    frames += read_partitions(snapshot_path, partitions, columns)
+    return concat_frames(frames)
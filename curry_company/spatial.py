@@ -0,0 +1,164 @@
+# ------------------------------------------------------------------------
+# Índice espacial em grade (geohash) sobre uma das pontas dos pedidos
+# ------------------------------------------------------------------------
+# As posições dos pedidos são ordenadas pelo geohash da ponta (restaurante
+# ou local de entrega, calculado na ingestão). Como as células maiores são
+# prefixos do código, cada célula de qualquer tamanho é uma faixa contígua
+# dos códigos ordenados: uma caixa vira algumas buscas binárias e só os
+# pedidos das células que tocam a caixa são conferidos um a um. O mesmo
+# vale para contagens e médias por célula.
+#
+# As posições são as do dataframe do DateIndex (ordenado por data), então o
+# filtro de datas é uma comparação com os limites [i, j) da janela.
+import numpy as np
+import pandas as pd
+
+from curry_company import config, geo, instrument
+
+# ponta -> (latitude, longitude, geohash)
+PONTAS = {'restaurant': geo.PONTAS[0], 'delivery': geo.PONTAS[1]}
+
+# Máximo de células consultadas por caixa; caixas maiores usam células maiores
+MAX_CELULAS = 64
+
+
+class SpatialIndex:
+    """Posições dos pedidos ordenadas pelo geohash de uma ponta.
+
+    - date_index: DateIndex com os pedidos (ver curry_company/index.py).
+    - endpoint: 'restaurant' ou 'delivery'.
+    - bits: tamanho do geohash das colunas de célula.
+    - codes: geohashes ordenados (só coordenadas válidas).
+    - positions: posição no dataframe de cada código de codes.
+    """
+
+    def __init__(self, date_index, endpoint='delivery', bits=None):
+        self.date_index = date_index
+        self.endpoint = endpoint
+        self.bits = config.GEOHASH_BITS if bits is None else bits
+        self.lat_column, self.lon_column, self.cell_column = PONTAS[endpoint]
+
+        df1 = date_index.df
+        celulas = df1[self.cell_column].to_numpy()
+        validas = np.flatnonzero(celulas != geo.SEM_CELULA)
+        ordem = np.argsort(celulas[validas], kind='stable')
+        self.positions = validas[ordem]
+        self.codes = celulas[self.positions]
+        self.lat = df1[self.lat_column].to_numpy(dtype='float64')
+        self.lon = df1[self.lon_column].to_numpy(dtype='float64')
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _faixas(self, lat_min, lon_min, lat_max, lon_max):
+        # faixas [início, fim) de códigos das células que tocam a caixa, no
+        # maior nível de detalhe com até MAX_CELULAS células
+        for bits in range(self.bits, 0, -1):
+            bits_lon, bits_lat = (bits + 1) // 2, bits // 2
+            x0, x1 = (np.floor((np.array([lon_min, lon_max]) + 180) / 360 * 2 ** bits_lon)).astype(np.int64)
+            y0, y1 = (np.floor((np.array([lat_min, lat_max]) + 90) / 180 * 2 ** bits_lat)).astype(np.int64)
+            if (x1 - x0 + 1) * (y1 - y0 + 1) <= MAX_CELULAS:
+                break
+        largura, altura = 360 / 2 ** bits_lon, 180 / 2 ** bits_lat
+        xs, ys = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+        # o centro de cada célula da caixa dá o seu código no nível escolhido
+        centros_lat = (ys.ravel() + 0.5) * altura - 90
+        centros_lon = (xs.ravel() + 0.5) * largura - 180
+        prefixos = np.unique(geo.geohash(centros_lat, centros_lon, self.bits) >> (self.bits - bits))
+        prefixos = prefixos[prefixos >= 0]
+        deslocamento = self.bits - bits
+        return prefixos << deslocamento, (prefixos + 1) << deslocamento
+
+    def _janela(self, posicoes, start, end, traffic):
+        # mantém apenas as posições na janela de datas e nos tipos de tráfego
+        if start is None and end is None and traffic is None:
+            return posicoes
+        i, j = self.date_index.bounds(start, end)
+        posicoes = posicoes[(posicoes >= i) & (posicoes < j)]
+        if traffic is not None and len(posicoes):
+            posicoes = posicoes[self.date_index.mask(traffic, i, j)[posicoes - i]]
+        return posicoes
+
+    def within_bbox(self, lat_min, lon_min, lat_max, lon_max, start=None, end=None, traffic=None):
+        """Pedidos cuja ponta está dentro da caixa.
+
+        Input: limites da caixa em graus e, opcionalmente, a janela de datas
+        (start inclusiva, end exclusiva) e os tipos de tráfego.
+        Output: array ordenado de posições no dataframe do DateIndex.
+        """
+        inicios, fins = self._faixas(lat_min, lon_min, lat_max, lon_max)
+        a = np.searchsorted(self.codes, inicios, 'left')
+        b = np.searchsorted(self.codes, fins, 'left')
+        candidatos = np.concatenate([self.positions[i:j] for i, j in zip(a, b)] or [np.array([], dtype=np.int64)])
+
+        lat, lon = self.lat[candidatos], self.lon[candidatos]
+        dentro = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        return self._janela(np.sort(candidatos[dentro]), start, end, traffic)
+
+    @instrument.timed('spatial.within_radius')
+    def within_radius(self, lat, lon, km, start=None, end=None, traffic=None):
+        """Pedidos cuja ponta está a até km quilômetros do ponto.
+
+        Input: centro em graus, raio em km e os filtros opcionais.
+        Output: array ordenado de posições no dataframe do DateIndex.
+        """
+        dlat = np.degrees(km / geo.RAIO_TERRA_KM)
+        dlon = dlat / max(np.cos(np.radians(lat)), 1e-6)
+        candidatos = self.within_bbox(lat - dlat, lon - dlon, lat + dlat, lon + dlon, start, end, traffic)
+        distancias = geo.haversine(np.full(len(candidatos), lat), np.full(len(candidatos), lon),
+                                   self.lat[candidatos], self.lon[candidatos])
+        return candidatos[distancias <= km]
+
+    def cell_stats(self, bits=None, positions=None, measure='Time_taken(min)'):
+        """Quantidade de pedidos e média de uma medida por célula.
+
+        Input:
+            - bits: tamanho das células (padrão: o do índice; menor = maior).
+            - positions: posições a considerar (ex.: de uma janela); None
+              usa todos os pedidos.
+            - measure: coluna cuja média é calculada.
+        Output: Dataframe com 'geohash', 'latitude' e 'longitude' (centro),
+        'orders' e a média da medida, uma linha por célula ocupada.
+        """
+        bits = self.bits if bits is None else bits
+        if positions is None:
+            posicoes, codigos = self.positions, self.codes
+        else:
+            celulas = self.date_index.df[self.cell_column].to_numpy()[positions]
+            validas = celulas != geo.SEM_CELULA
+            posicoes, codigos = np.asarray(positions)[validas], celulas[validas]
+
+        codigos = codigos >> (self.bits - bits)
+        celulas, inverso, pedidos = np.unique(codigos, return_inverse=True, return_counts=True)
+        valores = self.date_index.df[measure].to_numpy(dtype='float64')[posicoes]
+        presentes = ~np.isnan(valores)
+        soma = np.bincount(inverso, weights=np.where(presentes, valores, 0), minlength=len(celulas))
+        contagem = np.bincount(inverso, weights=presentes, minlength=len(celulas))
+
+        lat_min, lon_min, altura, largura = geo.geohash_bounds(celulas, bits)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = soma / contagem
+        return pd.DataFrame({
+            'geohash': geo.geohash_text(celulas, bits) if bits % 5 == 0 else celulas,
+            'latitude': lat_min + altura / 2,
+            'longitude': lon_min + largura / 2,
+            'orders': pedidos,
+            measure: media,
+        })
+
+    @instrument.timed('spatial.busiest')
+    def busiest(self, n=10, bits=None, start=None, end=None, traffic=None, measure='Time_taken(min)'):
+        """As n células com mais pedidos na janela.
+
+        Input: quantidade de células, tamanho das células e os filtros.
+        Output: Dataframe de cell_stats com as n células mais movimentadas.
+        """
+        posicoes = None
+        if start is not None or end is not None or traffic is not None:
+            # só as linhas da janela são lidas
+            i, j = self.date_index.bounds(start, end)
+            posicoes = np.arange(i, j)
+            if traffic is not None:
+                posicoes = posicoes[self.date_index.mask(traffic, i, j)]
+        celulas = self.cell_stats(bits, posicoes, measure)
+        return celulas.nlargest(n, 'orders').reset_index(drop=True)
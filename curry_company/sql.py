@@ -0,0 +1,258 @@
+# ------------------------------------------------------------------------
+# Backend SQL embutido (DuckDB) sobre o snapshot Parquet
+# ------------------------------------------------------------------------
+# Alternativa aos cubos em pandas (ver curry_company/cube.py), ligada com
+# CURRY_BACKEND=duckdb. Os pedidos limpos ficam no snapshot Parquet (e nas
+# partições anexadas); o DuckDB lê esses arquivos direto numa view, sem
+# carregar o dataset no processo. SqlCube tem a mesma interface do Cube
+# (slice, orders, nunique, rollup, total e stats), então kpis.Window e os
+# KPIs não mudam: os filtros de data e tráfego e as agregações viram uma
+# consulta SQL e só o resultado (poucas linhas) chega ao pandas.
+#
+# Os resultados seguem os do pandas: mesmas colunas (medida, estatística),
+# linhas ordenadas pelas dimensões, dimensões categóricas como categorias,
+# desvio padrão amostral e linhas com alguma dimensão ausente fora do cubo
+# (como no groupby das células).
+import threading
+
+import numpy as np
+import pandas as pd
+
+from curry_company import instrument, snapshot, stats
+from curry_company.cube import CUBOS
+from curry_company.data import FLOAT32_COLUMNS
+
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except ImportError:  # o backend SQL é opcional
+    HAS_DUCKDB = False
+
+# Dimensões derivadas de outras colunas (as mesmas de cube.DERIVADAS)
+DERIVADAS = {
+    'week_of_year': "strftime(Order_Date, '%U')",
+}
+
+# Estatísticas de rollup em SQL (desvio e variância amostrais, ddof=1)
+AGREGADOS = {
+    'count': 'count({})',
+    'sum': 'coalesce(sum(CAST({} AS DOUBLE)), 0)',
+    'mean': 'avg({})',
+    'std': 'stddev_samp({})',
+    'var': 'var_samp({})',
+    'min': 'min({})',
+    'max': 'max({})',
+}
+
+
+def _nome(coluna):
+    # identificador entre aspas ('Time_taken(min)' tem parênteses)
+    return '"{}"'.format(coluna.replace('"', '""'))
+
+
+def _expressao(dimensao):
+    return DERIVADAS.get(dimensao, _nome(dimensao))
+
+
+class Engine:
+    """Conexão DuckDB com a view 'pedidos' sobre os arquivos Parquet.
+
+    Cada consulta usa um cursor próprio, então a mesma Engine atende os
+    painéis calculados em threads diferentes.
+
+    - files: caminhos do snapshot e das partições.
+    """
+
+    def __init__(self, files):
+        self.files = list(files)
+        self._conexao = duckdb.connect(database=':memory:')
+        arquivos = ', '.join("'{}'".format(f.replace("'", "''")) for f in self.files)
+        # float32 (avaliações e coordenadas) vira double, como em stats.describe
+        # e Order_Date fica com a precisão do pandas
+        colunas = ', '.join('CAST({0} AS DOUBLE) AS {0}'.format(_nome(c)) for c in FLOAT32_COLUMNS)
+        self._conexao.execute(
+            'CREATE VIEW pedidos AS SELECT * REPLACE (CAST(Order_Date AS TIMESTAMP) AS Order_Date, {}) '
+            'FROM read_parquet([{}], union_by_name=true)'.format(colunas, arquivos))
+        self._lock = threading.Lock()
+
+    def query(self, sql, params=()):
+        """Executa a consulta e devolve o resultado como Dataframe."""
+        with self._lock:
+            cursor = self._conexao.cursor()
+        try:
+            with instrument.span('sql.query'):
+                return cursor.execute(sql, list(params)).df()
+        finally:
+            cursor.close()
+
+
+class SqlCube:
+    """Consulta SQL com a interface do Cube: as dimensões e medidas de um
+    cubo e os filtros acumulados pelos slices.
+
+    - engine: Engine com a view dos pedidos.
+    - dimensions: lista de dimensões.
+    - measures: lista de medidas.
+    - filters: lista de (condição SQL, parâmetros).
+    """
+
+    def __init__(self, engine, dimensions, measures, filters=()):
+        self.engine = engine
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        self.filters = list(filters)
+
+    @instrument.timed('filter.cube_slice')
+    def slice(self, start=None, end=None, traffic=None, **filtros):
+        """Acrescenta os filtros de uma janela de datas e de alguns valores
+        de dimensão (nenhum dado é lido aqui).
+
+        Input: como em Cube.slice (end exclusivo).
+        Output: SqlCube com os filtros acumulados.
+        """
+        filters = list(self.filters)
+        if start is not None:
+            filters.append(('Order_Date >= ?', [pd.Timestamp(start)]))
+        if end is not None:
+            filters.append(('Order_Date < ?', [pd.Timestamp(end)]))
+        if traffic is not None:
+            filtros['Road_traffic_density'] = traffic
+        for dimensao, valores in filtros.items():
+            valores = [str(v) for v in valores]
+            if valores:
+                filters.append(('{} IN ({})'.format(_nome(dimensao), ', '.join('?' * len(valores))), valores))
+            else:
+                filters.append(('FALSE', []))
+        return SqlCube(self.engine, self.dimensions, self.measures, filters)
+
+    def _where(self):
+        # linhas sem alguma dimensão não entram nas células do cubo
+        condicoes = ['{} IS NOT NULL'.format(_nome(d)) for d in self.dimensions]
+        params = []
+        for condicao, valores in self.filters:
+            condicoes.append(condicao)
+            params += valores
+        return ' AND '.join(condicoes), params
+
+    def _consulta(self, by, selecoes):
+        # SELECT <by>, <selecoes> ... GROUP BY <by> ORDER BY <by>
+        where, params = self._where()
+        chaves = ['{} AS {}'.format(_expressao(d), _nome(d)) for d in by]
+        sql = 'SELECT {} FROM pedidos WHERE {}'.format(', '.join(chaves + selecoes), where)
+        if by:
+            grupos = ', '.join(_nome(d) for d in by)
+            sql += ' GROUP BY {0} ORDER BY {0}'.format(grupos)
+        return self.engine.query(sql, params)
+
+    def _indexar(self, df_aux, by):
+        if not by:
+            # sem agrupamento: um único grupo (chave 0), como no Cube, ou
+            # nenhum quando a janela está vazia
+            df_aux = df_aux.loc[df_aux['orders'] > 0] if 'orders' in df_aux else df_aux
+            df_aux.index = pd.Index(np.zeros(len(df_aux), dtype=np.int8))
+            return df_aux
+        for d in by:
+            if d in snapshot.CATEGORICAL_COLUMNS:
+                df_aux[d] = df_aux[d].astype('category')
+        return df_aux.set_index(by)
+
+    def orders(self, by):
+        """Quantidade de pedidos agrupada por 'by' (COUNT(*)).
+
+        Input: lista de dimensões.
+        Output: Série com a contagem de pedidos.
+        """
+        df_aux = self._indexar(self._consulta(by, ['count(*) AS orders']), by)
+        return df_aux['orders']
+
+    def nunique(self, by, dimension):
+        """Quantidade de valores distintos de uma dimensão agrupada por 'by'
+        (COUNT(DISTINCT)).
+
+        Input: lista de dimensões e a dimensão a ser contada.
+        Output: Série com as contagens distintas.
+        """
+        selecoes = ['count(*) AS orders', 'count(DISTINCT {}) AS {}'.format(_nome(dimension), _nome(dimension))]
+        df_aux = self._indexar(self._consulta(by, selecoes), by)
+        return df_aux[dimension]
+
+    def rollup(self, by, agg):
+        """Consolida os pedidos no agrupamento pedido (GROUP BY).
+
+        Input: como em Cube.rollup.
+        Output: Dataframe indexado pelas dimensões de 'by', com colunas
+        (medida, estatística).
+        """
+        return self.stats({'by': by}, agg).table('by')
+
+    def total(self, agg):
+        """Mesmo que rollup, mas sem agrupamento.
+
+        Input: dicionário medida -> estatísticas.
+        Output: Série indexada por (medida, estatística).
+        """
+        resultado = self.rollup([], agg)
+        if resultado.empty:
+            return pd.Series(np.nan, index=resultado.columns)
+        return resultado.iloc[0]
+
+    def stats(self, groupings, agg):
+        """Calcula vários agrupamentos numa única consulta (GROUPING SETS).
+
+        Input: como em Cube.stats.
+        Output: StatsResult.
+        """
+        dimensoes = []
+        for by in groupings.values():
+            dimensoes += [d for d in by if d not in dimensoes]
+
+        colunas = []
+        selecoes = ['count(*) AS orders']
+        for medida, estatisticas in agg.items():
+            for estatistica in estatisticas:
+                if estatistica not in AGREGADOS:
+                    raise ValueError('Estatística não suportada: {}'.format(estatistica))
+                colunas.append((medida, estatistica))
+                selecoes.append('{} AS "m{}"'.format(AGREGADOS[estatistica].format(_nome(medida)), len(colunas)))
+        selecoes += ['grouping({}) AS "g{}"'.format(_nome(d), i) for i, d in enumerate(dimensoes)]
+
+        where, params = self._where()
+        chaves = ['{} AS {}'.format(_expressao(d), _nome(d)) for d in dimensoes]
+        conjuntos = ', '.join('({})'.format(', '.join(_nome(d) for d in by)) for by in groupings.values())
+        sql = 'SELECT {} FROM pedidos WHERE {} GROUP BY GROUPING SETS ({})'.format(
+            ', '.join(chaves + selecoes), where, conjuntos)
+        resultado = self.engine.query(sql, params)
+
+        tabelas = {}
+        for nome, by in groupings.items():
+            # linhas do conjunto: grouping() = 0 só nas dimensões de 'by'
+            linhas = np.ones(len(resultado), dtype=bool)
+            for i, d in enumerate(dimensoes):
+                linhas &= (resultado['g{}'.format(i)] == (0 if d in by else 1)).to_numpy()
+            df_aux = resultado.loc[linhas, list(by) + ['orders'] + ['m{}'.format(i + 1) for i in range(len(colunas))]]
+            if by:
+                df_aux = df_aux.sort_values(list(by), kind='stable')
+            df_aux = self._indexar(df_aux.reset_index(drop=True), list(by)).drop(columns='orders')
+            df_aux.columns = pd.MultiIndex.from_tuples(colunas)
+            tabelas[nome] = df_aux
+        return stats.StatsResult(tabelas)
+
+    def quantile(self, by, measure, q):
+        """Quantil de uma medida agrupado por 'by' (interpolação linear,
+        como o quantile do pandas).
+
+        Input: lista de dimensões, medida e quantil (ex.: 0.9).
+        Output: Dataframe com a coluna da medida.
+        """
+        selecoes = ['count(*) AS orders', 'quantile_cont({0}, {1}) AS {0}'.format(_nome(measure), float(q))]
+        return self._indexar(self._consulta(by, selecoes), by).loc[:, [measure]]
+
+
+def build_cubes(files):
+    """SqlCubes com as dimensões e medidas de cube.CUBOS sobre os arquivos.
+
+    Input: caminhos do snapshot e das partições.
+    Output: dicionário nome -> SqlCube.
+    """
+    engine = Engine(files)
+    return {nome: SqlCube(engine, dimensoes, medidas) for nome, (dimensoes, medidas) in CUBOS.items()}
@@ -0,0 +1,160 @@
+# ------------------------------------------------------------------------
+# Acumuladores mergeáveis de média e desvio padrão (estilo Welford)
+# ------------------------------------------------------------------------
+# Cada grupo guarda (count, mean, m2, min, max) por medida, onde m2 é a soma
+# dos quadrados dos desvios em relação à média do grupo. Dois acumuladores
+# podem ser juntados sem voltar aos dados (fórmula de Chan et al.):
+#
+#     n    = n_a + n_b
+#     mean = (n_a * mean_a + n_b * mean_b) / n
+#     m2   = m2_a + m2_b + n_a * (mean_a - mean)^2 + n_b * (mean_b - mean)^2
+#
+# Isso permite somar resultados parciais de blocos, partições ou processos e
+# consolidar vários agrupamentos a partir do mesmo conjunto de acumuladores,
+# sem a perda de precisão de soma/soma dos quadrados.
+import numpy as np
+import pandas as pd
+
+# Estado guardado por medida em cada grupo
+PARCIAIS = ['count', 'mean', 'm2', 'min', 'max']
+
+# O pandas 1.x devolve os grupos de chaves categóricas (observed=True) na
+# ordem em que aparecem, mesmo com sort=True. Os resultados abaixo passam
+# por sort_index(), para saírem na ordem das categorias (alfabética) com
+# chaves categóricas ou de texto, em qualquer divisão em blocos.
+
+
+def col(medida, parcial):
+    """Nome da coluna do parcial de uma medida (ex.: 'Time_taken(min)|mean')."""
+    return '{}|{}'.format(medida, parcial)
+
+
+def describe(df1, keys, measures):
+    """Calcula os acumuladores de cada grupo a partir dos pedidos.
+
+    Input:
+        - df1: Dataframe com os pedidos.
+        - keys: lista de colunas de agrupamento.
+        - measures: lista de medidas.
+    Output: Dataframe indexado pelas chaves, com as colunas 'medida|parcial'.
+    """
+    grupos = df1.groupby(keys, observed=True, sort=True)
+    chaves = [df1[k] for k in keys]
+
+    colunas = {}
+    for medida in measures:
+        serie = grupos[medida]
+        valores = df1[medida].astype('float64')
+        if df1[medida].dtype == 'float32':
+            # médias em float64, iguais em qualquer divisão em blocos
+            serie = valores.groupby(chaves, observed=True, sort=True)
+        desvios = (valores - serie.transform('mean')) ** 2
+        colunas[col(medida, 'count')] = serie.count()
+        colunas[col(medida, 'mean')] = serie.mean()
+        colunas[col(medida, 'm2')] = desvios.groupby(chaves, observed=True, sort=True).sum()
+        colunas[col(medida, 'min')] = serie.min()
+        colunas[col(medida, 'max')] = serie.max()
+    return pd.DataFrame(colunas).sort_index()
+
+
+def combine(frame, keys, measures, sums=()):
+    """Junta os acumuladores das linhas de frame que caem no mesmo grupo.
+
+    Input:
+        - frame: Dataframe com colunas 'medida|parcial' (ex.: células do cubo).
+        - keys: chaves de agrupamento (nomes de colunas ou séries).
+        - measures: lista de medidas.
+        - sums: colunas extras que são apenas somadas (ex.: 'orders').
+    Output: Dataframe indexado pelas chaves, com as colunas 'medida|parcial'.
+    """
+    keys = [frame[k] if isinstance(k, str) else k for k in keys]
+    grupos = frame.groupby(keys, observed=True, sort=True, dropna=False)
+    indice = grupos.size().index
+    codigos = grupos.ngroup().to_numpy()
+    n_grupos = len(indice)
+
+    def somar(valores):
+        return np.bincount(codigos, weights=valores, minlength=n_grupos)
+
+    colunas = {c: grupos[c].sum() for c in sums}
+    for medida in measures:
+        n = frame[col(medida, 'count')].to_numpy(dtype='float64')
+        media = frame[col(medida, 'mean')].to_numpy(dtype='float64')
+        peso = np.nan_to_num(n * media)  # grupos sem valores têm média NaN
+
+        n_grupo = somar(n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media_grupo = np.where(n_grupo > 0, somar(peso) / n_grupo, np.nan)
+        desvios = np.nan_to_num(n * (media - media_grupo[codigos]) ** 2)
+        m2 = np.nan_to_num(frame[col(medida, 'm2')].to_numpy(dtype='float64')) + desvios
+
+        colunas[col(medida, 'count')] = pd.Series(n_grupo.astype('int64'), index=indice)
+        colunas[col(medida, 'mean')] = pd.Series(media_grupo, index=indice)
+        colunas[col(medida, 'm2')] = pd.Series(somar(m2), index=indice)
+        colunas[col(medida, 'min')] = grupos[col(medida, 'min')].min()
+        colunas[col(medida, 'max')] = grupos[col(medida, 'max')].max()
+    return pd.DataFrame(colunas, index=indice).sort_index()
+
+
+def finalize(acumuladores, agg):
+    """Transforma os acumuladores nas estatísticas pedidas.
+
+    A interface segue o groupby().agg() do pandas: o resultado tem colunas
+    em dois níveis (medida, estatística).
+
+    Input:
+        - acumuladores: Dataframe com colunas 'medida|parcial'.
+        - agg: dicionário medida -> estatísticas, entre 'count', 'sum',
+          'mean', 'std', 'var', 'min' e 'max'.
+    Output: Dataframe.
+    """
+    colunas = {}
+    for medida, estatisticas in agg.items():
+        n = acumuladores[col(medida, 'count')]
+        media = acumuladores[col(medida, 'mean')]
+        for estatistica in estatisticas:
+            if estatistica == 'count':
+                valor = n
+            elif estatistica == 'sum':
+                valor = (n * media).fillna(0)
+            elif estatistica == 'mean':
+                valor = media.where(n > 0)
+            elif estatistica in ('var', 'std'):
+                # variância amostral (ddof=1), como no pandas
+                valor = acumuladores[col(medida, 'm2')] / (n - 1).where(n > 1)
+                valor = valor if estatistica == 'var' else np.sqrt(valor)
+            elif estatistica in ('min', 'max'):
+                valor = acumuladores[col(medida, estatistica)]
+            else:
+                raise ValueError('Estatística não suportada: {}'.format(estatistica))
+            colunas[(medida, estatistica)] = valor
+
+    resultado = pd.DataFrame(colunas, index=acumuladores.index)
+    resultado.columns = pd.MultiIndex.from_tuples(colunas.keys())
+    return resultado
+
+
+class StatsResult:
+    """Resultado de vários agrupamentos calculados de uma só vez.
+
+    - tables: dicionário nome do agrupamento -> Dataframe com colunas
+      (medida, estatística), como o devolvido por finalize.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        """Tabela completa de um agrupamento."""
+        return self.tables[name]
+
+    def get(self, name, key, measure, stat, default=np.nan):
+        """Valor de uma célula: agrupamento, chave do grupo, medida e estatística.
+
+        Input: ex.: get('festival', 'Yes', 'Time_taken(min)', 'mean').
+        Output: número (default se o grupo não existir).
+        """
+        tabela = self.tables[name]
+        if key not in tabela.index:
+            return default
+        return tabela.loc[key, (measure, stat)]
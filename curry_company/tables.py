@@ -0,0 +1,115 @@
+# ------------------------------------------------------------------------
+# Tabelas paginadas no servidor
+# ------------------------------------------------------------------------
+# Tabelas com uma linha por entregador crescem com o cadastro e, enviadas
+# inteiras pelo st.dataframe, dominam o tráfego da página. A tabela fica no
+# processo do servidor (em cache por estado dos filtros) e cada interação
+# serializa só a página visível: a busca por ID, a ordenação e o corte da
+# página são feitos aqui.
+import math
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from curry_company import config, instrument
+from curry_company.figures import figure_key
+from curry_company.lru import LRUCache
+
+_cache = LRUCache(config.TABLE_CACHE_SIZE)
+
+# Uma página de uma tabela: as linhas visíveis, o total de linhas que passam
+# na busca, a página devolvida (1 em diante), a quantidade de páginas e o
+# tamanho da página efetivamente usado
+TablePage = namedtuple('TablePage', ['rows', 'total', 'page', 'pages', 'page_size'])
+
+
+def page_size_limit(page_size):
+    """Tamanho da página limitado a 1..config.TABLE_MAX_PAGE_SIZE."""
+    return min(max(int(page_size), 1), config.TABLE_MAX_PAGE_SIZE)
+
+
+class PagedTable:
+    """Dataframe consultado por páginas.
+
+    A ordem das linhas de cada (coluna, sentido) é calculada uma única vez e
+    reaproveitada nas consultas seguintes (troca de página, busca).
+
+    - frame: Dataframe completo (índice 0..n-1).
+    - search_column: coluna usada na busca por texto (ex.: o ID do entregador).
+    """
+
+    def __init__(self, frame, search_column):
+        self.frame = frame.reset_index(drop=True)
+        self.search_column = search_column
+        self._ordens = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _ordem(self, sort_by, ascending):
+        # posições das linhas ordenadas (nulos sempre no fim, empates na
+        # ordem original)
+        chave = (sort_by, ascending)
+        with self._lock:
+            ordem = self._ordens.get(chave)
+        if ordem is None:
+            ordem = self.frame[sort_by].sort_values(
+                ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+            with self._lock:
+                self._ordens[chave] = ordem
+        return ordem
+
+    def query(self, sort_by=None, ascending=True, search=None, page=1, page_size=None):
+        """Uma página da tabela.
+
+        Input:
+            - sort_by: coluna de ordenação (None mantém a ordem da tabela).
+            - ascending: sentido da ordenação.
+            - search: texto procurado na search_column (sem diferenciar
+              maiúsculas; None ou vazio não filtra).
+            - page: número da página (1 em diante; limitado à última).
+            - page_size: linhas por página (padrão config.TABLE_PAGE_SIZE).
+        Output: TablePage.
+        """
+        if sort_by is not None and sort_by not in self.frame.columns:
+            raise KeyError('Coluna desconhecida: {}'.format(sort_by))
+        page_size = page_size_limit(page_size or config.TABLE_PAGE_SIZE)
+
+        if sort_by is None:
+            posicoes = np.arange(len(self.frame))
+        else:
+            posicoes = self._ordem(sort_by, ascending)
+        if search:
+            mascara = self.frame[self.search_column].astype(str).str.contains(
+                search.strip(), case=False, regex=False).to_numpy()
+            posicoes = posicoes[mascara[posicoes]]
+
+        total = len(posicoes)
+        pages = max(math.ceil(total / page_size), 1)
+        page = min(max(int(page), 1), pages)
+        inicio = (page - 1) * page_size
+        rows = self.frame.iloc[posicoes[inicio:inicio + page_size]].reset_index(drop=True)
+        return TablePage(rows, total, page, pages, page_size)
+
+
+def cached_table(table_id, janela, builder, search_column, path=None):
+    """Tabela paginada de uma janela, montada uma única vez por estado dos filtros.
+
+    Input:
+        - table_id: nome único da tabela (ex.: 'courier_summary').
+        - janela: kpis.Window com os filtros da página.
+        - builder: função que recebe a janela e devolve o Dataframe completo.
+        - search_column: coluna usada na busca.
+        - path: caminho do dataset (padrão: config.DATASET_PATH).
+    Output: PagedTable.
+    """
+    with instrument.span('table.' + table_id):
+        chave = figure_key(table_id, janela.start, janela.end, janela.traffic, path)
+        return _cache.get_or_compute(chave, lambda: PagedTable(builder(janela), search_column))
+
+
+def cache_info():
+    """Contadores do cache de tabelas (hits, misses, size, maxsize)."""
+    return _cache.info()
@@ -0,0 +1,97 @@
+# ------------------------------------------------------------------------
+# Top-k por grupo com seleção parcial
+# ------------------------------------------------------------------------
+# Em vez de ordenar todos os valores e filtrar grupo a grupo, cada grupo é
+# particionado uma única vez com np.partition nas posições k-1 e n-k, o que
+# separa os k menores e os k maiores em tempo linear. Só os candidatos de
+# cada ponta (normalmente ~k) são ordenados. Os grupos são descobertos nos
+# dados, então novas cidades aparecem sem mudar o código.
+import numpy as np
+import pandas as pd
+
+# Métricas de tempo de entrega aceitas por courier_ranking
+METRICAS = ['max', 'mean', 'p90']
+
+# Casas decimais do p90 usadas no ranking
+PRECISAO_P90 = 9
+
+
+def _pontas(valores, k):
+    # posições dos k menores e dos k maiores; empates são desfeitos pela
+    # posição original para que o resultado seja determinístico
+    n = len(valores)
+    if n <= 2 * k:
+        posicoes = np.arange(n)
+        return np.lexsort((posicoes, valores))[:k], np.lexsort((posicoes, -valores))[:k]
+    particao = np.partition(valores, [k - 1, n - k])
+    menores = np.flatnonzero(valores <= particao[k - 1])
+    maiores = np.flatnonzero(valores >= particao[n - k])
+    menores = menores[np.lexsort((menores, valores[menores]))[:k]]
+    maiores = maiores[np.lexsort((maiores, -valores[maiores]))[:k]]
+    return menores, maiores
+
+
+def top_k_per_group(frame, group, value, k=10):
+    """Os k menores e os k maiores valores de cada grupo, numa única passada.
+
+    Input:
+        - frame: Dataframe com uma linha por item (ex.: por entregador).
+        - group: coluna que define os grupos (ex.: 'City').
+        - value: coluna a ordenar (ex.: 'Time_taken(min)').
+        - k: quantidade de linhas por grupo em cada ponta.
+    Output: tupla (menores, maiores) de Dataframes com as linhas de frame,
+    grupo a grupo, em ordem crescente (menores) e decrescente (maiores).
+    """
+    codigos, grupos = pd.factorize(frame[group], sort=True)
+    valores = frame[value].to_numpy(dtype='float64')
+
+    ordem = np.argsort(codigos, kind='stable')
+    fronteiras = np.searchsorted(codigos[ordem], np.arange(len(grupos) + 1))
+
+    menores, maiores = [], []
+    for i, j in zip(fronteiras[:-1], fronteiras[1:]):
+        posicoes = ordem[i:j]
+        baixo, alto = _pontas(valores[posicoes], k)
+        menores.append(posicoes[baixo])
+        maiores.append(posicoes[alto])
+
+    vazio = np.array([], dtype='int64')
+    return (frame.iloc[np.concatenate(menores or [vazio])].reset_index(drop=True),
+            frame.iloc[np.concatenate(maiores or [vazio])].reset_index(drop=True))
+
+
+def courier_ranking(cubo_entregadores, k=10, metric='max', orders=None):
+    """Entregadores mais rápidos e mais lentos de cada cidade.
+
+    Input:
+        - cubo_entregadores: cubo de entregadores já filtrado.
+        - k: quantidade de entregadores por cidade.
+        - metric: 'max', 'mean' ou 'p90' do tempo de entrega de cada
+          entregador. 'max' e 'mean' saem do cubo; 'p90' precisa dos pedidos
+          (ou de um SqlCube, que calcula o percentil na consulta).
+        - orders: Dataframe com 'City', 'Delivery_person_ID' e
+          'Time_taken(min)' da mesma janela (obrigatório para 'p90' com o
+          Cube do pandas).
+    Output: tupla (mais rápidos, mais lentos) de Dataframes com as colunas
+    'City', 'Delivery_person_ID' e 'Time_taken(min)'.
+    """
+    if metric in ('max', 'mean'):
+        df_aux = cubo_entregadores.rollup(['City', 'Delivery_person_ID'], {'Time_taken(min)': [metric]})
+    elif metric == 'p90' and orders is None and hasattr(cubo_entregadores, 'quantile'):
+        df_aux = cubo_entregadores.quantile(['City', 'Delivery_person_ID'], 'Time_taken(min)', 0.9)
+    elif metric == 'p90':
+        if orders is None:
+            raise ValueError("A métrica 'p90' precisa dos pedidos (orders)")
+        df_aux = orders.groupby(['City', 'Delivery_person_ID'], observed=True)[['Time_taken(min)']].quantile(0.9)
+        df_aux = df_aux.sort_index()  # ordem das categorias (ver curry_company/stats.py)
+    else:
+        raise ValueError('Métrica não suportada: {}'.format(metric))
+    if metric == 'p90':
+        # o percentil interpolado do pandas e o do DuckDB diferem em ~1e-15:
+        # arredondado, os empates são os mesmos e são desfeitos pela ordem
+        # das linhas (por entregador) nos dois backends
+        df_aux = df_aux.round(PRECISAO_P90)
+
+    df_aux.columns = ['Time_taken(min)']
+    df_aux = df_aux.reset_index()
+    return top_k_per_group(df_aux, 'City', 'Time_taken(min)', k)
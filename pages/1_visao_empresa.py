@@ -2,184 +2,134 @@
 # para instalar as bibliotecas necessárias você deve colocar no prompt de comando o pip install (a biblioteca que você quer)
 
 # Libraries
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
+# plotly.express e folium são importados dentro das funções que montam os
+# gráficos e o mapa (ver curry_company/maps.py): só são carregados quando
+# algum deles é montado (não num acerto do cache de gráficos), o que encurta
+# a primeira execução depois de um restart. O plotly.io do cache de gráficos
+# já vem carregado pelo próprio streamlit.
+from datetime import datetime
 
 # Bibliotecas necessárias
-import pandas as pd
 import numpy as np
-import re as re
 import streamlit as st
-from PIL import Image
-import folium
-from streamlit_folium import folium_static
+import streamlit.components.v1 as components
+
+from curry_company import assets, config, instrument, kpis, maps
+from curry_company.data import dataset_signature, get_cubes, get_date_index, get_spatial_index
+from curry_company.figures import cached_figure
+from curry_company.panels import Panels
 
 # ------------------------------------------------------------------------
 # Funções 
 # ------------------------------------------------------------------------
-def clean_code( df1 ):
-    """Esta função tem a responsabilidade de limpar o dataframe
-       
-    Tipos de limpeza:
-    1. Remoção dos dados NaN
-    2. Mudança do tipo da coluna de dados.
-    3. Remoção dos espaços das variaveis de texto
-    4. Formatação da coluna de datas
-    5. Limpeza da coluna de tempo (remoção do texto variável numérica)
-
-    Input: Dataframe.
-    Output: Dataframe.
-
-    """
-    # LIMPAR OS DADOS
-    # Remover espaço da string
-    # for i in range( len(df1)):
-    #     df1.loc[i, 'ID'] = df1.loc[i, 'ID'].strip()
-    #     df1.loc[i, 'Delivery_person_ID'] = df1.loc[i, 'Delivery_person_ID'].strip()
-
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-
-    # EXCLUIR LINHAS COM A IDADE DOS ENTREGADORES VAZIA
-    linhas_vazias = df1['Delivery_person_Age'] != 'NaN '
-    df1 = df1.loc[linhas_vazias, :]
-
-    linhas_vazias = df1['Weatherconditions'] != 'conditions NaN'
-    df1 = df1.loc[linhas_vazias, :]
-
-    linhas_vazias = df1['City'] != 'NaN'
-    df1 = df1.loc[linhas_vazias, :]
-
-    linhas_vazias = df1['Road_traffic_density'] != 'NaN'
-    df1 = df1.loc[linhas_vazias, :]
-    # CONVERSAO DE TEXTO/CATEGORIA/STRING PARA NUMEROS INTEIROS
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype( int )
-
-    # CONVERSAO DE TEXTO/CATEGORIA/STRING PARA NUMEROS DECIMAIS
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype( float )
-
-    # CONVERSÃO DE TEXTO PARA DATA
-    df1['Order_Date'] = pd.to_datetime( df1['Order_Date'], format='%d-%m-%Y')
-
-    # REMOVE AS LINHAS DA COLUNA MULTIPLE_DELIVERIES QUE TENHAM O CONTEUDO IGUAL A 'NaN '
-    linhas_vazias = df1['multiple_deliveries'] != 'NaN '
-    df1 = df1.loc[linhas_vazias, :]
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype( int )
-
-    # REMOVER O TEXTO DE NUMEROS
-    # df1 = df1.reset_index( drop=True)
-    # for i in range (len(df1)):
-    #     df1.loc[i, 'Time_taken(min)'] = re.findall( r'/d+', df1.loc[i, 'Time_taken(min)'])
-
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split('(min) ')[1])
-    # df1['Time_taken(min)'] = df1['Time_taken(min)'].astype( int )
-
-    return df1
-
-def order_metric(df1):
-    cols = ['ID', 'Order_Date']
-    # seleção das linhas
-    df_aux = df1.loc[:, cols].groupby(['Order_Date']).count().reset_index()
+def order_metric(janela):
+    # quantidade de pedidos por dia (somando as células do cubo)
+    df_aux = kpis.orders_by_day(janela)
 
     # desenhar o gráfico de barras (Matplotlib - Seaborn - Bokeh - Plotly)
+    import plotly.express as px
     fig = px.bar( df_aux, x='Order_Date', y='ID')
 
     return fig
 
-def traffic_order_share(df1):
-    # 3. Distribuição dos pedidos por tipo de tráfego
-    # seleção das colunas necessárias
-    cols = ['ID', 'Road_traffic_density']
-
-    # seleção das linhas
-    df_aux = df1.loc[:, cols].groupby(['Road_traffic_density']).count().reset_index()
-
-    # percentual
-    df_aux = df_aux.loc[df_aux['Road_traffic_density'] != 'NaN', :]
-    df_aux['entregas_percentual'] = df_aux['ID'] / df_aux['ID'].sum()
+def traffic_order_share(janela):
+    # 3. Distribuição dos pedidos por tipo de tráfego (percentual)
+    df_aux = kpis.orders_by_traffic(janela)
 
     # desenhar o gráfico de pizza (Matplotlib - Seaborn - Bokeh - Plotly)
+    import plotly.express as px
     fig = px.pie( df_aux, values='entregas_percentual', names='Road_traffic_density')
 
     return fig
 
-def traffic_order_city(df1):
+def traffic_order_city(janela):
     # 4. Comparação de volumes de pedidos por cidade e por tipo de tráfego
-    # seleção das colunas necessárias
-    cols = ['ID', 'Road_traffic_density', 'City']
-
-    # seleção das linhas
-    df_aux = df1.loc[:, cols].groupby([ 'City','Road_traffic_density']).count().reset_index()
+    df_aux = kpis.orders_by_city_traffic(janela)
 
     # gráfico de bolhas
+    import plotly.express as px
     fig = px.scatter( df_aux, x='City', y='Road_traffic_density', size='ID', color='City')
 
     return fig
 
-def order_by_week(df1):
+def order_by_week(janela):
     # 2. Quantidade de pedidos por semana
-    # criar a coluna de semana
-    df1['week_of_year'] = df1['Order_Date'].dt.strftime( '%U' )
-
-    # seleção das colunas necessárias
-    cols = ['ID', 'week_of_year']
-
-    # seleção das linhas
-    df_aux = df1.loc[:, cols].groupby(['week_of_year']).count().reset_index()
+    # a semana ('week_of_year') é derivada da data de cada célula do cubo
+    df_aux = kpis.orders_by_week(janela)
 
     # desenhar o gráfico de linhas (Matplotlib - Seaborn - Bokeh - Plotly)
+    import plotly.express as px
     fig = px.line( df_aux, x='week_of_year', y='ID')
         
     return fig
 
-def order_share_by_week(df1):
-     # 5. Quantidade de pedidos por entregador por semana 
+def order_share_by_week(janela):
+    # 5. Quantidade de pedidos por entregador por semana 
     # Quantidade de pedidos / número único de entregadores por semana.
-
-    # contar a quantidade de pedidos por semana
-    df_aux1 = df1.loc[:, ['ID', 'week_of_year']].groupby('week_of_year').count().reset_index()
-
-    # contar o número de entregadores únicos por semana
-    df_aux2 = df1.loc[:, ['Delivery_person_ID', 'week_of_year']].groupby('week_of_year').nunique().reset_index()
-
-    # para juntar os dois dataframes criados
-    df_aux = pd.merge( df_aux1, df_aux2, how='inner')
-
-    df_aux['Order_by_deliver'] = df_aux['ID'] / df_aux['Delivery_person_ID']
+    df_aux = kpis.orders_per_courier_by_week(janela)
 
     # gráfico de linhas
+    import plotly.express as px
     fig = px.line( df_aux, x='week_of_year', y='Order_by_deliver')
-    st.plotly_chart(fig, use_container_width=True)
 
     return fig
 
-def country_maps(df1):
-    # 6. A localização central de cada tipo de tráfego
-    df_aux = df1.loc[:, ['City', 'Road_traffic_density', 'Delivery_location_latitude', 'Delivery_location_longitude']].groupby(['City', 'Road_traffic_density']).median().reset_index()
+def map_centers(df1):
+    # 6. A localização central de cada tipo de tráfego (mediana dos pedidos)
+    df_aux = df1.loc[:, ['City', 'Road_traffic_density', 'Delivery_location_latitude', 'Delivery_location_longitude']].groupby(['City', 'Road_traffic_density'], observed=True).median().reset_index()
+    return df_aux
+
+def valid_centers(df_aux):
     df_aux = df_aux.loc[df_aux['City'] != 'NaN', :]
     df_aux = df_aux.loc[df_aux['Road_traffic_density'] != 'NaN', :]
-
-    # desenho do mapa
-    map = folium.Map()
-    for index, location_info in df_aux.iterrows():
-        folium.Marker([location_info['Delivery_location_latitude'], 
-                        location_info['Delivery_location_longitude']], popup=location_info[['City', 'Road_traffic_density']]).add_to( map )
-    folium_static(map, width=1024, height=600 )
+    return df_aux
+
+def busiest_restaurant_cells(date_start, date_slider, traffic_options):
+    # células de ~5 km (geohash de 5 caracteres) com mais pedidos na janela
+    restaurantes = get_spatial_index(endpoint='restaurant', columns=COLUNAS)
+    return restaurantes.busiest(10, bits=25, start=date_start, end=date_slider, traffic=traffic_options)
+
+def orders_within_radius(lat, lon, km, date_start, date_slider, traffic_options):
+    # pedidos entregues a até km do ponto, consultando só as células próximas
+    entregas = get_spatial_index(endpoint='delivery', columns=COLUNAS)
+    posicoes = entregas.within_radius(lat, lon, km, start=date_start, end=date_slider, traffic=traffic_options)
+    tempos = entregas.date_index.df['Time_taken(min)'].to_numpy()[posicoes]
+    return len(posicoes), (np.round(tempos.mean(), 2) if len(tempos) else '-')
+
+def country_maps(chave, janela):
+    # desenho do mapa: grade de entregas, calor dos restaurantes e os centros
+    # de cada cidade/tráfego; o HTML fica em cache por estado dos filtros e os
+    # pedidos só são lidos e filtrados quando o mapa ainda não está no cache
+    def desenhar():
+        if config.CHUNK_SIZE:  # modo em blocos: só os centros, a partir do cubo
+            return maps.build_map(centros=kpis.map_centers(janela))
+        indice = get_date_index(columns=COLUNAS)
+        df1 = indice.select(start=janela.start, end=janela.end, traffic=janela.traffic)
+        return maps.build_map(entregas=df1, restaurantes=df1, centros=valid_centers(map_centers(df1)))
+
+    html = maps.cached_html(chave, desenhar)
+    components.html(html, width=1024, height=610)
 
 # ---------------------------- Início da estrutura lógica do código -------------------------------------
-# --------------------------------------
-# Import Dataset - Leitura do arquivo 
-# --------------------------------------
-df = pd.read_csv('../dataset/train.csv')
+# instrumentação opcional (CURRY_INSTRUMENT=1): mede os trechos deste rerun
+instrument.begin_rerun('visao_empresa')
 
 # --------------------------------------
-# Limpando o código
+# Import Dataset - Leitura do arquivo já limpo (cache compartilhado)
 # --------------------------------------
-df1 = clean_code(df)
+# colunas usadas no mapa (projeção de colunas na leitura do snapshot); os
+# pedidos só são lidos quando a visão geográfica é aberta e, no modo em
+# blocos (config.CHUNK_SIZE), nunca ficam em memória
+COLUNAS = ['Order_Date', 'Road_traffic_density', 'City',
+           'Restaurant_latitude', 'Restaurant_longitude',
+           'Delivery_location_latitude', 'Delivery_location_longitude',
+           'restaurant_cell', 'delivery_cell', 'Time_taken(min)']
+
+# cubos pré-agregados usados pelos KPIs (o mapa ainda usa os pedidos)
+cubos = get_cubes()
+
+# visões da página; só a visão escolhida é calculada a cada rerun
+VISOES = ['Visão gerencial', 'Visão tática', 'Visão geográfica']
 
 # --------------------------------------
 # VISÃO EMPRESA 
@@ -189,25 +139,24 @@ df1 = clean_code(df)
 # =============================================
 st.header('Marketplace - Visão Empresa')
 
-# image_path = "C:/Users/emers/Documents/repos/ftc_programacao_python/notebooks/logo.png"
-image = Image.open('logo.png')
-st.sidebar.image(image, use_column_width=True)
+# logo lido uma única vez por processo (bytes em cache, sem decodificar a cada rerun)
+st.sidebar.image(assets.logo_bytes(), use_column_width=True)
 
 
 st.sidebar.markdown('# Cury Company') # os asteristicos aqui servem como títulos maiores e menores.
 st.sidebar.markdown('## Fastest Delivery in Town')
 st.sidebar.markdown("""___""")
 
-st.sidebar.markdown('## Selecione uma data limite')
-date_slider = st.sidebar.slider(
-    'Até qual valor?',
-    value=datetime(2022,2,12),
-    min_value=datetime(2022, 2, 12),
+st.sidebar.markdown('## Selecione o período')
+date_start, date_slider = st.sidebar.slider(
+    'De qual data até qual data?',
+    value=(datetime(2022, 2, 11), datetime(2022,2,12)),
+    min_value=datetime(2022, 2, 11),
     max_value=datetime(2022, 6, 4),
     format='DD-MM-YYYY'
 )
 
-st.header( date_slider )
+st.header( '{:%d-%m-%Y} a {:%d-%m-%Y}'.format(date_start, date_slider) )
 st.sidebar.markdown("""____""") # para separar o filtro
 
 traffic_options = st.sidebar.multiselect(
@@ -218,49 +167,87 @@ traffic_options = st.sidebar.multiselect(
 st.sidebar.markdown("""____""")
 st.sidebar.markdown('### Powered by Comunidade DS')
 
-# Filtro de data
-linhas_selecionadas = df1['Order_Date'] < date_slider
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro de trânsito
-linhas_selecionadas = df1['Road_traffic_density'].isin(traffic_options)
-df1 = df1.loc[linhas_selecionadas, :]
+# Filtros de data e de trânsito aplicados às células dos cubos
+janela = kpis.Window(cubos, start=date_start, end=date_slider, traffic=traffic_options)
 
 # =============================================
 # LAYOUT NO STREAMLIT
 # =============================================
-tab1, tab2, tab3 = st.tabs(['Visão gerencial', 'Visão tática', 'Visão geográfica']) # CRIA ABAS
+# st.tabs executaria o código das três abas em todo rerun (o mapa inclusive);
+# com o seletor apenas a visão aberta é montada
+visao = st.radio('Visão', VISOES, horizontal=True, label_visibility='collapsed', key='visao')
+
+if visao == 'Visão gerencial':
+    # os três gráficos da visão são calculados ao mesmo tempo
+    paineis = Panels()
+    paineis.add('order_metric', cached_figure, 'order_metric', janela, order_metric)
+    paineis.add('traffic_order_share', cached_figure, 'traffic_order_share', janela, traffic_order_share)
+    paineis.add('traffic_order_city', cached_figure, 'traffic_order_city', janela, traffic_order_city)
+    resultados = paineis.run()
 
-with tab1:
     with st.container():
-        fig = order_metric(df1)
+        fig = resultados['order_metric']
         st.markdown('# Orders by Day')
         st.plotly_chart(fig, use_container_width=True)
        
     with st.container():
            col1, col2 = st.columns(2)
            with col1:
-                fig = traffic_order_share(df1)
+                fig = resultados['traffic_order_share']
                 st.markdown('# Pedidos por tipo de tráfego')
                 st.plotly_chart(fig, use_container_width=True)
                 
            with col2:
-                fig = traffic_order_city(df1)
+                fig = resultados['traffic_order_city']
                 st.markdown('# Volumes de pedido por cidade e tipo de tráfego')
                 st.plotly_chart(fig, use_container_width=True)
 
-with tab2:
+elif visao == 'Visão tática':
+    paineis = Panels()
+    paineis.add('order_by_week', cached_figure, 'order_by_week', janela, order_by_week)
+    paineis.add('order_share_by_week', cached_figure, 'order_share_by_week', janela, order_share_by_week)
+    resultados = paineis.run()
+
     with st.container():
-        fig = order_by_week(df1)
+        fig = resultados['order_by_week']
         st.markdown('# Pedidos por semana')
         st.plotly_chart(fig, use_container_width=True)
          
     with st.container():
-        fig = order_share_by_week(df1)
+        fig = resultados['order_share_by_week']
         st.markdown('# Pedidos por entregador')
         st.plotly_chart(fig, use_container_width=True)
 
 
-with tab3:
+elif visao == 'Visão geográfica':
     st.header('Country Maps')
-    country_maps(df1)
\ No newline at end of file
+    chave = (dataset_signature(config.DATASET_PATH), date_start, date_slider, tuple(sorted(traffic_options)))
+    country_maps(chave, janela)
+
+    # consultas espaciais precisam dos pedidos (não disponíveis no modo em blocos)
+    if not config.CHUNK_SIZE:
+        st.markdown('##### Células de restaurante mais movimentadas')
+        df_aux = busiest_restaurant_cells(date_start, date_slider, traffic_options)
+        st.dataframe(df_aux)
+
+        st.markdown('##### Pedidos entregues num raio')
+        col1, col2, col3 = st.columns(3)
+        centro = df_aux.iloc[0] if len(df_aux) else {'latitude': 20.0, 'longitude': 78.0}
+        lat = col1.number_input('Latitude', value=float(np.round(centro['latitude'], 4)), format='%.4f')
+        lon = col2.number_input('Longitude', value=float(np.round(centro['longitude'], 4)), format='%.4f')
+        km = col3.slider('Raio (km)', min_value=1, max_value=50, value=10)
+        pedidos, tempo_medio = orders_within_radius(lat, lon, km, date_start, date_slider, traffic_options)
+        col1, col2 = st.columns(2)
+        col1.metric('Pedidos no raio', pedidos)
+        col2.metric('Tempo médio de entrega (min)', tempo_medio)
+
+# =============================================
+# DEBUG (CURRY_INSTRUMENT=1) - tempos por trecho
+# =============================================
+medicao = instrument.end_rerun()
+if medicao is not None:
+    with st.sidebar.expander('Debug - tempos do rerun'):
+        st.markdown('Rerun: {:.3f}s'.format(medicao.duration))
+        st.dataframe(instrument.rerun_table(medicao))
+        st.markdown('Acumulado da página')
+        st.dataframe(instrument.page_table('visao_empresa'))
@@ -2,101 +2,67 @@
 # para instalar as bibliotecas necessárias você deve colocar no prompt de comando o pip install (a biblioteca que você quer)
 
 # Libraries
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime
 
 # Bibliotecas necessárias
-import pandas as pd
-import numpy as np
-import re as re
 import streamlit as st
-from PIL import Image
-import folium
-from streamlit_folium import folium_static
+
+from curry_company import assets, config, instrument, kpis
+from curry_company.data import get_cubes, get_date_index
+from curry_company.panels import Panels
+from curry_company.tables import cached_table
 
 # ------------------------------------------------------------------------
 # Funções
 # ------------------------------------------------------------------------
-def clean_code( df1 ):
-    """Esta função tem a responsabilidade de limpar o dataframe
-       
-    Tipos de limpeza:
-    1. Remoção dos dados NaN
-    2. Mudança do tipo da coluna de dados.
-    3. Remoção dos espaços das variaveis de texto
-    4. Formatação da coluna de datas
-    5. Limpeza da coluna de tempo (remoção do texto variável numérica)
-
-    Input: Dataframe.
-    Output: Dataframe.
-
-    """
-    # LIMPAR OS DADOS
-    # Remover espaço da string
-    # for i in range( len(df1)):
-    #     df1.loc[i, 'ID'] = df1.loc[i, 'ID'].strip()
-    #     df1.loc[i, 'Delivery_person_ID'] = df1.loc[i, 'Delivery_person_ID'].strip()
-
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-
-    # EXCLUIR LINHAS COM A IDADE DOS ENTREGADORES VAZIA
-    linhas_vazias = df1['Delivery_person_Age'] != 'NaN '
-    df1 = df1.loc[linhas_vazias, :]
-
-    linhas_vazias = df1['Weatherconditions'] != 'conditions NaN'
-    df1 = df1.loc[linhas_vazias, :]
-
-    linhas_vazias = df1['City'] != 'NaN'
-    df1 = df1.loc[linhas_vazias, :]
-
-    linhas_vazias = df1['Road_traffic_density'] != 'NaN'
-    df1 = df1.loc[linhas_vazias, :]
-    # CONVERSAO DE TEXTO/CATEGORIA/STRING PARA NUMEROS INTEIROS
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype( int )
-
-    # CONVERSAO DE TEXTO/CATEGORIA/STRING PARA NUMEROS DECIMAIS
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype( float )
-
-    # CONVERSÃO DE TEXTO PARA DATA
-    df1['Order_Date'] = pd.to_datetime( df1['Order_Date'], format='%d-%m-%Y')
-
-    # REMOVE AS LINHAS DA COLUNA MULTIPLE_DELIVERIES QUE TENHAM O CONTEUDO IGUAL A 'NaN '
-    linhas_vazias = df1['multiple_deliveries'] != 'NaN '
-    df1 = df1.loc[linhas_vazias, :]
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype( int )
-
-    # REMOVER O TEXTO DE NUMEROS
-    # df1 = df1.reset_index( drop=True)
-    # for i in range (len(df1)):
-    #     df1.loc[i, 'Time_taken(min)'] = re.findall( r'/d+', df1.loc[i, 'Time_taken(min)'])
-
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split('(min) ')[1])
-    # df1['Time_taken(min)'] = df1['Time_taken(min)'].astype( int )
-
-    return df1
-
-def top_delivers(df1, top_asc):
-    df_aux = df1.loc[:, ['Delivery_person_ID', 'City', 'Time_taken(min)']].groupby(['City', 'Delivery_person_ID']).max().sort_values( ['City', 'Time_taken(min)'], ascending=top_asc).reset_index()
-    df_aux1 = df_aux.loc[df_aux['City'] == 'Metropolitian', :].head(10)
-    df_aux2 = df_aux.loc[df_aux['City'] == 'Urban', :].head(10)
-    df_aux3 = df_aux.loc[df_aux['City'] == 'Semi-Urban', :].head(10)
-    df3 = pd.concat([df_aux1, df_aux2, df_aux3]).reset_index()
-    return df3
+def courier_extremes(janela):
+    # maior/menor idade e melhor/pior condição do veículo na janela
+    return kpis.courier_extremes(janela).iloc[0]
+
+def top_delivers(janela, metric):
+    # os 10 mais rápidos e os 10 mais lentos de cada cidade numa única passada
+    pedidos = None
+    if metric == 'p90' and config.BACKEND != 'duckdb':
+        # o percentil precisa dos pedidos da janela (não sai do cubo); no
+        # backend SQL ele é calculado na própria consulta
+        indice = get_date_index(columns=COLUNAS_P90)
+        pedidos = indice.select(start=janela.start, end=janela.end, traffic=janela.traffic)
+    mais_rapidos = kpis.fastest_couriers(janela, k=10, metric=metric, orders=pedidos)
+    mais_lentos = kpis.slowest_couriers(janela, k=10, metric=metric, orders=pedidos)
+    return mais_rapidos, mais_lentos
+
+def paged_table(tabela, key):
+    # busca, ordenação e página escolhidas na tela; só a página visível é
+    # enviada ao navegador
+    col1, col2, col3, col4 = st.columns([3, 3, 2, 2])
+    busca = col1.text_input('Buscar entregador', key=key + '_busca')
+    ordem = col2.selectbox('Ordenar por', list(tabela.frame.columns), index=2, key=key + '_ordem')
+    sentido = col3.selectbox('Sentido', ['Decrescente', 'Crescente'], key=key + '_sentido')
+    padrao = TAMANHOS_PAGINA.index(config.TABLE_PAGE_SIZE) if config.TABLE_PAGE_SIZE in TAMANHOS_PAGINA else 0
+    tamanho = col4.selectbox('Linhas', TAMANHOS_PAGINA, index=padrao, key=key + '_tamanho')
+    pagina = st.number_input('Página', min_value=1, value=1, step=1, key=key + '_pagina')
+
+    resultado = tabela.query(sort_by=ordem, ascending=(sentido == 'Crescente'),
+                             search=busca, page=pagina, page_size=tamanho)
+    st.dataframe(resultado.rows)
+    st.caption('{} entregadores - página {} de {}'.format(resultado.total, resultado.page, resultado.pages))
+
 # ---------------------------- Início da estrutura lógica do código -------------------------------------
-# --------------------------------------
-# Import Dataset - Leitura do arquivo 
-# --------------------------------------
-df = pd.read_csv('../dataset/train.csv')
+# instrumentação opcional (CURRY_INSTRUMENT=1): mede os trechos deste rerun
+instrument.begin_rerun('visao_entregadores')
 
 # --------------------------------------
-# Limpando o código
+# Import Dataset - Cubos pré-agregados (cache compartilhado)
 # --------------------------------------
-df1 = clean_code(df)
+cubos = get_cubes()
+
+# colunas lidas apenas quando a métrica do ranking é o percentil 90
+COLUNAS_P90 = ['Order_Date', 'Road_traffic_density', 'City', 'Delivery_person_ID', 'Time_taken(min)']
+# no modo em blocos os pedidos não ficam em memória: só as métricas do cubo
+# (o backend SQL calcula o percentil direto no Parquet)
+METRICAS = ['max', 'mean'] if config.CHUNK_SIZE and config.BACKEND != 'duckdb' else ['max', 'mean', 'p90']
+# linhas por página da tabela de entregadores
+TAMANHOS_PAGINA = [t for t in [10, 25, 50, 100, 200] if t <= config.TABLE_MAX_PAGE_SIZE]
 
 # VISÃO ENTREGADORES
 # =============================================
@@ -104,25 +70,24 @@ df1 = clean_code(df)
 # =============================================
 st.header('Marketplace - Visão Entregadores')
 
-# image_path = "C:/Users/emers/Documents/repos/ftc_programacao_python/notebooks/logo.png"
-image = Image.open('logo.png')
-st.sidebar.image(image, use_column_width=True)
+# logo lido uma única vez por processo (bytes em cache, sem decodificar a cada rerun)
+st.sidebar.image(assets.logo_bytes(), use_column_width=True)
 
 
 st.sidebar.markdown('# Cury Company') # os asteristicos aqui servem como títulos maiores e menores.
 st.sidebar.markdown('## Fastest Delivery in Town')
 st.sidebar.markdown("""___""")
 
-st.sidebar.markdown('## Selecione uma data limite')
-date_slider = st.sidebar.slider(
-    'Até qual valor?',
-    value=datetime(2022,2,12),
-    min_value=datetime(2022, 2, 12),
+st.sidebar.markdown('## Selecione o período')
+date_start, date_slider = st.sidebar.slider(
+    'De qual data até qual data?',
+    value=(datetime(2022, 2, 11), datetime(2022,2,12)),
+    min_value=datetime(2022, 2, 11),
     max_value=datetime(2022, 6, 4),
     format='DD-MM-YYYY'
 )
 
-st.header( date_slider )
+st.header( '{:%d-%m-%Y} a {:%d-%m-%Y}'.format(date_start, date_slider) )
 st.sidebar.markdown("""____""") # para separar o filtro
 
 traffic_options = st.sidebar.multiselect(
@@ -133,13 +98,8 @@ traffic_options = st.sidebar.multiselect(
 st.sidebar.markdown("""____""")
 st.sidebar.markdown('### Powered by Comunidade DS')
 
-# Filtro de data
-linhas_selecionadas = df1['Order_Date'] < date_slider
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro de trânsito
-linhas_selecionadas = df1['Road_traffic_density'].isin(traffic_options)
-df1 = df1.loc[linhas_selecionadas, :]
+# Filtros de data e de trânsito aplicados às células dos cubos
+janela = kpis.Window(cubos, start=date_start, end=date_slider, traffic=traffic_options)
 
 # =============================================
 # LAYOUT NO STREAMLIT
@@ -147,29 +107,51 @@ df1 = df1.loc[linhas_selecionadas, :]
 tab1, tab2 = st.tabs(['Visão gerencial', '_']) # CRIA ABAS
 
 with tab1:
-    with st.container():
+    # as seções são criadas na ordem do layout e preenchidas depois que os
+    # painéis (calculados ao mesmo tempo) ficam prontos; a métrica do ranking
+    # é escolhida antes do cálculo
+    metricas = st.container()
+    avaliacoes = st.container()
+    velocidade = st.container()
+
+    with velocidade:
+        st.markdown("""___""")
+        st.title('Velocidade de entrega')
+        metrica = st.radio('Tempo de entrega do entregador', METRICAS, horizontal=True)
+
+paineis = Panels()
+paineis.add('extremos', courier_extremes, janela)
+paineis.add('avaliacao_entregador', cached_table, 'courier_summary', janela, kpis.courier_summary, 'Delivery_person_ID')
+paineis.add('avaliacao_transito', kpis.ratings_by_traffic, janela)
+paineis.add('avaliacao_clima', kpis.ratings_by_weather, janela)
+paineis.add('ranking', top_delivers, janela, metrica)
+resultados = paineis.run()
+
+with tab1:
+    with metricas:
         # Overall Metrics
         st.title('Todas as métricas')
         cols1, cols2, cols3, cols4 = st.columns(4, gap='large')
+        extremos = resultados['extremos']
         with cols1:
-            maior_idade = df1.loc[:, 'Delivery_person_Age'].max()
+            maior_idade = extremos['maior_idade']
             cols1.metric('Maior de idade', maior_idade)
 
         with cols2:
-            menor_idade = df1.loc[:, 'Delivery_person_Age'].min()
+            menor_idade = extremos['menor_idade']
             cols2.metric('Menor idade', menor_idade)
        
         with cols3:
-            melhor_condicao = df1.loc[:, 'Vehicle_condition'].max()
+            melhor_condicao = extremos['melhor_condicao']
             cols3.metric('Melhor condição', melhor_condicao)
 
 
         with cols4:
-            pior_condicao = df1.loc[:, 'Vehicle_condition'].min()
+            pior_condicao = extremos['pior_condicao']
             cols4.metric('Pior condição', pior_condicao)
     
 
-    with st.container():
+    with avaliacoes:
         st.markdown("""___""")
         st.title('Avaliações')
 
@@ -177,35 +159,37 @@ with tab1:
 
         with cols1:
             st.subheader('Avaliação média por entregador')
-            df_avg_ratings_per_deliver = df1.loc[:, ['Delivery_person_ID', 'Delivery_person_Ratings']].groupby(['Delivery_person_ID']).mean().reset_index()
-            st.dataframe(df_avg_ratings_per_deliver)
+            paged_table(resultados['avaliacao_entregador'], 'entregadores')
 
         with cols2:
             st.subheader('Avaliação média por trânsito')
-            df_avg_ratings_per_traffic = df1.loc[:, ['Delivery_person_Ratings', 'Road_traffic_density']].groupby(['Road_traffic_density']).agg({'Delivery_person_Ratings': ['mean', 'std']})
-            df_avg_ratings_per_traffic.columns = ['delivery_mean', 'delivery_std']
-
-            df_avg_ratings_per_traffic = df_avg_ratings_per_traffic.reset_index()
+            df_avg_ratings_per_traffic = resultados['avaliacao_transito']
             st.dataframe(df_avg_ratings_per_traffic)
 
             st.subheader('Avaliação média por clima')
-            df_avg_ratings_per_weatherconditions = df1.loc[:, ['Delivery_person_Ratings', 'Weatherconditions']].groupby(['Weatherconditions']).agg({'Delivery_person_Ratings': ['mean', 'std']})
-            df_avg_ratings_per_weatherconditions.columns = ['delivery_mean', 'delivery_std']
-            df_avg_ratings_per_weatherconditions = df_avg_ratings_per_weatherconditions.reset_index()
+            df_avg_ratings_per_weatherconditions = resultados['avaliacao_clima']
             st.dataframe(df_avg_ratings_per_weatherconditions)
         
-    with st.container():
-        st.markdown("""___""")
-        st.title('Velocidade de entrega')
+    with velocidade:
+        mais_rapidos, mais_lentos = resultados['ranking']
 
         cols1, cols2 = st.columns(2)
 
         with cols1:
             st.markdown('##### Top 10 entregadores mais lentos')
-            df3 = top_delivers(df1, top_asc=False)
-            st.dataframe(df3)
+            st.dataframe(mais_lentos)
 
         with cols2:
             st.markdown('##### Top 10 entregadores mais rápidos')
-            df3 = top_delivers(df1, top_asc=True)
-            st.dataframe(df3)
+            st.dataframe(mais_rapidos)
+
+# =============================================
+# DEBUG (CURRY_INSTRUMENT=1) - tempos por trecho
+# =============================================
+medicao = instrument.end_rerun()
+if medicao is not None:
+    with st.sidebar.expander('Debug - tempos do rerun'):
+        st.markdown('Rerun: {:.3f}s'.format(medicao.duration))
+        st.dataframe(instrument.rerun_table(medicao))
+        st.markdown('Acumulado da página')
+        st.dataframe(instrument.page_table('visao_entregadores'))
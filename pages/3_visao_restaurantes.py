@@ -2,136 +2,81 @@
 # para instalar as bibliotecas necessárias você deve colocar no prompt de comando o pip install (a biblioteca que você quer)
 
 # Libraries
-from haversine import haversine
-import plotly.express as px
-import plotly.graph_objects as go
+# o plotly.express é importado dentro das funções que montam os gráficos: só
+# é carregado quando algum gráfico é montado (não num acerto do cache de
+# gráficos), o que encurta a primeira execução depois de um restart. O
+# plotly.io e o plotly.graph_objects já vêm carregados pelo próprio streamlit.
 from datetime import datetime
 
 # Bibliotecas necessárias
-import pandas as pd
 import numpy as np
 import streamlit as st
-import folium
-from PIL import Image
+
+from curry_company import assets, instrument, kpis
+from curry_company.panels import Panels
+from curry_company.data import get_cubes
+from curry_company.figures import cached_figure
 
 # ------------------------------------------------------------------------
 # Funções
 # ------------------------------------------------------------------------
-def clean_code( df1 ):
-    """Esta função tem a responsabilidade de limpar o dataframe
-       
-    Tipos de limpeza:
-    1. Remoção dos dados NaN
-    2. Mudança do tipo da coluna de dados.
-    3. Remoção dos espaços das variaveis de texto
-    4. Formatação da coluna de datas
-    5. Limpeza da coluna de tempo (remoção do texto variável numérica)
-
-    Input: Dataframe.
-    Output: Dataframe.
-
-    """
-    # LIMPAR OS DADOS
-    # Remover espaço da string
-    # for i in range( len(df1)):
-    #     df1.loc[i, 'ID'] = df1.loc[i, 'ID'].strip()
-    #     df1.loc[i, 'Delivery_person_ID'] = df1.loc[i, 'Delivery_person_ID'].strip()
-
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-
-    # EXCLUIR LINHAS COM A IDADE DOS ENTREGADORES VAZIA
-    linhas_vazias = df1['Delivery_person_Age'] != 'NaN '
-    df1 = df1.loc[linhas_vazias, :]
-
-    linhas_vazias = df1['Weatherconditions'] != 'conditions NaN'
-    df1 = df1.loc[linhas_vazias, :]
-
-    linhas_vazias = df1['City'] != 'NaN'
-    df1 = df1.loc[linhas_vazias, :]
-
-    linhas_vazias = df1['Road_traffic_density'] != 'NaN'
-    df1 = df1.loc[linhas_vazias, :]
-    # CONVERSAO DE TEXTO/CATEGORIA/STRING PARA NUMEROS INTEIROS
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype( int )
-
-    # CONVERSAO DE TEXTO/CATEGORIA/STRING PARA NUMEROS DECIMAIS
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype( float )
-
-    # CONVERSÃO DE TEXTO PARA DATA
-    df1['Order_Date'] = pd.to_datetime( df1['Order_Date'], format='%d-%m-%Y')
-
-    # REMOVE AS LINHAS DA COLUNA MULTIPLE_DELIVERIES QUE TENHAM O CONTEUDO IGUAL A 'NaN '
-    linhas_vazias = df1['multiple_deliveries'] != 'NaN '
-    df1 = df1.loc[linhas_vazias, :]
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype( int )
+def unique_couriers(janela):
+    # exata ou aproximada (HyperLogLog), conforme o tamanho da janela
+    return kpis.unique_couriers(janela).loc[0, 'Delivery_person_ID']
 
-    # REMOVER O TEXTO DE NUMEROS
-    # df1 = df1.reset_index( drop=True)
-    # for i in range (len(df1)):
-    #     df1.loc[i, 'Time_taken(min)'] = re.findall( r'/d+', df1.loc[i, 'Time_taken(min)'])
-
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split('(min) ')[1])
-    # df1['Time_taken(min)'] = df1['Time_taken(min)'].astype( int )
-
-    return df1
-
-def distance(df1):
-    cols = ['Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude']
-    df1['distance'] = df1.loc[:, cols].apply(lambda x: haversine((x['Restaurant_latitude'], x['Restaurant_longitude']), (x['Delivery_location_latitude'], x['Delivery_location_longitude'] )), axis=1)
-    avg_distance = np.round(df1['distance'].mean(), 2)
+def distance(janela):
+    # a distância de cada pedido já vem calculada da ingestão ('distance_km')
+    avg_distance = kpis.mean_distance(janela).loc[0, 'distance_km']
 
     return avg_distance
 
-def avg_std_time_delivery(df1, festival, op):
+def avg_std_time_delivery(df_aux, festival, op):
     """
     Esta função calcula o tempo médio e o desvio padrão do tempo de entrega.
     Paramêtros:
     Input: 
-        - df: Dataframe com os dados necessários para o cáculo
+        - df_aux: tempos por festival (kpis.time_by_festival)
+        - festival: 'Yes' ou 'No'
         - op: tipo de operação que precisa ser calculado.
             'avg_time': calcula o tempo médio.
             'std_time': calcula o desvio padrão do tempo.
     Output: 
-        - df: Dataframe com 2 colunas e 1 linha.
+        - valor arredondado, como texto.
     """
-    df_aux = df1.loc[:, ['Time_taken(min)', 'Festival']].groupby(['Festival']).agg({'Time_taken(min)': ['mean', 'std']})
-    df_aux.columns = ['avg_time', 'std_time']
-    df_aux = df_aux.reset_index()
-    df_aux = np.round(df_aux.loc[df_aux['Festival'] == festival, op], 2)
+    df_aux = df_aux.loc[df_aux['Festival'] == festival, op]
+    df_aux = np.round(df_aux.iloc[0], 2) if len(df_aux) else np.nan
     # avg_time_yes_festival = df_aux.loc[df_aux['Festival'] == 'Yes', 'avg_time'].iloc[0]
     # avg_time_yes_festival_str = str(round(avg_time_yes_festival, 2))
     return str(df_aux)
 
 
-def avg_std_time_graph(df1):
-    df_aux = df1.loc[:, ['City', 'Time_taken(min)']].groupby(['City']).agg({'Time_taken(min)': ['mean', 'std']})
-    df_aux.columns = ['avg_time', 'std_time']
-    df_aux = df_aux.reset_index()
+def avg_std_time_graph(janela):
+    df_aux = kpis.time_by_city(janela)
+    import plotly.graph_objects as go
     fig = go.Figure()
     fig.add_trace(go.Bar(name='Control', x=df_aux['City'], y=df_aux['avg_time'], error_y=dict(type='data', array=df_aux['std_time'])))
     fig.update_layout(barmode='group')
     return fig
 
-def avg_std_time_on_traffic(df1):
-    df_aux = df1.loc[:, ['City', 'Time_taken(min)', 'Road_traffic_density']].groupby(['City', 'Road_traffic_density']).agg({'Time_taken(min)': ['mean', 'std']})
-    df_aux.columns = ['avg_time', 'std_time']
-    df_aux = df_aux.reset_index()
+def distance_pie(janela):
+    avg_distance = kpis.distance_by_city(janela)
+    import plotly.graph_objects as go
+    fig = go.Figure(data=[go.Pie(labels=avg_distance['City'], values=avg_distance['distance_km'], pull=[0, 0.1, 0])])
+    return fig
+
+def avg_std_time_on_traffic(janela):
+    df_aux = kpis.time_by_city_traffic(janela)
+    import plotly.express as px
     fig = px.sunburst(df_aux, path=['City', 'Road_traffic_density'], values='avg_time', color='std_time', color_continuous_scale='RdBu', color_continuous_midpoint=np.average(df_aux['std_time']))
     return fig
 # ---------------------------- Início da estrutura lógica do código -------------------------------------
-# --------------------------------------
-# Import Dataset - Leitura do arquivo 
-# --------------------------------------
-df = pd.read_csv('../dataset/train.csv')
+# instrumentação opcional (CURRY_INSTRUMENT=1): mede os trechos deste rerun
+instrument.begin_rerun('visao_restaurantes')
 
 # --------------------------------------
-# Limpando o código
+# Import Dataset - Cubos pré-agregados (cache compartilhado)
 # --------------------------------------
-df1 = clean_code(df)
+cubos = get_cubes()
 
 # VISÃO RESTAURANTES
 # =============================================
@@ -139,25 +84,24 @@ df1 = clean_code(df)
 # =============================================
 st.header('Marketplace - Visão Restaurantes')
 
-# image_path = "C:/Users/emers/Documents/repos/ftc_programacao_python/notebooks/logo.png"
-image = Image.open('logo.png')
-st.sidebar.image(image, use_column_width=True)
+# logo lido uma única vez por processo (bytes em cache, sem decodificar a cada rerun)
+st.sidebar.image(assets.logo_bytes(), use_column_width=True)
 
 
 st.sidebar.markdown('# Cury Company') # os asteristicos aqui servem como títulos maiores e menores.
 st.sidebar.markdown('## Fastest Delivery in Town')
 st.sidebar.markdown("""___""")
 
-st.sidebar.markdown('## Selecione uma data limite')
-date_slider = st.sidebar.slider(
-    'Até qual valor?',
-    value=datetime(2022,2,12),
-    min_value=datetime(2022, 2, 12),
+st.sidebar.markdown('## Selecione o período')
+date_start, date_slider = st.sidebar.slider(
+    'De qual data até qual data?',
+    value=(datetime(2022, 2, 11), datetime(2022,2,12)),
+    min_value=datetime(2022, 2, 11),
     max_value=datetime(2022, 6, 4),
     format='DD-MM-YYYY'
 )
 
-st.header( date_slider )
+st.header( '{:%d-%m-%Y} a {:%d-%m-%Y}'.format(date_start, date_slider) )
 st.sidebar.markdown("""____""") # para separar o filtro
 
 traffic_options = st.sidebar.multiselect(
@@ -168,13 +112,24 @@ traffic_options = st.sidebar.multiselect(
 st.sidebar.markdown("""____""")
 st.sidebar.markdown('### Powered by Comunidade DS')
 
-# Filtro de data
-linhas_selecionadas = df1['Order_Date'] < date_slider
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro de trânsito
-linhas_selecionadas = df1['Road_traffic_density'].isin(traffic_options)
-df1 = df1.loc[linhas_selecionadas, :]
+# Filtros de data e de trânsito aplicados às células dos cubos
+# todas as médias e desvios da página saem de um único resultado por janela
+janela = kpis.Window(cubos, start=date_start, end=date_slider, traffic=traffic_options)
+
+# Painéis independentes calculados ao mesmo tempo e desenhados na ordem do layout
+paineis = Panels()
+paineis.add('unicos', unique_couriers, janela)
+paineis.add('distancia', distance, janela)
+paineis.add('festival', kpis.time_by_festival, janela)
+paineis.add('avg_festival', avg_std_time_delivery, 'Yes', 'avg_time', inputs=['festival'])
+paineis.add('std_festival', avg_std_time_delivery, 'Yes', 'std_time', inputs=['festival'])
+paineis.add('avg_sem_festival', avg_std_time_delivery, 'No', 'avg_time', inputs=['festival'])
+paineis.add('std_sem_festival', avg_std_time_delivery, 'No', 'std_time', inputs=['festival'])
+paineis.add('tempo_cidade', cached_figure, 'avg_std_time_graph', janela, avg_std_time_graph)
+paineis.add('tempo_cidade_pedido', kpis.time_by_city_order, janela)
+paineis.add('distancia_cidade', cached_figure, 'distance_pie', janela, distance_pie)
+paineis.add('tempo_trafego', cached_figure, 'avg_std_time_on_traffic', janela, avg_std_time_on_traffic)
+resultados = paineis.run()
 
 # =============================================
 # LAYOUT NO STREAMLIT
@@ -187,27 +142,27 @@ with tab1:
         st.title('Todas as métricas')
         cols1, cols2, cols3, cols4, cols5, cols6 = st.columns(6)
         with cols1:
-            delivery_unique = len(df1.loc[:, 'Delivery_person_ID'].unique())
+            delivery_unique = resultados['unicos']
             cols1.metric('Entregadores únicos', delivery_unique)
 
         with cols2:
-            avg_distance = distance(df1)
+            avg_distance = resultados['distancia']
             cols2.metric('Distância média das entregas', avg_distance)
 
         with cols3:
-            df1_aux = avg_std_time_delivery(df1,'Yes' ,'avg_time')
+            df1_aux = resultados['avg_festival']
             cols3.metric('AVG entrega com festival', df1_aux)
 
         with cols4:
-            df1_aux = avg_std_time_delivery(df1, 'Yes' ,'std_time')
+            df1_aux = resultados['std_festival']
             cols4.metric('STD entrega com festival', df1_aux)
 
         with cols5:
-            df1_aux = avg_std_time_delivery(df1, 'No' ,'avg_time')
+            df1_aux = resultados['avg_sem_festival']
             cols5.metric('AVG entrega sem festival', df1_aux)
         
         with cols6:
-            df1_aux = avg_std_time_delivery(df1, 'No' ,'std_time')
+            df1_aux = resultados['std_sem_festival']
             cols6.metric('STD entrega sem festival', df1_aux)
 
     with st.container():
@@ -215,14 +170,12 @@ with tab1:
         st.title('Distribuição da distância')
         cols1, cols2 = st.columns (2)
         with cols1:
-            fig = avg_std_time_graph(df1)
+            fig = resultados['tempo_cidade']
             st.plotly_chart(fig, use_container_width=True)
 
         with cols2:
             st.markdown("""___""")
-            df_aux = df1.loc[:, ['City', 'Time_taken(min)', 'Type_of_order']].groupby(['City', 'Type_of_order']).agg({'Time_taken(min)': ['mean', 'std']})
-            df_aux.columns = ['avg_time', 'std_time']
-            df_aux = df_aux.reset_index()
+            df_aux = resultados['tempo_cidade_pedido']
             st.dataframe(df_aux)
         
     with st.container():
@@ -232,15 +185,21 @@ with tab1:
         cols1, cols2 = st.columns(2)
 
         with cols1:
-            cols = ['Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude']
-            df1['distance'] = df1.loc[:, cols].apply(lambda x: haversine((x['Restaurant_latitude'], x['Restaurant_longitude']), (x['Delivery_location_latitude'], x['Delivery_location_longitude'] )), axis=1)
-            avg_distance = df1.loc[:, ['City', 'distance']].groupby('City').mean().reset_index()
-            fig = go.Figure(data=[go.Pie(labels=avg_distance['City'], values=avg_distance['distance'], pull=[0, 0.1, 0])])
+            fig = resultados['distancia_cidade']
             # fig.show()
             st.plotly_chart(fig, use_container_width=True)
 
         with cols2:
-            fig = avg_std_time_on_traffic(df1)
+            fig = resultados['tempo_trafego']
             st.plotly_chart(fig, use_container_width=True)
 
-
+# =============================================
+# DEBUG (CURRY_INSTRUMENT=1) - tempos por trecho
+# =============================================
+medicao = instrument.end_rerun()
+if medicao is not None:
+    with st.sidebar.expander('Debug - tempos do rerun'):
+        st.markdown('Rerun: {:.3f}s'.format(medicao.duration))
+        st.dataframe(instrument.rerun_table(medicao))
+        st.markdown('Acumulado da página')
+        st.dataframe(instrument.page_table('visao_restaurantes'))
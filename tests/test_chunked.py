@@ -0,0 +1,62 @@
+# ------------------------------------------------------------------------
+# Modo em blocos: mesmas consultas das páginas que o modo em memória
+# ------------------------------------------------------------------------
+# Usa a comparação de benchmarks/check_chunked.py num CSV sintético pequeno,
+# com blocos e limite de células pendentes pequenos para exercitar várias
+# somas de cubos parciais. O pico de memória (tracemalloc) é medido sobre
+# blocos repetidos, em que os cubos não crescem com os pedidos.
+#
+#     python -m pytest tests/test_chunked.py
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+from benchmarks.check_chunked import compare
+from curry_company import chunked, cube
+from curry_company.data import prepare_dataset
+
+
+def test_chunked_cubes_match_in_memory(tmp_path):
+    csv = str(tmp_path / 'train.csv')
+    synthetic.write_csv(csv, 20_000)
+    colunas = cube.cube_columns()
+
+    em_memoria = cube.build_cubes(prepare_dataset(pd.read_csv(csv)).loc[:, colunas])
+    em_blocos = chunked.build_cubes(chunked.iter_csv_chunks(csv, 3_000, colunas), max_pending=5_000)
+    assert compare(em_memoria, em_blocos) == []
+
+
+def test_no_chunks_builds_nothing():
+    assert chunked.build_cubes(iter([])) is None
+
+
+def _bytes(cubos):
+    # células (e registradores dos esboços HyperLogLog) de todos os cubos
+    return sum(c.cells.memory_usage(deep=True).sum() + getattr(c, 'registers', np.empty(0)).nbytes
+               for c in cubos.values())
+
+
+def _pico(bloco, n_blocos, max_pending):
+    tracemalloc.start()
+    try:
+        cubos = chunked.build_cubes((bloco for _ in range(n_blocos)), max_pending=max_pending)
+        return cubos, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_chunked_peak_memory_is_bounded_by_cubes():
+    bloco = prepare_dataset(synthetic.generate(2_000)).loc[:, cube.cube_columns()]
+    parcial = cube.build_cubes(bloco)
+    celulas = sum(len(c) for c in parcial.values())
+    _pico(bloco, 2, celulas)  # aquece os caches do pandas
+
+    # com max_pending = células de um bloco, cada soma junta o acumulado e
+    # dois cubos pendentes, todos do tamanho do cubo final
+    cubos, pico_5 = _pico(bloco, 5, celulas)
+    _, pico_15 = _pico(bloco, 15, celulas)
+    assert cubos['pedidos'].cells['orders'].sum() == 5 * parcial['pedidos'].cells['orders'].sum()
+    assert pico_15 <= 1.1 * pico_5  # 3x mais pedidos, mesmo pico
+    assert pico_15 <= 5 * 3 * _bytes(cubos)
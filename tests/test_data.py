@@ -0,0 +1,88 @@
+# ------------------------------------------------------------------------
+# Cache do processo: dataframes somente leitura e lotes anexados que
+# estendem todos os itens em cache
+# ------------------------------------------------------------------------
+#
+#     python -m pytest tests/test_data.py
+import pytest
+
+from benchmarks import synthetic
+from curry_company import config, data, ingest, snapshot
+
+pytestmark = pytest.mark.skipif(not snapshot.HAS_ARROW, reason='partições precisam do pyarrow')
+
+COLUNAS = ['Order_Date', 'Road_traffic_density', 'City', 'Delivery_person_ID', 'Time_taken(min)']
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'CHUNK_SIZE', 0)
+    monkeypatch.setattr(config, 'BACKEND', 'pandas')
+    monkeypatch.setattr(config, 'WORKERS', 1)
+    csv = str(tmp_path / 'train.csv')
+    synthetic.write_csv(csv, 5000)
+    lote = str(tmp_path / 'lote.csv')
+    synthetic.generate(500, seed=7, start_id=10 ** 6).to_csv(lote, index=False)
+    return csv, lote
+
+
+def test_append_extends_every_cached_item(dataset, monkeypatch):
+    csv, lote = dataset
+    indice = data.get_date_index(csv, COLUNAS)
+    cubos = data.get_cubes(csv)
+
+    leituras = []
+    original = data._load
+
+    def espiao(path, columns, partitions=None):
+        leituras.append(columns)
+        return original(path, columns, partitions)
+    monkeypatch.setattr(data, '_load', espiao)
+
+    anexados = ingest.append_batch(lote, csv_path=csv, snapshot_path=data.snapshot_path_for(csv))
+    assert anexados > 0
+
+    # os dois itens são estendidos só com a partição nova, sem reler o histórico
+    novo_indice = data.get_date_index(csv, COLUNAS)
+    novos_cubos = data.get_cubes(csv)
+    assert leituras == []
+    assert len(novo_indice.df) == len(indice.df) + anexados
+    assert novos_cubos['pedidos'].orders([]).sum() == cubos['pedidos'].orders([]).sum() + anexados
+
+
+def test_cached_dataset_is_read_only(dataset):
+    csv, _ = dataset
+    df1 = data.load_dataset(csv, COLUNAS)
+
+    # escrever nos valores compartilhados falha
+    with pytest.raises(ValueError):
+        df1.loc[df1.index[0], 'Time_taken(min)'] = -1
+    with pytest.raises(ValueError):
+        df1['Time_taken(min)'].fillna(0, inplace=True)
+
+    # colunas criadas ou substituídas ficam só na cópia da sessão
+    df1['week_of_year'] = df1['Order_Date'].dt.strftime('%U')
+    df1['Time_taken(min)'] = -1
+    df_cache = data.load_dataset(csv, COLUNAS)
+    assert 'week_of_year' not in df_cache.columns
+    assert (df_cache['Time_taken(min)'] >= 0).all()
+
+
+def test_date_index_window_is_read_only(dataset):
+    csv, _ = dataset
+    indice = data.get_date_index(csv, COLUNAS)
+    janela = indice.select(traffic=list(indice.bitmaps))  # todos os tipos: fatia sem cópia
+    with pytest.raises(ValueError):
+        janela.iloc[0, janela.columns.get_loc('Time_taken(min)')] = -1
+    assert (indice.df['Time_taken(min)'] >= 0).all()
+
+
+def test_replaced_csv_drops_old_partitions(dataset):
+    csv, lote = dataset
+    data.get_date_index(csv, COLUNAS)
+    assert ingest.append_batch(lote, csv_path=csv, snapshot_path=data.snapshot_path_for(csv)) > 0
+
+    # CSV novo: já na primeira leitura o lote anexado ao CSV antigo não entra
+    synthetic.write_csv(csv, 5200)
+    indice = data.get_date_index(csv, COLUNAS)
+    assert len(indice.df) == len(snapshot.read_snapshot(data.snapshot_path_for(csv), ['ID'], partitions=[]))
@@ -0,0 +1,36 @@
+# ------------------------------------------------------------------------
+# distance_km vetorizado contra o pacote haversine, linha a linha
+# ------------------------------------------------------------------------
+#
+#     python -m pytest tests/test_geo.py
+import numpy as np
+import pytest
+
+from benchmarks import synthetic
+from curry_company import geo
+
+haversine = pytest.importorskip('haversine')
+
+
+def _pedidos(n_rows=2000):
+    # coordenadas de pedidos sintéticos (inclui as zeradas e com sinal trocado)
+    df1 = synthetic.generate(n_rows).loc[:, geo.COLUNAS_COORDENADAS]
+    return df1.astype('float64').dropna()
+
+
+def _esperado(df1):
+    return np.array([haversine.haversine((lat1, lon1), (lat2, lon2))
+                     for lat1, lon1, lat2, lon2 in df1.itertuples(index=False)])
+
+
+def test_distance_km_matches_haversine():
+    df1 = _pedidos()
+    np.testing.assert_allclose(geo.distance_km(df1), _esperado(df1), rtol=1e-9, atol=1e-9)
+
+
+def test_distance_km_float32_matches_haversine():
+    # float32 (CURRY_DISTANCE_DTYPE): erro de arredondamento de ~1e-3 km
+    df1 = _pedidos()
+    distancias = geo.distance_km(df1, dtype=np.float32)
+    assert distancias.dtype == np.float32
+    np.testing.assert_allclose(distancias, _esperado(df1), rtol=1e-4, atol=1e-2)
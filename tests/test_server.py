@@ -0,0 +1,44 @@
+# ------------------------------------------------------------------------
+# Servidor dos KPIs: erros viram respostas JSON
+# ------------------------------------------------------------------------
+#
+#     python -m pytest tests/test_server.py
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from curry_company import server
+
+
+@pytest.fixture
+def url():
+    httpd = server.make_server('127.0.0.1', 0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url) as resposta:
+            return resposta.status, json.loads(resposta.read())
+    except urllib.error.HTTPError as erro:
+        return erro.code, json.loads(erro.read())
+
+
+def test_bad_parameter_is_400(url):
+    status, corpo = _get(url + '/kpi/orders_by_day?start=ontem')
+    assert status == 400 and 'start' in corpo['error']
+
+
+def test_unexpected_error_is_500_json(url, monkeypatch):
+    def falha(*args, **kwargs):
+        raise OSError('snapshot ilegível')
+    monkeypatch.setattr(server, 'etag_for', falha)
+    status, corpo = _get(url + '/kpi/orders_by_day')
+    assert status == 500
+    assert corpo == {'error': 'Erro interno: snapshot ilegível'}
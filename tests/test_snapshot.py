@@ -0,0 +1,93 @@
+# ------------------------------------------------------------------------
+# Partições do snapshot: numeração sob appends simultâneos, partições de
+# um CSV base substituído e deduplicação pelo índice de IDs
+# ------------------------------------------------------------------------
+#
+#     python -m pytest tests/test_snapshot.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from benchmarks import synthetic
+from curry_company import ingest, snapshot
+from curry_company.data import prepare_dataset
+
+pytestmark = pytest.mark.skipif(not snapshot.HAS_ARROW, reason='partições precisam do pyarrow')
+
+
+@pytest.fixture
+def base(tmp_path):
+    caminho = str(tmp_path / 'train.parquet')
+    snapshot.write_snapshot(prepare_dataset(synthetic.generate(200)), caminho)
+    return caminho
+
+
+def test_concurrent_partitions_get_distinct_numbers(base):
+    lotes = [prepare_dataset(synthetic.generate(50, seed=i, start_id=10 ** 6 * (i + 1))) for i in range(8)]
+    with ThreadPoolExecutor(8) as executor:
+        caminhos = list(executor.map(lambda df1: snapshot.write_partition(df1, base), lotes))
+
+    assert len(set(caminhos)) == len(lotes)
+    assert len(snapshot.list_partitions(base)) == len(lotes)
+    total = len(snapshot.read_snapshot(base, columns=['ID']))
+    assert total == len(snapshot.read_snapshot(base, ['ID'], partitions=[])) + sum(len(df1) for df1 in lotes)
+
+
+def test_reserved_partition_is_not_listed(base):
+    pasta = snapshot.partitions_dir(base)
+    os.makedirs(pasta)
+    open(os.path.join(pasta, 'part-00001.parquet'), 'wb').close()  # reserva de outro append
+    assert snapshot.list_partitions(base) == []
+    assert os.path.basename(snapshot.write_partition(prepare_dataset(synthetic.generate(20)), base)) == \
+        'part-00002.parquet'
+
+
+def test_partitions_of_replaced_csv_are_ignored(tmp_path):
+    csv = str(tmp_path / 'train.csv')
+    caminho = str(tmp_path / 'train.parquet')
+    synthetic.write_csv(csv, 300)
+    snapshot.build_snapshot(csv, caminho)
+    snapshot.write_partition(prepare_dataset(synthetic.generate(20, start_id=10 ** 6)), caminho)
+    assert len(snapshot.list_partitions(caminho)) == 1
+
+    # CSV novo (já com os pedidos do lote): snapshot desatualizado, e depois
+    # de reconstruído a partição antiga não entra mais
+    synthetic.write_csv(csv, 320)
+    assert not snapshot.is_fresh(csv, caminho)
+    snapshot.build_snapshot(csv, caminho)
+    assert snapshot.is_fresh(csv, caminho)
+    assert snapshot.list_partitions(caminho) == []
+    assert len(snapshot.read_snapshot(caminho, columns=['ID'])) == \
+        len(snapshot.read_snapshot(caminho, ['ID'], partitions=[]))
+
+    # lotes anexados depois ficam com a base nova e a numeração continua
+    novo = snapshot.write_partition(prepare_dataset(synthetic.generate(20, start_id=2 * 10 ** 6)), caminho)
+    assert snapshot.list_partitions(caminho) == [os.path.basename(novo)]
+    assert os.path.basename(novo).startswith('part-00002-')
+
+
+def test_append_dedupes_without_reading_history(tmp_path, monkeypatch):
+    csv = str(tmp_path / 'train.csv')
+    caminho = str(tmp_path / 'train.parquet')
+    synthetic.write_csv(csv, 300)
+    snapshot.build_snapshot(csv, caminho)
+    lote = str(tmp_path / 'lote.csv')
+    repetidos = synthetic.generate(300).iloc[:10]  # pedidos que já estão no CSV
+    pd.concat([synthetic.generate(40, seed=3, start_id=10 ** 6), repetidos]).to_csv(lote, index=False)
+    novos = len(prepare_dataset(pd.read_csv(lote))) - len(prepare_dataset(repetidos))
+
+    def proibido(*args, **kwargs):
+        raise AssertionError('a deduplicação não deve ler os arquivos do snapshot')
+    monkeypatch.setattr(snapshot.pq, 'read_table', proibido)
+    assert ingest.append_batch(lote, csv_path=csv, snapshot_path=caminho) == novos
+    assert ingest.append_batch(lote, csv_path=csv, snapshot_path=caminho) == 0
+
+
+def test_missing_id_index_is_rebuilt(base):
+    ids = snapshot.read_snapshot(base, ['ID'])['ID']
+    os.remove(base + snapshot.IDS_SUFFIX)
+    assert snapshot.contains_ids(base, ids).all()
+    assert os.path.exists(base + snapshot.IDS_SUFFIX)
+    assert not snapshot.contains_ids(base, pd.Series([10 ** 9])).any()
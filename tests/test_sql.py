@@ -0,0 +1,28 @@
+# ------------------------------------------------------------------------
+# Backend SQL (DuckDB): KPIs iguais aos dos cubos em pandas
+# ------------------------------------------------------------------------
+# Usa a comparação de benchmarks/check_sql.py. Com 60 mil pedidos sintéticos
+# há entregadores empatados no p90, o que exercita o desempate do ranking.
+#
+#     python -m pytest tests/test_sql.py
+import pytest
+
+from benchmarks import synthetic
+from benchmarks.check_sql import JANELAS, build_backends, compare_window
+from curry_company import snapshot, sql
+from curry_company.data import prepare_dataset
+
+pytestmark = pytest.mark.skipif(not (sql.HAS_DUCKDB and snapshot.HAS_ARROW),
+                                reason='o backend SQL precisa do duckdb e do pyarrow')
+
+
+@pytest.fixture(scope='module')
+def backends(tmp_path_factory):
+    df1 = prepare_dataset(synthetic.generate(60_000))
+    return build_backends(df1, str(tmp_path_factory.mktemp('sql')))
+
+
+@pytest.mark.parametrize('janela', JANELAS)
+def test_sql_kpis_match_pandas(backends, janela):
+    divergentes, _, _ = compare_window(*backends, janela)
+    assert divergentes == []